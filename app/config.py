@@ -13,17 +13,101 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
     GOOGLE_REDIRECT_URI: str = "http://localhost:8000/api/auth/callback"
+    GOOGLE_DRIVE_DISCOVERY_FILE: str = ""
+    
+    # Cuentas de Google Drive: un token por cuenta y un pool de clientes ya construidos
+    GOOGLE_TOKENS_DIR: str = "tokens"
+    DRIVE_POOL_MAX_ACCOUNTS: int = 32
+    DRIVE_POOL_IDLE_SECONDS: int = 1800
+    DRIVE_INVENTORY_TTL_SECONDS: int = 60
+    # Vigencia del estado OAuth entre /auth/login y /auth/callback
+    OAUTH_STATE_TTL_SECONDS: int = 600
+    
+    # Inventarios guardados en disco en formato columnar y compartidos entre workers con mmap
+    SNAPSHOT_STORE_ENABLED: bool = True
+    SNAPSHOT_DIR: str = "snapshots"
+    SNAPSHOT_KEEP_VERSIONS: int = 2
+    
+    ONEDRIVE_CLIENT_ID: str = ""
+    ONEDRIVE_CLIENT_SECRET: str = ""
+    ONEDRIVE_TENANT_ID: str = "common"
+    ONEDRIVE_REDIRECT_URI: str = "http://localhost:8000/api/auth/onedrive/callback"
+    
+    # Carpeta del servidor usada como proveedor de evidencia "local_folder"
+    LOCAL_EVIDENCE_DIR: str = "evidence"
+    
+    # Búsqueda en Drive: snapshot (listado completo), pushdown o auto (según costo)
+    DRIVE_SEARCH_MODE: str = "snapshot"
+    DRIVE_QUERY_MAX_LENGTH: int = 2000
+    DRIVE_ESTIMATED_FILES: int = 10000
+    KEYWORD_CACHE_MAX_BYTES: int = 67108864
+    
+    # Resultados de auditoría guardados por lote; cada commit deja un punto de control
+    AUDIT_COMMIT_BATCH_SIZE: int = 200
+    
+    # Cuota y reintentos de la API de Drive
+    DRIVE_QUOTA_REQUESTS_PER_SECOND: float = 10.0
+    DRIVE_QUOTA_BURST: int = 20
+    DRIVE_MAX_RETRIES: int = 5
+    DRIVE_BACKOFF_BASE_SECONDS: float = 1.0
+    DRIVE_BACKOFF_MAX_SECONDS: float = 32.0
+    
+    # Perfilado de requests: a pedido de un administrador o por muestreo (1 de cada N, 0 lo desactiva)
+    PROFILING_ADMIN_TOKEN: str = ""
+    PROFILING_SAMPLE_RATE: int = 0
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+    
+    # Arranque: crear o actualizar el esquema en el lifespan y precargar módulos pesados en segundo plano
+    DB_CREATE_SCHEMA_ON_STARTUP: bool = True
+    STARTUP_PRELOAD: bool = False
     
     MAX_FILE_SIZE: int = 10485760
     ALLOWED_EXTENSIONS: str = ".xlsx,.xls"
     
+    # Importación masiva de checklists: libros leídos en un pool de procesos
+    BULK_IMPORT_PROCESS_WORKERS: int = 2
+    BULK_IMPORT_MAX_FILES: int = 50
+    
     UPLOAD_DIR: str = "uploads"
     REPORTS_DIR: str = "reports"
     
+    # Reportes construidos en un pool de procesos; si no terminan en REPORT_WAIT_SECONDS se responde 202
+    REPORT_PROCESS_WORKERS: int = 2
+    REPORT_WAIT_SECONDS: float = 2.0
+    REPORT_RETRY_AFTER_SECONDS: int = 2
+    
+    # Ciclo de vida de uploads y reportes
+    STORAGE_MAX_BYTES: int = 1073741824
+    REPORTS_MAX_AGE_SECONDS: int = 604800
+    STORAGE_COMPACTION_INTERVAL_SECONDS: int = 3600
+    
+    # Pool de conexiones (PostgreSQL)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    
+    # Pragmas de SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
+    
     @property
     def allowed_extensions_list(self) -> List[str]:
         return [ext.strip() for ext in self.ALLOWED_EXTENSIONS.split(",")]
     
+    @property
+    def microsoft_authority(self) -> str:
+        return f"https://login.microsoftonline.com/{self.ONEDRIVE_TENANT_ID}"
+    
+    @property
+    def microsoft_scopes(self) -> List[str]:
+        return ["Files.Read.All"]
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
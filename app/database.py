@@ -1,20 +1,87 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-# Configuración especial para SQLite
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+
+def _is_sqlite(database_url: str) -> bool:
+    return database_url.startswith("sqlite")
+
+
+def _is_sqlite_memory(database_url: str) -> bool:
+    return ":memory:" in database_url or database_url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, database_url: str):
+    """
+    Aplica los pragmas de SQLite en cada conexión nueva del pool
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+
+        # WAL y mmap no aplican a bases de datos en memoria
+        if not _is_sqlite_memory(database_url):
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    finally:
+        cursor.close()
+
+
+def _apply_postgres_settings(dbapi_connection):
+    """
+    Aplica la configuración de sesión de PostgreSQL en cada conexión nueva del pool
+    """
+    if settings.DB_STATEMENT_TIMEOUT_MS <= 0:
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+    dbapi_connection.commit()
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """
+    Crea el motor de base de datos con el perfil correspondiente al backend
+    """
+    options = {
+        "pool_pre_ping": True,
+        "echo": settings.DEBUG
+    }
+
+    if _is_sqlite(database_url):
+        # El timeout del driver se expresa en segundos
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        }
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT
+        )
+
+    db_engine = create_engine(database_url, **options)
+
+    @event.listens_for(db_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        if _is_sqlite(database_url):
+            _apply_sqlite_pragmas(dbapi_connection, database_url)
+        elif db_engine.dialect.name == "postgresql":
+            _apply_postgres_settings(dbapi_connection)
+
+    return db_engine
+
 
 # Motor de base de datos
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+engine = create_db_engine(settings.DATABASE_URL)
 
 # Sesión de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
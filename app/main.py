@@ -1,22 +1,76 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
 from app.database import engine, Base
-from app.routers import checklist, audit, auth
+from app.models.upgrades import upgrade_schema
+from app.routers import checklist, audit, auth, storage, metrics, analytics, admin
+from app.services.bulk_import import bulk_importer
+from app.services.profiler import ProfilingMiddleware
+from app.services.report_jobs import report_jobs
+from app.services.storage_manager import compact_storage
+import asyncio
 import os
 
-# Crear tablas
-Base.metadata.create_all(bind=engine)
 
-# Crear directorios necesarios
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-os.makedirs(settings.REPORTS_DIR, exist_ok=True)
+async def _storage_compaction_loop(interval: int):
+    """
+    Compacta periódicamente uploads y reportes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(compact_storage)
+        except Exception as e:
+            print(f"Error en compactación de almacenamiento: {e}")
+
+
+def _preload_heavy_modules():
+    """
+    Importa los módulos pesados para que la primera petición no pague su carga
+    """
+    try:
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+        import googleapiclient.discovery  # noqa: F401
+        from app.services.google_drive_service import load_drive_discovery_document
+        load_drive_discovery_document()
+    except Exception as e:
+        print(f"Error precargando módulos: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear tablas y agregar las columnas nuevas a las tablas existentes
+    if settings.DB_CREATE_SCHEMA_ON_STARTUP:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+        await run_in_threadpool(upgrade_schema, engine)
+    
+    # Crear directorios necesarios
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(settings.REPORTS_DIR, exist_ok=True)
+    
+    tasks = []
+    if settings.STARTUP_PRELOAD:
+        tasks.append(asyncio.create_task(run_in_threadpool(_preload_heavy_modules)))
+    if settings.STORAGE_COMPACTION_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(_storage_compaction_loop(settings.STORAGE_COMPACTION_INTERVAL_SECONDS)))
+    
+    yield
+    
+    for task in tasks:
+        task.cancel()
+    report_jobs.shutdown()
+    bulk_importer.shutdown()
+
 
 # Crear aplicación
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="API para sistema de auditoría automatizada"
+    description="API para sistema de auditoría automatizada",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -28,10 +82,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfilado opcional de requests (ver PROFILING_* en la configuración)
+app.add_middleware(ProfilingMiddleware)
+
 # Incluir routers
 app.include_router(checklist.router, prefix="/api")
 app.include_router(audit.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
+app.include_router(storage.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/")
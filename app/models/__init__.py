@@ -1,3 +1,4 @@
-from app.models.audit import Audit, ChecklistItem, AuditResult
+from app.models.audit import ChecklistTemplate, Audit, ChecklistItem, AuditResult
+from app.models.analytics import AuditSummary, ItemOutcomeStat
 
-__all__ = ["Audit", "ChecklistItem", "AuditResult"]
\ No newline at end of file
+__all__ = ["ChecklistTemplate", "Audit", "ChecklistItem", "AuditResult", "AuditSummary", "ItemOutcomeStat"]
\ No newline at end of file
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+
+class AuditSummary(Base):
+    __tablename__ = "audit_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=False, unique=True)
+    template_id = Column(Integer, ForeignKey("checklist_templates.id", ondelete="SET NULL"), nullable=True, index=True)
+    checklist_name = Column(String(255), nullable=False, index=True)
+    completed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    total_items = Column(Integer, default=0)
+    compliant_items = Column(Integer, default=0)
+    compliance_rate = Column(Float, default=0.0)
+    mandatory_total = Column(Integer, default=0)
+    mandatory_compliant = Column(Integer, default=0)
+    optional_total = Column(Integer, default=0)
+    optional_compliant = Column(Integer, default=0)
+    failed_item_ids = Column(Text, nullable=True)  # JSON con los item_id que no cumplieron
+
+
+class ItemOutcomeStat(Base):
+    __tablename__ = "item_outcome_stats"
+    __table_args__ = (UniqueConstraint("checklist_name", "item_id", name="uq_item_outcome_checklist_item"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    checklist_name = Column(String(255), nullable=False, index=True)
+    item_id = Column(String(50), nullable=False)
+    description = Column(Text, nullable=True)
+    evaluations = Column(Integer, default=0)
+    failures = Column(Integer, default=0, index=True)
+    last_evaluated_at = Column(DateTime, default=datetime.utcnow)
@@ -4,44 +4,100 @@ from datetime import datetime
 from app.database import Base
 
 
+class ChecklistTemplate(Base):
+    __tablename__ = "checklist_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False, index=True)
+    version = Column(Integer, nullable=False, default=1)
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)  # SHA-256 del archivo subido
+    total_items = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    items = relationship("ChecklistItem", back_populates="template", order_by="ChecklistItem.id")
+    audits = relationship("Audit", back_populates="template")
+
+
 class Audit(Base):
     __tablename__ = "audits"
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
+    template_id = Column(Integer, ForeignKey("checklist_templates.id"), nullable=True, index=True)
     status = Column(String(50), default="pending")  # pending, processing, completed, error
+    providers = Column(String(255), default="google_drive")  # proveedores separados por coma
+    drive_account = Column(String(255), nullable=True)  # cuenta de Google Drive usada
+    folder_ids = Column(String(1000), nullable=True)  # carpetas que acotan la búsqueda, separadas por coma
     compliance_rate = Column(Float, default=0.0)
     total_items = Column(Integer, default=0)
     compliant_items = Column(Integer, default=0)
     report_path = Column(String(500), nullable=True)
+    # Punto de control: último requisito guardado y versiones de los snapshots usados
+    last_processed_item_id = Column(Integer, nullable=True)
+    snapshot_version = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
-    checklist_items = relationship("ChecklistItem", back_populates="audit", cascade="all, delete-orphan")
+    template = relationship("ChecklistTemplate", back_populates="audits")
+    checklist_items = relationship(
+        "ChecklistItem",
+        back_populates="audit",
+        cascade="all, delete-orphan",
+        order_by="ChecklistItem.id"
+    )
     results = relationship("AuditResult", back_populates="audit", cascade="all, delete-orphan")
+    
+    @property
+    def items(self):
+        """
+        Requisitos de la auditoría: los de su plantilla o, en auditorías
+        anteriores a las plantillas, los copiados en la propia auditoría
+        """
+        if self.template_id is not None:
+            return self.template.items
+        return self.checklist_items
+    
+    def items_clause(self):
+        """
+        Condición SQL equivalente a `items` para consultas sobre checklist_items
+        """
+        if self.template_id is not None:
+            return ChecklistItem.template_id == self.template_id
+        return ChecklistItem.audit_id == self.id
 
 
 class ChecklistItem(Base):
     __tablename__ = "checklist_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"))
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=True, index=True)
+    template_id = Column(Integer, ForeignKey("checklist_templates.id", ondelete="CASCADE"), nullable=True, index=True)
     item_id = Column(String(50), nullable=False)
     description = Column(Text, nullable=False)
     keywords = Column(String(500), nullable=False)
+    keyword_expression = Column(Text, nullable=True)  # expresión de keywords compilada al importar (JSON)
     is_mandatory = Column(Boolean, default=True)
+    folder_ids = Column(String(1000), nullable=True)  # reemplaza las carpetas de la auditoría para este requisito
+    # Restricciones opcionales de la evidencia: fechas ISO o plazos relativos (12m, 30d) y tipos
+    modified_after = Column(String(50), nullable=True)
+    modified_before = Column(String(50), nullable=True)
+    created_after = Column(String(50), nullable=True)
+    created_before = Column(String(50), nullable=True)
+    mime_types = Column(String(500), nullable=True)
     
     # Relaciones
     audit = relationship("Audit", back_populates="checklist_items")
+    template = relationship("ChecklistTemplate", back_populates="items")
 
 
 class AuditResult(Base):
     __tablename__ = "audit_results"
     
     id = Column(Integer, primary_key=True, index=True)
-    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"))
-    checklist_item_id = Column(Integer, ForeignKey("checklist_items.id", ondelete="CASCADE"))
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), index=True)
+    checklist_item_id = Column(Integer, ForeignKey("checklist_items.id", ondelete="CASCADE"), index=True)
     found = Column(Boolean, default=False)
     matched_files = Column(Text, nullable=True)  # JSON string con archivos encontrados
     notes = Column(Text, nullable=True)
@@ -0,0 +1,114 @@
+"""
+Columnas agregadas a tablas que ya existían.
+
+create_all solo crea las tablas que faltan, así que las columnas nuevas de
+tablas existentes se agregan al arrancar con ALTER TABLE, solo si faltan.
+Una columna puede traer un backfill, que corre en la misma transacción en
+que se agrega la columna (es decir, una sola vez por base de datos).
+"""
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import Index, inspect, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from app.database import Base
+from app.models.audit import Audit, ChecklistItem, ChecklistTemplate
+
+
+def _backfill_templates(conn: Connection):
+    """
+    Cada auditoría anterior a las plantillas pasa a tener su propia plantilla
+    con los requisitos que ya tenía copiados (sus resultados apuntan a esos
+    requisitos, así que no se unifican auditorías con el mismo contenido)
+    """
+    audits = Audit.__table__
+    items = ChecklistItem.__table__
+    templates = ChecklistTemplate.__table__
+
+    versions = {}
+    legacy = conn.execute(
+        select(audits.c.id, audits.c.filename, audits.c.total_items, audits.c.created_at)
+        .where(audits.c.template_id.is_(None))
+        .order_by(audits.c.id)
+    ).all()
+    for audit_id, filename, total_items, created_at in legacy:
+        versions[filename] = versions.get(filename, 0) + 1
+        template_id = conn.execute(
+            insert(templates).values(
+                name=filename,
+                version=versions[filename],
+                # No es un SHA-256: el archivo original puede ya no existir
+                content_hash=f"audit-{audit_id}",
+                total_items=total_items or 0,
+                created_at=created_at
+            )
+        ).inserted_primary_key[0]
+        conn.execute(update(items).where(items.c.audit_id == audit_id).values(template_id=template_id))
+        conn.execute(update(audits).where(audits.c.id == audit_id).values(template_id=template_id))
+
+
+def _fill(table_name: str, column_name: str, value) -> Callable[[Connection], None]:
+    """
+    Backfill que deja `value` en las filas existentes
+    """
+    def backfill(conn: Connection):
+        table = Base.metadata.tables[table_name]
+        conn.execute(update(table).values({column_name: value}))
+    return backfill
+
+
+# (tabla, columna, backfill) en el orden en que se agregan
+ADDED_COLUMNS: List[Tuple[str, str, Optional[Callable[[Connection], None]]]] = [
+    ("checklist_items", "template_id", None),
+    ("audits", "template_id", _backfill_templates),
+    # Las auditorías anteriores a los proveedores buscaban solo en Google Drive
+    ("audits", "providers", _fill("audits", "providers", "google_drive")),
+    ("audits", "last_processed_item_id", None),
+    ("audits", "snapshot_version", None),
+    ("audits", "folder_ids", None),
+    ("checklist_items", "folder_ids", None),
+    ("checklist_items", "modified_after", None),
+    ("checklist_items", "modified_before", None),
+    ("checklist_items", "created_after", None),
+    ("checklist_items", "created_before", None),
+    ("checklist_items", "mime_types", None),
+    ("audits", "drive_account", None),
+    # NULL: requisito anterior a las expresiones, se evalúa como lista por comas
+    ("checklist_items", "keyword_expression", None),
+]
+
+
+def _add_column(conn: Connection, table_name: str, column_name: str):
+    column = Base.metadata.tables[table_name].c[column_name]
+    preparer = conn.dialect.identifier_preparer
+    ddl = (
+        f"ALTER TABLE {preparer.quote(table_name)} "
+        f"ADD COLUMN {preparer.quote(column_name)} {column.type.compile(dialect=conn.dialect)}"
+    )
+    conn.exec_driver_sql(ddl)
+    if column.index:
+        # Mismo nombre que le daría create_all
+        Index(f"ix_{table_name}_{column_name}", column).create(conn)
+
+
+def upgrade_schema(bind: Engine):
+    """
+    Agrega las columnas de ADDED_COLUMNS que falten. Es idempotente y tolera
+    que otro worker esté haciendo lo mismo al mismo tiempo.
+    """
+    for table_name, column_name, backfill in ADDED_COLUMNS:
+        inspector = inspect(bind)
+        if not inspector.has_table(table_name):
+            continue
+        if column_name in {column["name"] for column in inspector.get_columns(table_name)}:
+            continue
+
+        try:
+            with bind.begin() as conn:
+                _add_column(conn, table_name, column_name)
+                if backfill is not None:
+                    backfill(conn)
+        except Exception:
+            # Otro worker pudo agregarla primero
+            if column_name in {column["name"] for column in inspect(bind).get_columns(table_name)}:
+                continue
+            raise
+        print(f"Esquema actualizado: columna {table_name}.{column_name} agregada")
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from app.config import settings
+from app.services.profiler import is_admin_token, profile_store
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not settings.PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Administración no habilitada")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administrador inválido")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    Perfiles de requests guardados, del más reciente al más antiguo
+    """
+    profiles = await run_in_threadpool(profile_store.list)
+    
+    return {
+        "profiles": profiles,
+        "total": len(profiles),
+        "max_files": profile_store.max_files
+    }
+
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(
+    name: str,
+    format: str = Query("json", description="json (perfil completo) o collapsed (pilas para flamegraph)")
+):
+    """
+    Descarga un perfil guardado
+    """
+    path = profile_store.path(name)
+    
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    
+    if format == "collapsed":
+        document = await run_in_threadpool(profile_store.load, name)
+        return PlainTextResponse(
+            document.get("collapsed", ""),
+            headers={"Content-Disposition": f'attachment; filename="{name[:-len(".json")]}.collapsed.txt"'}
+        )
+    
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Formato no soportado. Permitidos: json, collapsed")
+    
+    return FileResponse(path, media_type="application/json", filename=name)
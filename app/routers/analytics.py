@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.services.analytics_service import AnalyticsService
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get("/compliance-trend")
+async def compliance_trend(
+    interval: str = Query("month", pattern="^(day|week|month)$"),
+    checklist: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Tasa de cumplimiento por checklist y periodo
+    """
+    return {
+        "interval": interval,
+        "trend": AnalyticsService(db).compliance_trend(interval, checklist)
+    }
+
+
+@router.get("/top-failing")
+async def top_failing_items(
+    checklist: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Requisitos que más veces no se han cumplido
+    """
+    return {
+        "items": AnalyticsService(db).top_failing_items(checklist, limit)
+    }
+
+
+@router.get("/mandatory-vs-optional")
+async def mandatory_vs_optional(checklist: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Cumplimiento de requisitos obligatorios frente a opcionales
+    """
+    return AnalyticsService(db).mandatory_vs_optional(checklist)
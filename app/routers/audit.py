@@ -1,25 +1,62 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Body, Header, Query
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import get_db
 from app.models.audit import Audit, AuditResult
-from app.schemas.audit import AuditStatusResponse, AuditHistoryResponse, AuditResponse
+from app.schemas.audit import AuditBatchRequest, AuditStatusResponse, AuditHistoryResponse, AuditResponse
 from app.services.report_generator import ReportGenerator
-from app.routers.auth import get_google_drive_service
-from typing import List
+from app.services.report_jobs import report_jobs
+from app.services.analytics_service import AnalyticsService
+from app.services.audit_diff import AuditDiff
+from app.services.audit_engine import AuditEngine
+from app.services.drive_scheduler import DriveQuotaExceededError
+from app.services.event_bus import AuditEventBus, audit_events
+from app.services.folder_index import UnknownFolderError, parse_folder_ids
+from app.services.result_exporter import ResultExporter
+from app.services.result_pages import ResultPageQuery
+from app.services.storage_manager import storage_manager
+from app.routers.auth import get_drive_account, get_google_drive_service, get_provider_services
+from app.utils.response_utils import compress_body, dumps_json
+from typing import List, Optional
+import asyncio
 import os
 import json
 
 router = APIRouter(prefix="/audit", tags=["Audit"])
 
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _quota_exceeded(error: DriveQuotaExceededError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Google Drive está limitando las peticiones: {str(error)}",
+        headers={"Retry-After": str(max(1, int(error.retry_after)))}
+    )
+
 
 @router.post("/start")
-async def start_audit(audit_id: int = Body(..., embed=True), db: Session = Depends(get_db)):
+async def start_audit(
+    audit_id: int = Body(..., embed=True),
+    providers: Optional[List[str]] = Body(None, embed=True),
+    folder_ids: Optional[List[str]] = Body(None, embed=True),
+    x_drive_account: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """
-    Inicia el proceso de auditoría con búsqueda en Google Drive
+    Inicia el proceso de auditoría con búsqueda en los proveedores indicados
+    (por defecto Google Drive). Con `folder_ids` la búsqueda se limita a esas
+    carpetas y sus subcarpetas (una lista vacía quita la restricción). Una
+    carpeta de la auditoría o de sus requisitos que no está en el inventario
+    responde 400.
+
+    La cuenta de Google Drive se elige con la cabecera X-Drive-Account.
+
+    Una auditoría interrumpida se reanuda desde su último lote guardado; sin
+    proveedores ni cuenta explícitos usa los de esa ejecución.
     """
-    google_drive_service = get_google_drive_service()
-    
     audit = db.query(Audit).filter(Audit.id == audit_id).first()
     
     if not audit:
@@ -29,55 +66,44 @@ async def start_audit(audit_id: int = Body(..., embed=True), db: Session = Depen
     print(f"INICIANDO AUDITORÍA #{audit.id} - {audit.filename}")
     print(f"{'='*60}\n")
     
+    resuming = audit.last_processed_item_id is not None
+    if providers is None and resuming and audit.providers:
+        providers = audit.providers.split(",")
+    
+    account = get_drive_account(x_drive_account or (audit.drive_account if resuming else None))
+    
+    if folder_ids is not None:
+        audit.folder_ids = ",".join(parse_folder_ids(",".join(folder_ids))) or None
+    
     audit.status = "processing"
     db.commit()
     
-    if not google_drive_service.ensure_authenticated():
+    try:
+        provider_services = await run_in_threadpool(get_provider_services, providers, account)
+    except HTTPException as e:
         audit.status = "error"
         db.commit()
-        raise HTTPException(
-            status_code=401, 
-            detail="No autenticado con Google Drive. Por favor autentícate primero en /api/auth/login"
-        )
+        audit_events.publish(audit.id, "error", {"status": "error", "detail": e.detail})
+        raise
     
-    checklist_items = audit.checklist_items
-    total_items = len(checklist_items)
-    compliant_items = 0
+    audit.providers = ",".join(provider_services)
+    audit.drive_account = account
+    db.commit()
     
-    print(f"Procesando {total_items} requisitos del checklist...\n")
+    engine = AuditEngine(db, provider_services)
     
-    for idx, item in enumerate(checklist_items, 1):
-        print(f"  [{idx}/{total_items}] Requisito: {item.description}")
-        
-        keywords = [kw.strip() for kw in item.keywords.split(',')]
-        print(f"    Palabras clave: {keywords}")
-        
-        matched_files = google_drive_service.search_files(keywords)
-        
-        found = len(matched_files) > 0
-        
-        if found:
-            compliant_items += 1
-            print(f"    CUMPLE - Se encontraron {len(matched_files)} archivo(s)")
-        else:
-            print(f"    NO CUMPLE - No se encontraron archivos")
-        
-        result = AuditResult(
-            audit_id=audit.id,
-            checklist_item_id=item.id,
-            found=found,
-            matched_files=json.dumps(matched_files, ensure_ascii=False) if matched_files else None,
-            notes=f"Se encontraron {len(matched_files)} archivos" if found else "No se encontraron archivos"
-        )
-        db.add(result)
-        print()
+    # El motor corre fuera del event loop para que los streams de eventos sigan respondiendo
+    try:
+        summary = await run_in_threadpool(engine.run, audit)
+    except DriveQuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except UnknownFolderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ejecutando auditoría: {str(e)}")
     
-    audit.status = "completed"
-    audit.compliant_items = compliant_items
-    audit.compliance_rate = round((compliant_items / total_items) * 100, 2) if total_items > 0 else 0
-    
-    db.commit()
-    db.refresh(audit)
+    compliant_items = summary["compliant_items"]
+    total_items = summary["total_items"]
     
     print(f"{'='*60}")
     print(f"AUDITORÍA COMPLETADA")
@@ -91,7 +117,73 @@ async def start_audit(audit_id: int = Body(..., embed=True), db: Session = Depen
         "status": audit.status,
         "compliance_rate": audit.compliance_rate,
         "compliant_items": compliant_items,
-        "total_items": total_items
+        "total_items": total_items,
+        "folder_ids": parse_folder_ids(audit.folder_ids),
+        "resumed": summary["resumed"]
+    }
+
+
+@router.post("/batch")
+async def start_audit_batch(
+    request: AuditBatchRequest,
+    account: str = Depends(get_drive_account),
+    db: Session = Depends(get_db)
+):
+    """
+    Ejecuta varias auditorías contra un único snapshot por proveedor
+    """
+    audit_ids = list(dict.fromkeys(request.audit_ids))
+    if not audit_ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos una auditoría")
+    
+    audits = db.query(Audit).filter(Audit.id.in_(audit_ids)).all()
+    
+    missing = sorted(set(audit_ids) - {audit.id for audit in audits})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Auditorías no encontradas: {missing}")
+    
+    print(f"\n{'='*60}")
+    print(f"INICIANDO LOTE DE {len(audits)} AUDITORÍAS")
+    print(f"{'='*60}\n")
+    
+    for audit in audits:
+        audit.status = "processing"
+    db.commit()
+    
+    try:
+        provider_services = await run_in_threadpool(get_provider_services, request.providers, account)
+    except HTTPException as e:
+        for audit in audits:
+            audit.status = "error"
+            audit_events.publish(audit.id, "error", {"status": "error", "detail": e.detail})
+        db.commit()
+        raise
+    
+    for audit in audits:
+        audit.providers = ",".join(provider_services)
+        audit.drive_account = account
+    db.commit()
+    
+    engine = AuditEngine(db, provider_services)
+    
+    try:
+        summaries = await run_in_threadpool(engine.run_batch, audits)
+    except DriveQuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ejecutando lote de auditorías: {str(e)}")
+    
+    completed = sum(1 for summary in summaries if summary["status"] == "completed")
+    
+    print(f"{'='*60}")
+    print(f"LOTE COMPLETADO: {completed}/{len(summaries)} auditorías")
+    print(f"{'='*60}\n")
+    
+    return {
+        "message": "Lote de auditorías procesado",
+        "total_audits": len(summaries),
+        "completed_audits": completed,
+        "audits": summaries
     }
 
 
@@ -112,18 +204,97 @@ async def get_audit_status(audit_id: int, db: Session = Depends(get_db)):
         "error": 0
     }
     
+    progress = progress_map.get(audit.status, 0)
+    last_event = audit_events.last_event(audit.id)
+    if audit.status == "processing" and last_event and "progress" in last_event:
+        progress = last_event["progress"]
+    
+    message = f"Auditoría {audit.status}"
+    if audit.status == "error" and audit.last_processed_item_id is not None:
+        message = "Auditoría interrumpida; al iniciarla de nuevo continúa desde el último lote guardado"
+    
     return AuditStatusResponse(
         id=audit.id,
         status=audit.status,
-        progress=progress_map.get(audit.status, 0),
-        message=f"Auditoría {audit.status}"
+        progress=progress,
+        message=message
+    )
+
+
+@router.get("/{audit_id}/events")
+async def stream_audit_events(audit_id: int, db: Session = Depends(get_db)):
+    """
+    Stream Server-Sent Events con el progreso de una auditoría
+    """
+    audit = db.query(Audit).filter(Audit.id == audit_id).first()
+    
+    if not audit:
+        raise HTTPException(status_code=404, detail="Auditoría no encontrada")
+    
+    initial_event = None
+    if audit.status in AuditEventBus.TERMINAL_EVENTS and not audit_events.last_event(audit_id):
+        initial_event = {
+            "event": audit.status,
+            "audit_id": audit.id,
+            "status": audit.status,
+            "compliance_rate": audit.compliance_rate,
+            "compliant_items": audit.compliant_items,
+            "total_items": audit.total_items,
+            "progress": 100 if audit.status == "completed" else 0
+        }
+    
+    # Libera la conexión: los suscriptores solo escuchan el bus en memoria
+    db.close()
+    
+    async def event_stream():
+        if initial_event:
+            yield _format_sse(initial_event)
+            return
+        
+        queue = audit_events.subscribe(audit_id)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                
+                yield _format_sse(event)
+                
+                if event["event"] in AuditEventBus.TERMINAL_EVENTS:
+                    break
+        finally:
+            audit_events.unsubscribe(audit_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def _report_building(audit_id: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={"message": "El reporte se está generando", "audit_id": audit_id, "status": "building"},
+        headers={"Retry-After": str(settings.REPORT_RETRY_AFTER_SECONDS)}
     )
 
 
 @router.get("/{audit_id}/report")
 async def download_report(audit_id: int, db: Session = Depends(get_db)):
     """
-    Descarga el reporte de una auditoría completada
+    Descarga el reporte de una auditoría completada.
+    
+    Si el reporte no existe se construye en el pool de procesos de reportes;
+    cuando no termina en REPORT_WAIT_SECONDS se responde 202 con Retry-After
+    y el cliente vuelve a pedirlo. Los requests concurrentes por la misma
+    auditoría comparten una sola construcción.
     """
     audit = db.query(Audit).filter(Audit.id == audit_id).first()
     
@@ -134,10 +305,35 @@ async def download_report(audit_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Auditoría no completada")
     
     if not audit.report_path or not os.path.exists(audit.report_path):
-        generator = ReportGenerator()
-        report_path = generator.generate_report(audit, db)
+        job, created = report_jobs.start(audit.id)
+        if created:
+            try:
+                data = await run_in_threadpool(ReportGenerator().collect, audit, db)
+            except BaseException as e:
+                # También si se cancela el request: la construcción no puede quedar registrada sin terminar
+                report_jobs.fail(audit.id, job, e)
+                if not isinstance(e, Exception):
+                    raise
+                print(f"Error reuniendo datos del reporte de auditoría {audit.id}: {e}")
+                raise HTTPException(status_code=500, detail="Error generando el reporte")
+            report_jobs.build(job, data)
+        
+        if not await report_jobs.wait(job, settings.REPORT_WAIT_SECONDS):
+            return _report_building(audit.id)
+        
+        try:
+            report_path = report_jobs.finish(audit.id, job)
+        except Exception as e:
+            print(f"Error generando reporte de auditoría {audit.id}: {e}")
+            raise HTTPException(status_code=500, detail="Error generando el reporte")
+        
+        if report_path is None:
+            # La evidencia se revalidó mientras se construía: ese reporte ya no vale
+            return _report_building(audit.id)
         audit.report_path = report_path
         db.commit()
+    else:
+        storage_manager.touch(audit.report_path)
     
     return FileResponse(
         path=audit.report_path,
@@ -146,6 +342,242 @@ async def download_report(audit_id: int, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/{audit_id}/export")
+async def export_results(
+    audit_id: int,
+    format: str = Query("csv", description="csv, jsonl o parquet"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exporta los resultados de una auditoría en streaming para herramientas de BI
+    """
+    if format not in ResultExporter.FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no soportado. Permitidos: {', '.join(ResultExporter.FORMATS)}"
+        )
+    
+    audit = db.query(Audit).filter(Audit.id == audit_id).first()
+    
+    if not audit:
+        raise HTTPException(status_code=404, detail="Auditoría no encontrada")
+    
+    if audit.status != "completed":
+        raise HTTPException(status_code=400, detail="Auditoría no completada")
+    
+    try:
+        ResultExporter.ensure_format_available(format)
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"El formato {format} requiere instalar pyarrow")
+    
+    media_type, extension = ResultExporter.FORMATS[format]
+    exporter = ResultExporter(audit)
+    
+    return StreamingResponse(
+        exporter.stream(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="Resultados_Auditoria_{audit.id}.{extension}"'}
+    )
+
+
+@router.get("/{audit_id}/results")
+async def get_audit_results(
+    audit_id: int,
+    after: Optional[int] = Query(None, description="Cursor: next_cursor de la página anterior"),
+    limit: int = Query(500, ge=1, le=5000),
+    found: Optional[bool] = Query(None, description="Solo requisitos que cumplen (true) o que no cumplen (false)"),
+    mandatory: Optional[bool] = Query(None, description="Solo requisitos obligatorios (true) u opcionales (false)"),
+    item_prefix: Optional[str] = Query(None, max_length=50, description="Prefijo del ID del requisito"),
+    accept_encoding: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Resultados por requisito paginados por cursor, comprimidos con brotli o
+    gzip si el cliente lo acepta
+    """
+    audit = db.query(Audit).filter(Audit.id == audit_id).first()
+    
+    if not audit:
+        raise HTTPException(status_code=404, detail="Auditoría no encontrada")
+    
+    query = ResultPageQuery(db, audit)
+    
+    def build_body():
+        page = query.page(after=after, limit=limit, found=found, mandatory=mandatory, item_prefix=item_prefix)
+        page["status"] = audit.status
+        return compress_body(dumps_json(page), accept_encoding)
+    
+    # Serializar y comprimir páginas grandes bloquearía el event loop
+    body, encoding = await run_in_threadpool(build_body)
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+DIFF_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+@router.get("/{base_id}/diff/{target_id}")
+async def diff_audits(
+    base_id: int,
+    target_id: int,
+    format: str = Query("json", description="json, csv o xlsx"),
+    accept_encoding: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Diferencias entre dos auditorías emparejando requisitos por ID: los que
+    ahora cumplen, los que dejaron de cumplir y los que cambiaron de
+    evidencia. Con format=csv o xlsx se descarga en streaming.
+    """
+    if format != "json" and format not in DIFF_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no soportado. Permitidos: json, {', '.join(DIFF_FORMATS)}"
+        )
+    
+    audits = {audit.id: audit for audit in db.query(Audit).filter(Audit.id.in_([base_id, target_id]))}
+    for audit_id in (base_id, target_id):
+        if audit_id not in audits:
+            raise HTTPException(status_code=404, detail=f"Auditoría {audit_id} no encontrada")
+        if audits[audit_id].status != "completed":
+            raise HTTPException(status_code=400, detail=f"Auditoría {audit_id} no completada")
+    
+    diff = AuditDiff(audits[base_id], audits[target_id])
+    
+    if format in DIFF_FORMATS:
+        media_type, extension = DIFF_FORMATS[format]
+        stream = diff.stream_csv() if format == "csv" else diff.stream_xlsx()
+        return StreamingResponse(
+            stream,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="Diferencias_Auditoria_{base_id}_{target_id}.{extension}"'}
+        )
+    
+    def build_body():
+        return compress_body(dumps_json(diff.build(db)), accept_encoding)
+    
+    body, encoding = await run_in_threadpool(build_body)
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/{audit_id}/revalidate")
+async def revalidate_evidence(
+    audit_id: int,
+    account: str = Depends(get_drive_account),
+    db: Session = Depends(get_db)
+):
+    """
+    Comprueba que los archivos de evidencia siguen existiendo y actualiza
+    sus nombres y tamaños con peticiones batch a Google Drive, con la misma
+    cuenta con la que se ejecutó la auditoría
+    """
+    audit = db.query(Audit).filter(Audit.id == audit_id).first()
+    
+    if not audit:
+        raise HTTPException(status_code=404, detail="Auditoría no encontrada")
+    
+    google_drive_service = get_google_drive_service(audit.drive_account or account)
+    
+    if audit.status != "completed":
+        raise HTTPException(status_code=400, detail="Auditoría no completada")
+    
+    if not google_drive_service.ensure_authenticated():
+        raise HTTPException(
+            status_code=401, 
+            detail="No autenticado con Google Drive. Por favor autentícate primero en /api/auth/login"
+        )
+    
+    results = db.query(AuditResult).filter(
+        AuditResult.audit_id == audit.id,
+        AuditResult.matched_files.isnot(None)
+    ).all()
+    
+    evidence = {result.id: json.loads(result.matched_files) for result in results}
+    file_ids = [
+        f['id'] for files in evidence.values() for f in files
+        if f.get('path') == 'Google Drive'
+    ]
+    
+    try:
+        metadata = await run_in_threadpool(google_drive_service.get_files_metadata, file_ids)
+    except DriveQuotaExceededError as e:
+        raise _quota_exceeded(e)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error consultando Google Drive: {str(e)}")
+    
+    missing_files = 0
+    updated_files = 0
+    
+    for result in results:
+        refreshed = []
+        for f in evidence[result.id]:
+            if f.get('path') != 'Google Drive' or f['id'] not in metadata:
+                refreshed.append(f)
+                continue
+            
+            current = metadata[f['id']]
+            if current is None:
+                missing_files += 1
+                continue
+            
+            updated = {
+                **f,
+                'name': current.get('name', f['name']),
+                'size': int(current.get('size', 0)),
+                'web_url': current.get('webViewLink', f.get('web_url', '')),
+                'modified_datetime': current.get('modifiedTime', f.get('modified_datetime', ''))
+            }
+            if updated != f:
+                updated_files += 1
+            refreshed.append(updated)
+        
+        result.found = len(refreshed) > 0
+        result.matched_files = json.dumps(refreshed, ensure_ascii=False) if refreshed else None
+        result.notes = f"Se encontraron {len(refreshed)} archivos" if result.found else "No se encontraron archivos"
+    
+    db.flush()
+    
+    compliant_items = db.query(AuditResult).filter(
+        AuditResult.audit_id == audit.id,
+        AuditResult.found.is_(True)
+    ).count()
+    audit.compliant_items = compliant_items
+    audit.compliance_rate = round((compliant_items / audit.total_items) * 100, 2) if audit.total_items > 0 else 0
+    
+    # El reporte anterior ya no refleja la evidencia; se regenera en la próxima descarga
+    audit.report_path = None
+    report_jobs.discard(audit.id)
+    
+    analytics = AnalyticsService(db)
+    analytics.record_audit(audit, analytics.outcomes(audit))
+    
+    db.commit()
+    
+    return {
+        "message": "Evidencia revalidada",
+        "audit_id": audit.id,
+        "checked_files": len(set(file_ids)),
+        "missing_files": missing_files,
+        "updated_files": updated_files,
+        "batch_requests": -(-len(set(file_ids)) // google_drive_service.BATCH_SIZE),
+        "compliance_rate": audit.compliance_rate,
+        "compliant_items": compliant_items,
+        "total_items": audit.total_items
+    }
+
+
 @router.get("/history", response_model=AuditHistoryResponse)
 async def get_audit_history(db: Session = Depends(get_db)):
     """
@@ -175,8 +607,11 @@ async def delete_audit(audit_id: int, db: Session = Depends(get_db)):
         except Exception as e:
             print(f"Error eliminando archivo de reporte: {e}")
     
+    report_jobs.discard(audit_id)
+    AnalyticsService(db).forget_audit(audit)
     db.delete(audit)
     db.commit()
+    audit_events.forget(audit_id)
     
     return {
         "message": "Auditoría eliminada exitosamente",
@@ -1,23 +1,155 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from fastapi.responses import HTMLResponse
-from app.services.google_drive_service import GoogleDriveService
+from typing import Dict, List, Optional
+from app.services.drive_pool import drive_pool
+from app.services.google_drive_service import DEFAULT_ACCOUNT
+from app.services.local_folder_service import LocalFolderService
+from app.services.oauth_state import oauth_states
 from app.config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-_google_drive_service = None
+_onedrive_service = None
+_local_folder_service = None
 
-def get_google_drive_service():
-    global _google_drive_service
-    if _google_drive_service is None:
-        _google_drive_service = GoogleDriveService()
-    return _google_drive_service
+DEFAULT_PROVIDERS = ["google_drive"]
+
+
+def get_drive_account(x_drive_account: Optional[str] = Header(None)) -> str:
+    """
+    Cuenta de Google Drive del request (cabecera X-Drive-Account)
+    """
+    return (x_drive_account or "").strip() or DEFAULT_ACCOUNT
+
+
+def get_google_drive_service(account: Optional[str] = None):
+    return drive_pool.get(account)
+
+
+def get_onedrive_service(account: Optional[str] = None):
+    global _onedrive_service
+    if _onedrive_service is None:
+        from app.services.onedrive_service import OneDriveService
+        _onedrive_service = OneDriveService()
+    return _onedrive_service
+
+
+def get_local_folder_service(account: Optional[str] = None):
+    global _local_folder_service
+    if _local_folder_service is None:
+        _local_folder_service = LocalFolderService()
+    return _local_folder_service
+
+
+PROVIDER_FACTORIES = {
+    "google_drive": get_google_drive_service,
+    "onedrive": get_onedrive_service,
+    "local_folder": get_local_folder_service,
+}
+
+
+def get_provider_services(names: Optional[List[str]] = None, account: Optional[str] = None) -> Dict[str, object]:
+    """
+    Servicios de los proveedores de evidencia pedidos, autenticados con la
+    cuenta indicada (solo Google Drive distingue cuentas)
+    """
+    names = list(dict.fromkeys(names or DEFAULT_PROVIDERS))
+    
+    unknown = [name for name in names if name not in PROVIDER_FACTORIES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Proveedores no soportados: {unknown}. Permitidos: {', '.join(PROVIDER_FACTORIES)}"
+        )
+    
+    services = {}
+    for name in names:
+        try:
+            service = PROVIDER_FACTORIES[name](account)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"No se pudo inicializar el proveedor {name}: {str(e)}")
+        
+        if not service.ensure_authenticated():
+            if name == "google_drive":
+                detail = (
+                    f"La cuenta {account or DEFAULT_ACCOUNT} no está autenticada con Google Drive. "
+                    "Por favor autentícate primero en /api/auth/login"
+                )
+            else:
+                detail = f"El proveedor {name} no está disponible o no está autenticado"
+            raise HTTPException(status_code=401, detail=detail)
+        
+        services[name] = service
+    
+    return services
+
+
+def _auth_error_page(message: str, status_code: int = 200) -> HTMLResponse:
+    """
+    Página de error del popup de login: avisa a la ventana que lo abrió y se cierra
+    """
+    html_content = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Error de autenticacion</title>
+        <style>
+            body {
+                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
+                display: flex;
+                justify-content: center;
+                align-items: center;
+                height: 100vh;
+                margin: 0;
+                background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
+            }
+            .container {
+                text-align: center;
+                background: white;
+                padding: 40px;
+                border-radius: 12px;
+                box-shadow: 0 10px 40px rgba(0,0,0,0.1);
+            }
+            .error-icon {
+                font-size: 64px;
+                color: #ef4444;
+                margin-bottom: 20px;
+            }
+            h1 {
+                color: #dc2626;
+                margin-bottom: 10px;
+            }
+            p {
+                color: #6b7280;
+                font-size: 14px;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="error-icon">X</div>
+            <h1>Error de autenticacion</h1>
+            <p>{message}</p>
+        </div>
+        <script>
+            if (window.opener) {
+                window.opener.postMessage({ type: 'auth_error' }, '*');
+            }
+            setTimeout(function() {
+                window.close();
+            }, 3000);
+        </script>
+    </body>
+    </html>
+    """
+    return HTMLResponse(content=html_content.replace("{message}", message), status_code=status_code)
 
 
 @router.get("/login")
-async def login():
-    service = get_google_drive_service()
-    auth_url = service.get_auth_url()
+async def login(account: Optional[str] = Query(None, description="Cuenta a autenticar (por defecto la cuenta por defecto)")):
+    service = get_google_drive_service(account)
+    # La cuenta queda del lado del servidor; a Google solo viaja un estado aleatorio
+    auth_url = service.get_auth_url(oauth_states.issue(service.account))
     
     return {
         "auth_url": auth_url,
@@ -26,122 +158,19 @@ async def login():
 
 
 @router.get("/callback")
-async def auth_callback(code: str = None, error: str = None):
+async def auth_callback(code: str = None, error: str = None, state: str = None):
     if error:
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Error de autenticacion</title>
-            <style>
-                body {
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    margin: 0;
-                    background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-                }
-                .container {
-                    text-align: center;
-                    background: white;
-                    padding: 40px;
-                    border-radius: 12px;
-                    box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-                }
-                .error-icon {
-                    font-size: 64px;
-                    color: #ef4444;
-                    margin-bottom: 20px;
-                }
-                h1 {
-                    color: #dc2626;
-                    margin-bottom: 10px;
-                }
-                p {
-                    color: #6b7280;
-                    font-size: 14px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="error-icon">X</div>
-                <h1>Error de autenticacion</h1>
-                <p>No se pudo conectar con Google Drive. Por favor intenta de nuevo.</p>
-            </div>
-            <script>
-                if (window.opener) {
-                    window.opener.postMessage({ type: 'auth_error' }, '*');
-                }
-                setTimeout(function() {
-                    window.close();
-                }, 3000);
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content)
+        return _auth_error_page("No se pudo conectar con Google Drive. Por favor intenta de nuevo.")
     
     if not code:
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Error de autenticacion</title>
-            <style>
-                body {
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    margin: 0;
-                    background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-                }
-                .container {
-                    text-align: center;
-                    background: white;
-                    padding: 40px;
-                    border-radius: 12px;
-                    box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-                }
-                .error-icon {
-                    font-size: 64px;
-                    color: #ef4444;
-                    margin-bottom: 20px;
-                }
-                h1 {
-                    color: #dc2626;
-                    margin-bottom: 10px;
-                }
-                p {
-                    color: #6b7280;
-                    font-size: 14px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="error-icon">X</div>
-                <h1>Error de autenticacion</h1>
-                <p>No se recibio codigo de autorizacion.</p>
-            </div>
-            <script>
-                if (window.opener) {
-                    window.opener.postMessage({ type: 'auth_error' }, '*');
-                }
-                setTimeout(function() {
-                    window.close();
-                }, 3000);
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content)
+        return _auth_error_page("No se recibio codigo de autorizacion.")
+    
+    # Un estado desconocido, vencido o ya usado no viene de un /auth/login de este servidor
+    account = oauth_states.consume(state)
+    if account is None:
+        return _auth_error_page("La sesion de autenticacion no es valida o ya vencio. Por favor intenta de nuevo.", 400)
     
-    service = get_google_drive_service()
+    service = get_google_drive_service(account)
     success = service.authenticate_with_code(code)
     
     if success:
@@ -201,74 +230,30 @@ async def auth_callback(code: str = None, error: str = None):
         """
         return HTMLResponse(content=html_content)
     else:
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Error de autenticacion</title>
-            <style>
-                body {
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    margin: 0;
-                    background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-                }
-                .container {
-                    text-align: center;
-                    background: white;
-                    padding: 40px;
-                    border-radius: 12px;
-                    box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-                }
-                .error-icon {
-                    font-size: 64px;
-                    color: #ef4444;
-                    margin-bottom: 20px;
-                }
-                h1 {
-                    color: #dc2626;
-                    margin-bottom: 10px;
-                }
-                p {
-                    color: #6b7280;
-                    font-size: 14px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="error-icon">X</div>
-                <h1>Error de autenticacion</h1>
-                <p>No se pudo conectar con Google Drive. Por favor intenta de nuevo.</p>
-            </div>
-            <script>
-                if (window.opener) {
-                    window.opener.postMessage({ type: 'auth_error' }, '*');
-                }
-                setTimeout(function() {
-                    window.close();
-                }, 3000);
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content)
+        return _auth_error_page("No se pudo conectar con Google Drive. Por favor intenta de nuevo.")
 
 
 @router.get("/status")
-async def auth_status():
-    service = get_google_drive_service()
+async def auth_status(account: str = Depends(get_drive_account)):
+    service = get_google_drive_service(account)
     
     if service.ensure_authenticated():
         return {
             "authenticated": True,
+            "account": account,
             "message": "Usuario autenticado con Google Drive"
         }
     else:
         return {
             "authenticated": False,
+            "account": account,
             "message": "Usuario no autenticado"
-        }
\ No newline at end of file
+        }
+
+
+@router.get("/accounts")
+async def list_accounts():
+    """
+    Cuentas de Google Drive con cliente activo en este worker
+    """
+    return drive_pool.metrics()
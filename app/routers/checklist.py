@@ -1,10 +1,13 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
+from app.models.audit import ChecklistTemplate
+from app.services.bulk_import import bulk_importer
 from app.services.checklist_processor import ChecklistProcessor
 from app.config import settings
 from app.utils.file_utils import validate_file, save_upload_file
-import os
+from typing import List
 
 router = APIRouter(prefix="/checklist", tags=["Checklist"])
 
@@ -31,11 +34,69 @@ async def upload_checklist(
         return {
             "message": "Checklist procesado exitosamente",
             "audit_id": audit.id,
-            "total_items": audit.total_items
+            "total_items": audit.total_items,
+            "template_id": audit.template_id,
+            "template_version": audit.template.version,
+            "reused_template": processor.reused_template
         }
     
     except Exception as e:
-        # Eliminar archivo si hay error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Error procesando checklist: {str(e)}")
\ No newline at end of file
+        db.rollback()
+        # El archivo no se elimina: su nombre es el hash del contenido y puede
+        # ser el de otra subida en curso o ya procesada. storage_manager lo
+        # elimina por LRU si hace falta espacio.
+        raise HTTPException(status_code=500, detail=f"Error procesando checklist: {str(e)}")
+
+
+@router.post("/bulk-upload")
+async def bulk_upload_checklists(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Importa varios libros de Excel (o zips con libros): cada hoja es un
+    checklist con su propia auditoría. Los libros se leen en paralelo y el
+    resultado se informa por archivo y por hoja; un archivo con errores no
+    impide importar los demás.
+    """
+    if len(files) > settings.BULK_IMPORT_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten como máximo {settings.BULK_IMPORT_MAX_FILES} archivos por importación"
+        )
+    
+    # Se leen desde su archivo temporal, validando extensión y tamaño antes de cargarlos
+    entries = []
+    for file in files:
+        entries.extend(await run_in_threadpool(bulk_importer.collect, file.filename, file.file, file.size))
+    
+    await bulk_importer.parse(entries)
+    report = await run_in_threadpool(bulk_importer.store, db, entries)
+    
+    return {"message": "Importación procesada", **report}
+
+
+@router.get("/templates")
+async def list_templates(db: Session = Depends(get_db)):
+    """
+    Lista las plantillas de checklist con sus versiones
+    """
+    templates = db.query(ChecklistTemplate).order_by(
+        ChecklistTemplate.name,
+        ChecklistTemplate.version.desc()
+    ).all()
+    
+    return {
+        "templates": [
+            {
+                "id": template.id,
+                "name": template.name,
+                "version": template.version,
+                "total_items": template.total_items,
+                "content_hash": template.content_hash,
+                "created_at": template.created_at
+            }
+            for template in templates
+        ],
+        "total": len(templates)
+    }
\ No newline at end of file
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from app.services.drive_scheduler import drive_scheduler
+from app.services.keyword_cache import keyword_cache
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/drive")
+async def get_drive_metrics():
+    """
+    Contadores del planificador de peticiones a Google Drive (cuota, reintentos, esperas)
+    """
+    return drive_scheduler.metrics()
+
+
+@router.get("/keyword-cache")
+async def get_keyword_cache_metrics():
+    """
+    Aciertos, fallos y ocupación de la caché de resultados por palabras clave
+    """
+    return keyword_cache.metrics()
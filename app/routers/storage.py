@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+from app.services.storage_manager import storage_manager, compact_storage
+
+router = APIRouter(prefix="/storage", tags=["Storage"])
+
+
+@router.get("/usage")
+async def get_storage_usage():
+    """
+    Espacio ocupado por uploads y reportes frente al presupuesto configurado
+    """
+    usage = await run_in_threadpool(storage_manager.usage)
+    
+    return {
+        **usage,
+        "last_compaction": storage_manager.last_compaction
+    }
+
+
+@router.post("/compact")
+async def compact_storage_now():
+    """
+    Ejecuta la compactación de almacenamiento y devuelve el espacio recuperado
+    """
+    return await run_in_threadpool(compact_storage)
@@ -1,5 +1,6 @@
 from app.schemas.audit import (
     AuditCreate,
+    AuditBatchRequest,
     AuditResponse,
     AuditStatusResponse,
     AuditHistoryResponse,
@@ -9,6 +10,7 @@ from app.schemas.audit import (
 
 __all__ = [
     "AuditCreate",
+    "AuditBatchRequest",
     "AuditResponse",
     "AuditStatusResponse",
     "AuditHistoryResponse",
@@ -9,6 +9,12 @@ class ChecklistItemSchema(BaseModel):
     description: str
     keywords: str
     is_mandatory: bool
+    folder_ids: Optional[str] = None
+    modified_after: Optional[str] = None
+    modified_before: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    mime_types: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -29,9 +35,17 @@ class AuditCreate(BaseModel):
     filename: str
 
 
+class AuditBatchRequest(BaseModel):
+    audit_ids: List[int]
+    providers: Optional[List[str]] = None
+
+
 class AuditResponse(BaseModel):
     id: int
     filename: str
+    template_id: Optional[int] = None
+    folder_ids: Optional[str] = None
+    drive_account: Optional[str] = None
     status: str
     compliance_rate: float
     total_items: int
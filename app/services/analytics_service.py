@@ -0,0 +1,297 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.audit import Audit, AuditResult, ChecklistItem
+from app.models.analytics import AuditSummary, ItemOutcomeStat
+
+# Inicio del periodo (lunes en las semanas) como YYYY-MM-DD, igual que date_trunc de PostgreSQL
+SQLITE_PERIOD_MODIFIERS = {
+    "day": (),
+    "week": ("weekday 0", "-6 days"),
+    "month": ("start of month",),
+}
+
+# Filas por INSERT de varias filas (SQLite admite pocos parámetros por sentencia)
+INSERT_CHUNK_ROWS = 500
+
+
+def checklist_name(audit: Audit) -> str:
+    """
+    Nombre con el que se agrupan las auditorías de un mismo checklist
+    """
+    if audit.template_id is not None:
+        return audit.template.name
+    return audit.filename
+
+
+class AnalyticsService:
+    """
+    Mantiene las tablas de resumen de cumplimiento y responde las consultas
+    de tendencias con agregados SQL sobre ellas
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def outcomes(self, audit: Audit) -> List[Tuple[ChecklistItem, bool]]:
+        """
+        Resultado de cada requisito de la auditoría leído de la BD, con solo las
+        columnas que usan los resúmenes
+        """
+        rows = self.db.query(
+            ChecklistItem.id,
+            ChecklistItem.item_id,
+            ChecklistItem.description,
+            ChecklistItem.is_mandatory
+        ).filter(audit.items_clause()).order_by(ChecklistItem.id).all()
+
+        found_by_item = {
+            item_pk: found for item_pk, found in
+            self.db.query(AuditResult.checklist_item_id, AuditResult.found).filter(AuditResult.audit_id == audit.id)
+        }
+        return [(row, bool(found_by_item.get(row.id))) for row in rows]
+
+    def _insert_missing(self, table, rows: List[Dict], index_elements: List[str]):
+        """
+        Inserta las filas que aún no existen según la restricción única
+        `index_elements`, sin fallar si otra transacción las insertó primero
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+                self.db.execute(
+                    insert(table)
+                    .values(rows[start:start + INSERT_CHUNK_ROWS])
+                    .on_conflict_do_nothing(index_elements=index_elements)
+                )
+            return
+
+        for row in rows:
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(table.insert().values(**row))
+            except IntegrityError:
+                pass
+
+    def _adjust_stats(self, name: str, deltas: Iterable[Dict], now: Optional[datetime] = None):
+        """
+        Suma en SQL (no leyendo y reescribiendo en Python) los deltas de
+        evaluaciones y fallas de cada requisito, para que dos auditorías
+        concurrentes del mismo checklist no pierdan incrementos. Los
+        contadores no bajan de 0.
+        """
+        stats = ItemOutcomeStat.__table__
+        values = {
+            "evaluations": case(
+                (stats.c.evaluations + bindparam("b_evaluations") < 0, 0),
+                else_=stats.c.evaluations + bindparam("b_evaluations")
+            ),
+            "failures": case(
+                (stats.c.failures + bindparam("b_failures") < 0, 0),
+                else_=stats.c.failures + bindparam("b_failures")
+            )
+        }
+        if now is not None:
+            values.update(description=bindparam("b_description"), last_evaluated_at=now)
+
+        params = list(deltas)
+        if not params:
+            return
+        self.db.execute(
+            update(stats)
+            .where(stats.c.checklist_name == name, stats.c.item_id == bindparam("b_item_id"))
+            .values(**values),
+            params
+        )
+
+    def record_audit(self, audit: Audit, outcomes: List[Tuple[ChecklistItem, bool]]):
+        """
+        Actualiza el resumen de una auditoría completada. No hace commit: se
+        guarda en la misma transacción que los resultados.
+
+        Si la auditoría ya tenía resumen (se volvió a ejecutar o se revalidó)
+        primero se descuenta su contribución anterior a las estadísticas por requisito.
+        """
+        name = checklist_name(audit)
+        now = datetime.utcnow()
+
+        # El resumen se crea vacío si falta y se bloquea: dos ejecuciones de la
+        # misma auditoría no descuentan dos veces la contribución anterior
+        self._insert_missing(AuditSummary.__table__, [{"audit_id": audit.id, "checklist_name": name}], ["audit_id"])
+        summary = self.db.query(AuditSummary).filter(
+            AuditSummary.audit_id == audit.id
+        ).with_for_update().populate_existing().one()
+
+        # Un resumen recién creado todavía no tiene la lista de fallas
+        if summary.failed_item_ids is not None:
+            self._discount(summary, [item.item_id for item, _ in outcomes])
+
+        counts = {"mandatory_total": 0, "mandatory_compliant": 0, "optional_total": 0, "optional_compliant": 0}
+        failed = []
+        deltas = {}
+
+        for item, found in outcomes:
+            group = "mandatory" if item.is_mandatory else "optional"
+            counts[f"{group}_total"] += 1
+            if found:
+                counts[f"{group}_compliant"] += 1
+            else:
+                failed.append(item.item_id)
+
+            # Una evaluación por item_id y auditoría aunque el checklist lo
+            # repita, igual que en _discount: falla si falla alguna aparición
+            delta = deltas.setdefault(item.item_id, {
+                "b_item_id": item.item_id,
+                "b_description": item.description,
+                "b_evaluations": 1,
+                "b_failures": 0
+            })
+            if not found:
+                delta["b_failures"] = 1
+
+        self._insert_missing(
+            ItemOutcomeStat.__table__,
+            [
+                {"checklist_name": name, "item_id": item_id, "evaluations": 0, "failures": 0}
+                for item_id in deltas
+            ],
+            ["checklist_name", "item_id"]
+        )
+        self._adjust_stats(name, deltas.values(), now)
+
+        total = len(outcomes)
+        compliant = total - len(failed)
+
+        summary.template_id = audit.template_id
+        summary.checklist_name = name
+        summary.completed_at = now
+        summary.total_items = total
+        summary.compliant_items = compliant
+        summary.compliance_rate = round((compliant / total) * 100, 2) if total > 0 else 0
+        summary.failed_item_ids = json.dumps(failed, ensure_ascii=False)
+        for key, value in counts.items():
+            setattr(summary, key, value)
+
+    def _discount(self, summary: AuditSummary, item_ids: Iterable[str]):
+        """
+        Descuenta de las estadísticas por requisito la contribución anterior de
+        una auditoría (solo de los requisitos que ya tienen estadística): una
+        evaluación por item_id, y una falla si el item_id estaba entre las fallas
+        """
+        previous_failed = set(json.loads(summary.failed_item_ids or "[]"))
+        self._adjust_stats(summary.checklist_name, [
+            {
+                "b_item_id": item_id,
+                "b_evaluations": -1,
+                "b_failures": -1 if item_id in previous_failed else 0
+            }
+            for item_id in dict.fromkeys(item_ids)
+        ])
+
+    def forget_audit(self, audit: Audit):
+        """
+        Quita una auditoría eliminada de los resúmenes
+        """
+        summary = self.db.query(AuditSummary).filter(
+            AuditSummary.audit_id == audit.id
+        ).with_for_update().first()
+        if summary is None:
+            return
+
+        self._discount(summary, [item.item_id for item in audit.items])
+        self.db.delete(summary)
+
+    def _period(self, interval: str):
+        """
+        Inicio del periodo como YYYY-MM-DD, con el mismo formato en PostgreSQL y SQLite
+        """
+        column = AuditSummary.completed_at
+        if self.db.get_bind().dialect.name == "postgresql":
+            return func.to_char(func.date_trunc(interval, column), "YYYY-MM-DD")
+        return func.date(column, *SQLITE_PERIOD_MODIFIERS[interval])
+
+    def compliance_trend(self, interval: str = "month", checklist: Optional[str] = None) -> List[Dict]:
+        period = self._period(interval).label("period")
+        query = self.db.query(
+            AuditSummary.checklist_name,
+            period,
+            func.count(AuditSummary.id).label("audits"),
+            func.sum(AuditSummary.compliant_items).label("compliant_items"),
+            func.sum(AuditSummary.total_items).label("total_items"),
+            func.avg(AuditSummary.compliance_rate).label("average_rate")
+        )
+        if checklist:
+            query = query.filter(AuditSummary.checklist_name == checklist)
+
+        rows = query.group_by(AuditSummary.checklist_name, period).order_by(
+            AuditSummary.checklist_name, period
+        ).all()
+
+        return [
+            {
+                "checklist": row.checklist_name,
+                "period": row.period,
+                "audits": row.audits,
+                "compliance_rate": round(row.compliant_items * 100 / row.total_items, 2) if row.total_items else 0,
+                "average_audit_rate": round(row.average_rate or 0, 2)
+            }
+            for row in rows
+        ]
+
+    def top_failing_items(self, checklist: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        query = self.db.query(ItemOutcomeStat).filter(ItemOutcomeStat.failures > 0)
+        if checklist:
+            query = query.filter(ItemOutcomeStat.checklist_name == checklist)
+
+        rows = query.order_by(ItemOutcomeStat.failures.desc(), ItemOutcomeStat.evaluations).limit(limit).all()
+
+        return [
+            {
+                "checklist": row.checklist_name,
+                "item_id": row.item_id,
+                "description": row.description,
+                "failures": row.failures,
+                "evaluations": row.evaluations,
+                "failure_rate": round(row.failures * 100 / row.evaluations, 2) if row.evaluations else 0,
+                "last_evaluated_at": row.last_evaluated_at
+            }
+            for row in rows
+        ]
+
+    def mandatory_vs_optional(self, checklist: Optional[str] = None) -> Dict:
+        query = self.db.query(
+            func.count(AuditSummary.id).label("audits"),
+            func.coalesce(func.sum(AuditSummary.mandatory_total), 0).label("mandatory_total"),
+            func.coalesce(func.sum(AuditSummary.mandatory_compliant), 0).label("mandatory_compliant"),
+            func.coalesce(func.sum(AuditSummary.optional_total), 0).label("optional_total"),
+            func.coalesce(func.sum(AuditSummary.optional_compliant), 0).label("optional_compliant")
+        )
+        if checklist:
+            query = query.filter(AuditSummary.checklist_name == checklist)
+
+        row = query.one()
+
+        def rate(compliant, total):
+            return round(compliant * 100 / total, 2) if total else 0
+
+        return {
+            "checklist": checklist,
+            "audits": row.audits,
+            "mandatory": {
+                "total": row.mandatory_total,
+                "compliant": row.mandatory_compliant,
+                "compliance_rate": rate(row.mandatory_compliant, row.mandatory_total)
+            },
+            "optional": {
+                "total": row.optional_total,
+                "compliant": row.optional_compliant,
+                "compliance_rate": rate(row.optional_compliant, row.optional_total)
+            }
+        }
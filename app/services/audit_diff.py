@@ -0,0 +1,251 @@
+import csv
+import io
+import json
+import tempfile
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.audit import Audit, AuditResult, ChecklistItem
+
+# Tipos de cambio entre la auditoría base y la comparada
+NEWLY_COMPLIANT = "newly_compliant"
+NEWLY_NON_COMPLIANT = "newly_non_compliant"
+EVIDENCE_CHANGED = "evidence_changed"
+ADDED_ITEM = "added_item"
+REMOVED_ITEM = "removed_item"
+
+CHANGE_TYPES = [NEWLY_COMPLIANT, NEWLY_NON_COMPLIANT, EVIDENCE_CHANGED, ADDED_ITEM, REMOVED_ITEM]
+
+CHANGE_LABELS = {
+    NEWLY_COMPLIANT: "Ahora cumple",
+    NEWLY_NON_COMPLIANT: "Dejó de cumplir",
+    EVIDENCE_CHANGED: "Cambió la evidencia",
+    ADDED_ITEM: "Requisito nuevo",
+    REMOVED_ITEM: "Requisito eliminado",
+}
+
+
+def _matched_files(raw: Optional[str]) -> Dict[str, str]:
+    """
+    Archivos de un resultado por ID -> nombre
+    """
+    if not raw:
+        return {}
+    try:
+        return {f.get('id') or f.get('name'): f.get('name', '') for f in json.loads(raw)}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+class AuditDiff:
+    """
+    Compara los resultados de dos auditorías emparejando requisitos por item_id.
+
+    Todo se resuelve en una sola consulta: la unión de los item_id de ambas
+    auditorías unida (LEFT JOIN) a los requisitos y resultados de cada una,
+    filtrando en SQL las filas sin cambios. No usa FULL OUTER JOIN ni
+    funciones de ventana para funcionar también en SQLite antiguo y MySQL.
+
+    Si un checklist repite un item_id, de cada auditoría se toma solo el
+    primer requisito con ese item_id: si no, el join multiplicaría las filas.
+    """
+    CSV_COLUMNS = [
+        "item_id", "change", "description",
+        "base_found", "target_found", "added_files", "removed_files"
+    ]
+
+    def __init__(self, base: Audit, target: Audit, chunk_rows: int = 1000):
+        self.base_id = base.id
+        self.target_id = target.id
+        self.base_clause = base.items_clause()
+        self.target_clause = target.items_clause()
+        self.chunk_rows = chunk_rows
+
+    def _side(self, audit_id: int, items_clause, name: str):
+        # correlate(None): la subconsulta lee checklist_items por su cuenta
+        first_items = (
+            select(func.min(ChecklistItem.id))
+            .where(items_clause)
+            .group_by(ChecklistItem.item_id)
+            .correlate(None)
+        )
+        return (
+            select(
+                ChecklistItem.item_id.label("item_id"),
+                ChecklistItem.description.label("description"),
+                AuditResult.found.label("found"),
+                AuditResult.matched_files.label("matched_files")
+            )
+            .outerjoin(AuditResult, and_(
+                AuditResult.checklist_item_id == ChecklistItem.id,
+                AuditResult.audit_id == audit_id
+            ))
+            .where(items_clause, ChecklistItem.id.in_(first_items))
+            .subquery(name)
+        )
+
+    def _query(self):
+        base = self._side(self.base_id, self.base_clause, "base")
+        target = self._side(self.target_id, self.target_clause, "target")
+        keys = select(base.c.item_id).union(select(target.c.item_id)).subquery("keys")
+
+        return (
+            select(
+                keys.c.item_id,
+                base.c.item_id.label("base_item_id"),
+                target.c.item_id.label("target_item_id"),
+                base.c.description.label("base_description"),
+                target.c.description.label("target_description"),
+                base.c.found.label("base_found"),
+                target.c.found.label("target_found"),
+                base.c.matched_files.label("base_files"),
+                target.c.matched_files.label("target_files")
+            )
+            .select_from(keys)
+            .outerjoin(base, base.c.item_id == keys.c.item_id)
+            .outerjoin(target, target.c.item_id == keys.c.item_id)
+            .where(or_(
+                base.c.item_id.is_(None),
+                target.c.item_id.is_(None),
+                base.c.found.is_distinct_from(target.c.found),
+                base.c.matched_files.is_distinct_from(target.c.matched_files)
+            ))
+            .order_by(keys.c.item_id)
+            .execution_options(yield_per=self.chunk_rows)
+        )
+
+    @staticmethod
+    def _change(row) -> Optional[Dict]:
+        base_found = bool(row.base_found)
+        target_found = bool(row.target_found)
+
+        if row.base_item_id is None:
+            change = ADDED_ITEM
+        elif row.target_item_id is None:
+            change = REMOVED_ITEM
+        elif not base_found and target_found:
+            change = NEWLY_COMPLIANT
+        elif base_found and not target_found:
+            change = NEWLY_NON_COMPLIANT
+        else:
+            change = EVIDENCE_CHANGED
+
+        base_files = _matched_files(row.base_files)
+        target_files = _matched_files(row.target_files)
+        added = [name for file_id, name in target_files.items() if file_id not in base_files]
+        removed = [name for file_id, name in base_files.items() if file_id not in target_files]
+
+        # El JSON cambió solo en metadatos (tamaño, fecha): los archivos son los mismos
+        if change == EVIDENCE_CHANGED and not added and not removed:
+            return None
+
+        return {
+            "item_id": row.item_id,
+            "change": change,
+            "description": row.target_description if row.target_description is not None else row.base_description,
+            "base_found": None if row.base_item_id is None else base_found,
+            "target_found": None if row.target_item_id is None else target_found,
+            "added_files": added,
+            "removed_files": removed
+        }
+
+    def iter_changes(self, db: Session = None) -> Iterator[Dict]:
+        """
+        Cambios en orden de item_id. Sin `db` usa una sesión propia, para los
+        streams que se envían después de cerrar la sesión del request
+        """
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            for row in db.execute(self._query()):
+                change = self._change(row)
+                if change is not None:
+                    yield change
+        finally:
+            if own_session:
+                db.close()
+
+    def build(self, db: Session) -> Dict:
+        changes = list(self.iter_changes(db))
+        summary = {change_type: 0 for change_type in CHANGE_TYPES}
+        for change in changes:
+            summary[change["change"]] += 1
+        return {
+            "base_audit_id": self.base_id,
+            "target_audit_id": self.target_id,
+            "summary": summary,
+            "changes": changes
+        }
+
+    def _csv_row(self, change: Dict) -> List:
+        return [
+            change["item_id"],
+            CHANGE_LABELS[change["change"]],
+            change["description"],
+            _yes_no(change["base_found"]),
+            _yes_no(change["target_found"]),
+            "; ".join(change["added_files"]),
+            "; ".join(change["removed_files"])
+        ]
+
+    def stream_csv(self) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.CSV_COLUMNS)
+
+        # BOM para que Excel detecte UTF-8
+        yield "\ufeff".encode("utf-8") + buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+        pending = 0
+        for change in self.iter_changes():
+            writer.writerow(self._csv_row(change))
+            pending += 1
+            if pending >= self.chunk_rows:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        if pending:
+            yield buffer.getvalue().encode("utf-8")
+
+    def stream_xlsx(self, chunk_bytes: int = 65536) -> Iterator[bytes]:
+        """
+        Libro de diferencias en modo write-only (memoria constante por fila).
+        El formato zip de XLSX solo se cierra al final, así que el libro se
+        arma en un archivo temporal y luego se envía por bloques.
+        """
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Diferencias")
+        ws.append([f"Auditoría base: {self.base_id}", f"Auditoría comparada: {self.target_id}"])
+        ws.append([])
+        ws.append([
+            "ID", "Cambio", "Descripción", "Cumplía", "Cumple",
+            "Archivos nuevos", "Archivos que ya no están"
+        ])
+        for change in self.iter_changes():
+            row = self._csv_row(change)
+            row[5] = "\n".join(change["added_files"])
+            row[6] = "\n".join(change["removed_files"])
+            ws.append(row)
+
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+            wb.save(f)
+            f.seek(0)
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _yes_no(value: Optional[bool]) -> str:
+    if value is None:
+        return "-"
+    return "Sí" if value else "No"
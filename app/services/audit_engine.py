@@ -0,0 +1,395 @@
+import json
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.audit import Audit, AuditResult, ChecklistItem
+from app.services.analytics_service import AnalyticsService
+from app.services.drive_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from app.services.event_bus import AuditEventBus, audit_events
+from app.services.evidence_filters import ItemConstraints
+from app.services.folder_index import (
+    FolderIndexCache,
+    FolderScope,
+    UnknownFolderError,
+    folder_indexes,
+    parse_folder_ids
+)
+from app.services.inventory import InventorySnapshot, KeywordKey, normalize_keywords, parse_keywords
+from app.services.keyword_expression import expression_terms, is_expression, item_key, match_key, matched_terms
+from app.services.keyword_cache import KeywordResultCache, keyword_cache
+
+
+class AuditEngine:
+    """
+    Ejecuta auditorías de checklists contra snapshots del inventario de uno o
+    varios proveedores y publica el progreso en el bus de eventos
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        providers: Dict[str, object],
+        event_bus: AuditEventBus = audit_events,
+        keyword_cache: KeywordResultCache = keyword_cache,
+        folder_indexes: FolderIndexCache = folder_indexes
+    ):
+        self.db = db
+        self.providers = providers
+        self.event_bus = event_bus
+        self.keyword_cache = keyword_cache
+        self.folder_indexes = folder_indexes
+        # Resultados por (versión del snapshot, clave de palabras clave, carpetas, restricciones)
+        # dentro de esta ejecución; los snapshots completos además se comparten entre ejecuciones vía keyword_cache
+        self._matches: Dict[Tuple, Sequence[int]] = {}
+
+    def load_snapshots(
+        self,
+        keys: Set[KeywordKey],
+        priority: int,
+        require_hierarchy: bool = False
+    ) -> List[InventorySnapshot]:
+        """
+        Obtiene los inventarios de todos los proveedores en paralelo: la
+        latencia es la del proveedor más lento, no la suma
+        """
+        if len(self.providers) == 1:
+            snapshots = [
+                service.inventory_for_keywords(keys, priority=priority, require_hierarchy=require_hierarchy)
+                for service in self.providers.values()
+            ]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="inventory") as pool:
+                futures = [
+                    pool.submit(service.inventory_for_keywords, keys, priority=priority, require_hierarchy=require_hierarchy)
+                    for service in self.providers.values()
+                ]
+                snapshots = [future.result() for future in futures]
+
+        for snapshot in snapshots:
+            self.keyword_cache.observe(snapshot)
+
+        return snapshots
+
+    def run(self, audit: Audit, snapshots: Optional[List[InventorySnapshot]] = None) -> Dict:
+        """
+        Procesa los requisitos de la auditoría y guarda los resultados. Si una
+        ejecución anterior quedó interrumpida, continúa desde su punto de control.
+        """
+        try:
+            if snapshots is None:
+                snapshots = self.load_snapshots(
+                    self._keyword_sets([audit]),
+                    PRIORITY_INTERACTIVE,
+                    require_hierarchy=self._is_scoped([audit])
+                )
+            return self._run(audit, snapshots)
+        except Exception as e:
+            self._mark_error(audit, e)
+            raise
+
+    def run_batch(self, audits: List[Audit]) -> List[Dict]:
+        """
+        Procesa varias auditorías contra un único snapshot por proveedor.
+
+        Cada conjunto de palabras clave se evalúa una sola vez y su resultado
+        se reparte entre todas las auditorías que lo usan. Un error en una
+        auditoría no detiene a las demás.
+        """
+        try:
+            keyword_sets = self._keyword_sets(audits)
+            snapshots = self.load_snapshots(keyword_sets, PRIORITY_BATCH, require_hierarchy=self._is_scoped(audits))
+        except Exception as e:
+            for audit in audits:
+                self._mark_error(audit, e)
+            raise
+
+        total_requirements = sum(self._total_items(audit) for audit in audits)
+        print(f"Lote de {len(audits)} auditorías: {total_requirements} requisitos, "
+              f"{len(keyword_sets)} conjuntos de palabras clave distintos\n")
+
+        summaries = []
+        for audit in audits:
+            try:
+                summaries.append(self._run(audit, snapshots))
+            except Exception as e:
+                self._mark_error(audit, e)
+                summaries.append({
+                    "audit_id": audit.id,
+                    "status": "error",
+                    "detail": str(e)
+                })
+
+        return summaries
+
+    def _positions(
+        self,
+        snapshot: InventorySnapshot,
+        key: KeywordKey,
+        scope: FolderScope = (),
+        constraints: Optional[ItemConstraints] = None
+    ) -> Sequence[int]:
+        memo_key = (snapshot.version, key, scope, constraints.key if constraints else ())
+        positions = self._matches.get(memo_key)
+        if positions is not None:
+            return positions
+
+        if not scope and constraints is None:
+            positions = self.keyword_cache.get(snapshot, key)
+            if positions is None:
+                positions = self.keyword_cache.put(snapshot, key, match_key(snapshot, key))
+        else:
+            index = self.folder_indexes.get(snapshot) if scope else None
+            unrestricted = self._matches.get((snapshot.version, key, (), ()))
+            if unrestricted is None:
+                unrestricted = self.keyword_cache.peek(snapshot, key)
+            if unrestricted is not None:
+                positions = [
+                    pos for pos in unrestricted
+                    if (index is None or index.contains(pos, scope))
+                    and (constraints is None or constraints.accepts(snapshot, pos))
+                ]
+            else:
+                # Solo se comparan palabras clave en el subárbol y el rango de fechas, no en todo el inventario
+                candidates = index.subtree_positions(scope) if index is not None else None
+                if constraints is not None:
+                    candidates = constraints.narrow(snapshot, candidates)
+                positions = match_key(snapshot, key, candidates)
+
+        self._matches[memo_key] = positions
+        return positions
+
+    def match(
+        self,
+        snapshots: List[InventorySnapshot],
+        keywords: List[str],
+        scope: FolderScope = (),
+        constraints: Optional[ItemConstraints] = None,
+        key: Optional[Tuple] = None
+    ) -> List[Dict]:
+        """
+        Archivos de todos los proveedores que cumplen las palabras clave (dentro
+        de las carpetas del alcance y con las restricciones de fecha y tipo, si
+        se indican), sin duplicados y reutilizando evaluaciones previas del
+        mismo conjunto normalizado. `key` es la expresión compilada del
+        requisito; sin ella las palabras clave se combinan con AND.
+        """
+        if key is None:
+            key = normalize_keywords(keywords)
+        expression = is_expression(key)
+        matched_files = []
+        seen = set()
+
+        for snapshot in snapshots:
+            for pos in self._positions(snapshot, key, scope, constraints):
+                # En una expresión cada archivo informa los términos que él cumple
+                entry = snapshot.file_entry(
+                    pos,
+                    matched_terms(key, snapshot.normalized_names[pos]) if expression else list(keywords)
+                )
+                identity = (snapshot.source, entry['id'])
+                if identity in seen or (entry['web_url'] and entry['web_url'] in seen):
+                    continue
+                seen.add(identity)
+                if entry['web_url']:
+                    seen.add(entry['web_url'])
+                matched_files.append(entry)
+
+        return matched_files
+
+    def _keyword_sets(self, audits: List[Audit]) -> Set[KeywordKey]:
+        keys = set()
+        for audit in audits:
+            for keywords, compiled in self.db.query(
+                ChecklistItem.keywords,
+                ChecklistItem.keyword_expression
+            ).filter(audit.items_clause()).distinct():
+                keys.add(item_key(keywords, compiled))
+        return keys
+
+    def _is_scoped(self, audits: List[Audit]) -> bool:
+        """
+        True si alguna auditoría o alguno de sus requisitos está acotado por carpetas
+        """
+        for audit in audits:
+            if parse_folder_ids(audit.folder_ids):
+                return True
+            scoped_item = self.db.query(ChecklistItem.id).filter(
+                audit.items_clause(),
+                ChecklistItem.folder_ids.isnot(None)
+            ).first()
+            if scoped_item is not None:
+                return True
+        return False
+
+    def _check_folders(self, audit: Audit, snapshots: List[InventorySnapshot]):
+        """
+        Verifica que las carpetas de la auditoría y de sus requisitos existan en
+        el inventario de algún proveedor. Una carpeta desconocida (un ID mal
+        escrito) acotaría la búsqueda a nada y los requisitos quedarían como
+        NO CUMPLE sin ningún error.
+        """
+        folders = set(parse_folder_ids(audit.folder_ids))
+        for (raw_folders,) in self.db.query(ChecklistItem.folder_ids).filter(
+            audit.items_clause(),
+            ChecklistItem.folder_ids.isnot(None)
+        ).distinct():
+            folders.update(parse_folder_ids(raw_folders))
+        if not folders:
+            return
+
+        indexes = [self.folder_indexes.get(snapshot) for snapshot in snapshots]
+        unknown = sorted(folder for folder in folders if not any(folder in index for index in indexes))
+        if unknown:
+            raise UnknownFolderError(unknown)
+
+    def _total_items(self, audit: Audit) -> int:
+        return self.db.query(func.count(ChecklistItem.id)).filter(audit.items_clause()).scalar() or 0
+
+    def _mark_error(self, audit: Audit, error: Exception):
+        self.db.rollback()
+        audit.status = "error"
+        self.db.commit()
+        self.event_bus.publish(audit.id, "error", {"status": "error", "detail": str(error)})
+
+    def _start_point(self, audit: Audit, versions: str) -> Tuple[int, int, int]:
+        """
+        Devuelve (último requisito procesado, procesados, cumplidos). Si la
+        auditoría tiene punto de control se continúa desde ahí; si no, se
+        descartan los resultados de ejecuciones anteriores.
+        """
+        if audit.last_processed_item_id is None:
+            self.db.query(AuditResult).filter(AuditResult.audit_id == audit.id).delete(synchronize_session=False)
+            return 0, 0, 0
+
+        if audit.snapshot_version and audit.snapshot_version != versions:
+            print("  Aviso: el inventario cambió desde la ejecución interrumpida; "
+                  "los requisitos pendientes se evalúan con el inventario actual")
+
+        processed = self.db.query(func.count(AuditResult.id)).filter(AuditResult.audit_id == audit.id).scalar() or 0
+        compliant = self.db.query(func.count(AuditResult.id)).filter(
+            AuditResult.audit_id == audit.id,
+            AuditResult.found.is_(True)
+        ).scalar() or 0
+        return audit.last_processed_item_id, processed, compliant
+
+    def _run(self, audit: Audit, snapshots: List[InventorySnapshot]) -> Dict:
+        """
+        Evalúa los requisitos en lotes de AUDIT_COMMIT_BATCH_SIZE. Cada lote se
+        guarda junto con el punto de control, así que una auditoría interrumpida
+        se reanuda desde el último lote y la sesión nunca retiene más de un lote
+        de requisitos y resultados.
+        """
+        audit_id = audit.id
+        # Antes de tocar resultados o el punto de control
+        self._check_folders(audit, snapshots)
+        total_items = self._total_items(audit)
+        versions = ",".join(snapshot.version for snapshot in snapshots)
+        batch_size = max(1, settings.AUDIT_COMMIT_BATCH_SIZE)
+
+        last_item_id, processed, compliant_items = self._start_point(audit, versions)
+        resumed = processed > 0
+        audit.snapshot_version = versions
+        items_clause = audit.items_clause()
+        audit_scope = parse_folder_ids(audit.folder_ids)
+        # Los plazos relativos ("12m") se resuelven una vez por ejecución
+        now = datetime.now(timezone.utc)
+
+        self.event_bus.publish(audit_id, "started", {
+            "status": "processing",
+            "total_items": total_items,
+            "progress": int(processed * 100 / total_items) if total_items else 0,
+            "resumed_from": processed
+        })
+
+        if resumed:
+            print(f"Reanudando desde el requisito {processed + 1} de {total_items}...\n")
+        else:
+            print(f"Procesando {total_items} requisitos del checklist...\n")
+
+        while True:
+            batch = self.db.query(ChecklistItem).filter(
+                items_clause,
+                ChecklistItem.id > last_item_id
+            ).order_by(ChecklistItem.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            for item in batch:
+                processed += 1
+                print(f"  [{processed}/{total_items}] Requisito: {item.description}")
+
+                key = item_key(item.keywords, item.keyword_expression)
+                keywords = expression_terms(key) if is_expression(key) else parse_keywords(item.keywords)
+                print(f"    Palabras clave: {item.keywords if is_expression(key) else keywords}")
+
+                matched_files = self.match(
+                    snapshots,
+                    keywords,
+                    parse_folder_ids(item.folder_ids) or audit_scope,
+                    ItemConstraints.from_item(item, now),
+                    key=key
+                )
+
+                found = len(matched_files) > 0
+
+                if found:
+                    compliant_items += 1
+                    print(f"    CUMPLE - Se encontraron {len(matched_files)} archivo(s)")
+                else:
+                    print(f"    NO CUMPLE - No se encontraron archivos")
+
+                result = AuditResult(
+                    audit_id=audit_id,
+                    checklist_item_id=item.id,
+                    found=found,
+                    matched_files=json.dumps(matched_files, ensure_ascii=False) if matched_files else None,
+                    notes=f"Se encontraron {len(matched_files)} archivos" if found else "No se encontraron archivos"
+                )
+                self.db.add(result)
+
+                self.event_bus.publish(audit_id, "item", {
+                    "status": "processing",
+                    "index": processed,
+                    "total_items": total_items,
+                    "progress": int(processed * 100 / total_items),
+                    "item_id": item.item_id,
+                    "found": found,
+                    "matched_count": len(matched_files),
+                    "compliant_items": compliant_items
+                })
+                print()
+
+            last_item_id = batch[-1].id
+            audit.last_processed_item_id = last_item_id
+            audit.compliant_items = compliant_items
+            # Tras el commit los requisitos y resultados del lote quedan sin referencias
+            # fuertes en la sesión y se liberan antes de cargar el siguiente
+            self.db.commit()
+            del batch
+
+        audit.status = "completed"
+        audit.total_items = total_items
+        audit.compliant_items = compliant_items
+        audit.compliance_rate = round((compliant_items / total_items) * 100, 2) if total_items > 0 else 0
+        audit.last_processed_item_id = None
+
+        analytics = AnalyticsService(self.db)
+        analytics.record_audit(audit, analytics.outcomes(audit))
+
+        self.db.commit()
+        self.db.refresh(audit)
+
+        summary = {
+            "audit_id": audit.id,
+            "status": audit.status,
+            "compliance_rate": audit.compliance_rate,
+            "compliant_items": compliant_items,
+            "total_items": total_items,
+            "resumed": resumed
+        }
+        self.event_bus.publish(audit.id, "completed", {**summary, "progress": 100})
+
+        return summary
@@ -0,0 +1,236 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.services.checklist_processor import ChecklistProcessor, checklist_rows, sheet_content_hash
+from app.utils.file_utils import file_content_hash, save_content
+
+ARCHIVE_EXTENSION = ".zip"
+
+# Longitud de Audit.filename y ChecklistTemplate.name
+MAX_NAME_LENGTH = 255
+
+
+def parse_workbook(file_path: str) -> Dict:
+    """
+    Lee todas las hojas de un libro; cada hoja es un checklist. Un error en
+    una hoja (por ejemplo una fecha inválida) no impide leer las demás.
+
+    Es una función de módulo para que el pool de procesos pueda ejecutarla.
+    """
+    import pandas as pd
+
+    try:
+        sheets = pd.read_excel(file_path, sheet_name=None)
+    except Exception as e:
+        return {"error": f"No se pudo leer el libro: {e}"}
+
+    file_hash = file_content_hash(file_path)
+    parsed = []
+    for index, (name, df) in enumerate(sheets.items()):
+        try:
+            rows = checklist_rows(df)
+        except Exception as e:
+            parsed.append({"sheet": str(name), "error": str(e)})
+            continue
+        parsed.append({"sheet": str(name), "rows": rows, "content_hash": sheet_content_hash(file_hash, index, str(name))})
+    return {"sheets": parsed}
+
+
+class ImportFile:
+    """
+    Un libro de la importación masiva y su resultado
+    """
+
+    def __init__(self, filename: str, path: Optional[str] = None, error: Optional[str] = None):
+        self.filename = filename
+        self.path = path
+        self.error = error
+        self.sheets: List[Dict] = []
+        self.checklists: List[Dict] = []
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "error"
+        failed = sum(1 for checklist in self.checklists if checklist["status"] == "error")
+        if failed == 0:
+            return "ok"
+        return "error" if failed == len(self.checklists) else "partial"
+
+    def to_dict(self) -> Dict:
+        report = {"filename": self.filename, "status": self.status, "checklists": self.checklists}
+        if self.error:
+            report["error"] = self.error
+        return report
+
+
+class BulkImporter:
+    """
+    Importación de varios libros (o un zip) de checklists.
+
+    Los libros se leen en paralelo en un pool de procesos (pandas y openpyxl
+    son CPU y no liberan el GIL); luego cada hoja se guarda como plantilla y
+    auditoría en su propia transacción, así que una hoja con errores no
+    deshace las demás.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.BULK_IMPORT_PROCESS_WORKERS
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: hacer fork de un proceso con hilos (uvicorn, threadpool) no es seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.max_workers),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def collect(self, filename: str, stream: BinaryIO, size: Optional[int] = None) -> List[ImportFile]:
+        """
+        Guarda un archivo subido en UPLOAD_DIR; un zip se expande en los libros que contiene.
+
+        Lee desde el archivo temporal del upload: la extensión y el tamaño se
+        validan antes de leer, y un zip se abre ahí mismo sin copiarlo a memoria.
+        """
+        if size is None:
+            size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+
+        if os.path.splitext(filename)[1].lower() == ARCHIVE_EXTENSION:
+            return self._expand_archive(filename, stream, size)
+
+        error = self._validate(filename, size)
+        if error:
+            return [ImportFile(filename, error=error)]
+        content = stream.read(settings.MAX_FILE_SIZE + 1)
+        if len(content) > settings.MAX_FILE_SIZE:
+            return [ImportFile(filename, error=f"El archivo supera el tamaño máximo de {settings.MAX_FILE_SIZE} bytes")]
+        return [ImportFile(filename, path=save_content(content, filename, settings.UPLOAD_DIR))]
+
+    @staticmethod
+    def _validate(filename: str, size: int) -> Optional[str]:
+        if os.path.splitext(filename)[1].lower() not in settings.allowed_extensions_list:
+            return f"Extensión de archivo no permitida. Permitidas: {', '.join(settings.allowed_extensions_list)}"
+        if size > settings.MAX_FILE_SIZE:
+            return f"El archivo supera el tamaño máximo de {settings.MAX_FILE_SIZE} bytes"
+        return None
+
+    def _expand_archive(self, filename: str, stream: BinaryIO, size: int) -> List[ImportFile]:
+        if size > settings.MAX_FILE_SIZE * settings.BULK_IMPORT_MAX_FILES:
+            return [ImportFile(filename, error="El zip supera el tamaño máximo de la importación")]
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            return [ImportFile(filename, error="El zip no es válido")]
+
+        files = []
+        with archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if len(members) > settings.BULK_IMPORT_MAX_FILES:
+                return [ImportFile(filename, error=f"El zip contiene más de {settings.BULK_IMPORT_MAX_FILES} archivos")]
+
+            for info in members:
+                name = f"{filename}/{info.filename}"
+                # file_size viene del propio zip: se valida antes de descomprimir
+                error = self._validate(info.filename, info.file_size)
+                if error:
+                    files.append(ImportFile(name, error=error))
+                    continue
+                with archive.open(info) as member:
+                    data = member.read(settings.MAX_FILE_SIZE + 1)
+                if len(data) > settings.MAX_FILE_SIZE:
+                    files.append(ImportFile(name, error=f"El archivo supera el tamaño máximo de {settings.MAX_FILE_SIZE} bytes"))
+                    continue
+                files.append(ImportFile(name, path=save_content(data, info.filename, settings.UPLOAD_DIR)))
+
+        if not files:
+            return [ImportFile(filename, error="El zip no contiene libros de Excel")]
+        return files
+
+    async def parse(self, files: List[ImportFile]):
+        """
+        Lee en paralelo todos los libros válidos
+        """
+        pending = [f for f in files if f.path is not None]
+        if not pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        outcomes = await asyncio.gather(
+            *(loop.run_in_executor(pool, parse_workbook, f.path) for f in pending),
+            return_exceptions=True
+        )
+        for f, outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                f.error = f"Error leyendo el libro: {outcome}"
+            elif "error" in outcome:
+                f.error = outcome["error"]
+            else:
+                f.sheets = outcome["sheets"]
+
+    def store(self, db: Session, files: List[ImportFile]) -> Dict:
+        """
+        Crea una plantilla y una auditoría por hoja, cada una en su propia transacción
+        """
+        processor = ChecklistProcessor(db)
+        created = 0
+
+        for f in files:
+            for sheet in f.sheets:
+                # Un libro de una sola hoja conserva el nombre del archivo, como en /upload
+                name = f.filename if len(f.sheets) == 1 else f"{f.filename} / {sheet['sheet']}"
+                name = name[:MAX_NAME_LENGTH]
+                checklist = {"sheet": sheet["sheet"], "name": name}
+
+                if "error" in sheet:
+                    checklist.update(status="error", error=sheet["error"])
+                elif not sheet["rows"]:
+                    checklist.update(status="skipped", error="La hoja no tiene requisitos")
+                else:
+                    try:
+                        audit = processor.process_rows(sheet["rows"], name, sheet["content_hash"])
+                    except Exception as e:
+                        checklist.update(status="error", error=f"Error guardando el checklist: {e}")
+                    else:
+                        created += 1
+                        checklist.update(
+                            status="ok",
+                            audit_id=audit.id,
+                            template_id=audit.template_id,
+                            total_items=audit.total_items,
+                            reused_template=processor.reused_template
+                        )
+                f.checklists.append(checklist)
+
+        reports = [f.to_dict() for f in files]
+        return {
+            "files": reports,
+            "total_files": len(reports),
+            "failed_files": sum(1 for report in reports if report["status"] == "error"),
+            "checklists_created": created
+        }
+
+
+bulk_importer = BulkImporter()
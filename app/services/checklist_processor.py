@@ -1,46 +1,176 @@
-import pandas as pd
+import hashlib
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.models.audit import Audit, ChecklistItem
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+from app.models.audit import Audit, ChecklistItem, ChecklistTemplate
+from app.services.evidence_filters import DATE_COLUMNS, TYPES_COLUMN, resolve_date_bound
+from app.services.keyword_expression import compile_keywords, dump_key
+from app.utils.file_utils import file_content_hash
 
 
 class ChecklistProcessor:
     def __init__(self, db: Session):
         self.db = db
-    
+        # Indica si el último checklist procesado reutilizó una plantilla existente
+        self.reused_template = False
+
     def process_checklist(self, file_path: str, filename: str) -> Audit:
         """
-        Procesa un archivo Excel de checklist y crea registros en la BD
+        Procesa un archivo Excel de checklist y crea registros en la BD.
+
+        Los checklists se guardan una sola vez como plantillas identificadas
+        por el hash de su contenido; si el mismo archivo ya se subió antes,
+        la nueva auditoría reutiliza esa plantilla sin volver a leer el Excel.
+        """
+        content_hash = file_content_hash(file_path)
+        return self._create_audit(
+            filename,
+            content_hash,
+            lambda: self._create_template(read_checklist_rows(file_path), filename, content_hash)
+        )
+
+    def process_rows(self, rows: List[Dict], name: str, content_hash: str) -> Audit:
         """
-        # Leer archivo Excel
-        df = pd.read_excel(file_path)
-        
-        # Validar columnas requeridas
-        required_columns = ['ID', 'Pregunta', 'Palabras_Clave', 'Obligatorio']
-        
-        # Renombrar columnas si es necesario (flexible)
-        df.columns = df.columns.str.strip()
-        
+        Crea la plantilla (si no existe) y la auditoría de un checklist ya
+        leído, en una sola transacción. Lo usa la importación masiva, que lee
+        los Excel en otros procesos.
+        """
+        try:
+            return self._create_audit(name, content_hash, lambda: self._create_template(rows, name, content_hash))
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def _create_audit(self, filename: str, content_hash: str, create_template: Callable[[], ChecklistTemplate]) -> Audit:
+        template = self._find_template(content_hash)
+        self.reused_template = template is not None
+
+        if template is None:
+            try:
+                template = create_template()
+            except IntegrityError:
+                # Otra subida concurrente del mismo archivo creó la plantilla primero
+                self.db.rollback()
+                template = self._find_template(content_hash)
+                self.reused_template = True
+                if template is None:
+                    raise
+
         # Crear auditoría
         audit = Audit(
             filename=filename,
             status="pending",
-            total_items=len(df)
+            template_id=template.id,
+            total_items=template.total_items
         )
         self.db.add(audit)
-        self.db.flush()  # Para obtener el ID
-        
-        # Procesar cada fila del checklist
-        for _, row in df.iterrows():
-            item = ChecklistItem(
-                audit_id=audit.id,
-                item_id=str(row.iloc[0]),  # Columna A: ID
-                description=str(row.iloc[1]),  # Columna B: Pregunta
-                keywords=str(row.iloc[2]),  # Columna C: Palabras clave
-                is_mandatory=str(row.iloc[3]).lower() in ['si', 'sí', 'yes', 'true', '1']  # Columna D
-            )
-            self.db.add(item)
-        
+
         self.db.commit()
         self.db.refresh(audit)
-        
-        return audit
\ No newline at end of file
+
+        return audit
+
+    def _find_template(self, content_hash: str):
+        return self.db.query(ChecklistTemplate).filter(ChecklistTemplate.content_hash == content_hash).first()
+
+    def _create_template(self, rows: List[Dict], filename: str, content_hash: str) -> ChecklistTemplate:
+        # Cada archivo distinto con el mismo nombre es una nueva versión
+        last_version = self.db.query(func.max(ChecklistTemplate.version)).filter(
+            ChecklistTemplate.name == filename
+        ).scalar()
+
+        template = ChecklistTemplate(
+            name=filename,
+            version=(last_version or 0) + 1,
+            content_hash=content_hash,
+            total_items=len(rows)
+        )
+        self.db.add(template)
+        self.db.flush()  # Para obtener el ID
+
+        for fields in rows:
+            self.db.add(ChecklistItem(template_id=template.id, **fields))
+
+        self.db.flush()
+
+        return template
+
+
+def read_checklist_rows(file_path: str) -> List[Dict]:
+    """
+    Lee la primera hoja de un checklist en Excel
+    """
+    import pandas as pd
+
+    return checklist_rows(pd.read_excel(file_path))
+
+
+def checklist_rows(df) -> List[Dict]:
+    """
+    Convierte las filas de una hoja en los campos de ChecklistItem.
+
+    Las palabras clave se compilan aquí, una vez por requisito. Lanza
+    ValueError si una fecha opcional o una expresión de palabras clave no se
+    puede interpretar.
+    """
+    # Renombrar columnas si es necesario (flexible)
+    df.columns = df.columns.astype(str).str.strip()
+
+    now = datetime.now(timezone.utc)
+    rows = []
+
+    # Procesar cada fila del checklist
+    for _, row in df.iterrows():
+        # Columnas opcionales de fecha: se validan al subir para no fallar en mitad de la auditoría
+        date_bounds = {attribute: _optional_text(row, column) for column, attribute in DATE_COLUMNS.items()}
+        for attribute, spec in date_bounds.items():
+            resolve_date_bound(spec, now, upper=attribute.endswith('_before'))
+
+        keywords = str(row.iloc[2])  # Columna C: Palabras clave (lista por comas o expresión)
+        try:
+            keyword_expression = dump_key(compile_keywords(keywords))
+        except ValueError as e:
+            raise ValueError(f"Requisito {row.iloc[0]}: {e}")
+
+        rows.append(dict(
+            item_id=str(row.iloc[0]),  # Columna A: ID
+            description=str(row.iloc[1]),  # Columna B: Pregunta
+            keywords=keywords,
+            keyword_expression=keyword_expression,
+            is_mandatory=str(row.iloc[3]).lower() in ['si', 'sí', 'yes', 'true', '1'],  # Columna D
+            folder_ids=_optional_text(row, 'Carpetas'),  # Opcional: IDs de carpetas separados por coma
+            mime_types=_optional_text(row, TYPES_COLUMN),  # Opcional: mimeTypes o extensiones
+            **date_bounds
+        ))
+
+    return rows
+
+
+def sheet_content_hash(file_hash: str, sheet_index: int, sheet_name: str) -> str:
+    """
+    Hash de contenido del checklist de una hoja: el SHA-256 del archivo para
+    la primera hoja, que es la que lee /upload (así ambos caminos reutilizan
+    la misma plantilla), y el del hash del archivo con el nombre de la hoja
+    para las demás
+    """
+    if sheet_index == 0:
+        return file_hash
+    return hashlib.sha256(f"{file_hash}\0{sheet_name}".encode('utf-8')).hexdigest()
+
+
+def _optional_text(row, column: str):
+    """
+    Valor de una columna opcional del checklist, o None si no existe o está vacía
+    """
+    if column not in row.index:
+        return None
+    value = row[column]
+    if value is None or value != value:  # NaN
+        return None
+    if hasattr(value, 'date') and hasattr(value, 'isoformat'):
+        # Celdas con formato fecha de Excel
+        return value.date().isoformat()
+    value = str(value).strip()
+    return value or None
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.google_drive_service import DEFAULT_ACCOUNT, GoogleDriveService
+
+
+class DriveServicePool:
+    """
+    Servicios de Google Drive por cuenta, con sus credenciales, cliente ya
+    construido e inventario en caché.
+
+    Se limita la cantidad de cuentas en memoria (se descarta la usada hace
+    más tiempo) y se descartan las que llevan más de `idle_seconds` sin usarse.
+    Un servicio descartado mientras un request lo usa sigue funcionando para
+    ese request; el siguiente crea uno nuevo desde el token guardado.
+    """
+
+    def __init__(self, max_accounts: int = None, idle_seconds: int = None):
+        self.max_accounts = max_accounts if max_accounts is not None else settings.DRIVE_POOL_MAX_ACCOUNTS
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.DRIVE_POOL_IDLE_SECONDS
+        self._lock = threading.Lock()
+        self._services: "OrderedDict[str, Tuple[GoogleDriveService, float]]" = OrderedDict()
+        self._created = 0
+        self._reused = 0
+        self._evicted_lru = 0
+        self._evicted_idle = 0
+
+    def _evict_idle(self, now: float):
+        if self.idle_seconds <= 0:
+            return
+        # El OrderedDict está en orden de uso: los inactivos están al principio
+        while self._services:
+            account, (_, last_used) = next(iter(self._services.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            self._services.popitem(last=False)
+            self._evicted_idle += 1
+
+    def get(self, account: Optional[str] = None) -> GoogleDriveService:
+        account = account or DEFAULT_ACCOUNT
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._services.get(account)
+            if entry is not None:
+                service = entry[0]
+                self._services.move_to_end(account)
+                self._reused += 1
+            else:
+                service = GoogleDriveService(account=account)
+                self._created += 1
+                while len(self._services) >= max(1, self.max_accounts):
+                    self._services.popitem(last=False)
+                    self._evicted_lru += 1
+
+            self._services[account] = (service, now)
+            return service
+
+    def discard(self, account: str):
+        with self._lock:
+            self._services.pop(account, None)
+
+    def accounts(self) -> List[str]:
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            return list(self._services)
+
+    def metrics(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            return {
+                "accounts": len(self._services),
+                "max_accounts": self.max_accounts,
+                "idle_seconds": self.idle_seconds,
+                "created": self._created,
+                "reused": self._reused,
+                "evicted_lru": self._evicted_lru,
+                "evicted_idle": self._evicted_idle,
+                "entries": [
+                    {
+                        "account": account,
+                        "idle_seconds": round(now - last_used, 1),
+                        "inventory_files": service.last_inventory_size
+                    }
+                    for account, (service, last_used) in reversed(self._services.items())
+                ]
+            }
+
+
+drive_pool = DriveServicePool()
@@ -0,0 +1,171 @@
+import math
+import re
+from typing import Iterable, List, Optional, Set
+from app.services.inventory import KeywordKey
+from app.services.keyword_expression import cover_terms, is_expression
+
+BASE_QUERY = "trashed=false and mimeType != 'application/vnd.google-apps.folder'"
+DRIVE_PAGE_SIZE = 1000
+# Caracteres que normalize_name convierte en espacios
+WORD_SEPARATORS = ('_', '-')
+
+
+def escape_query_value(value: str) -> str:
+    """
+    Escapa un literal para el parámetro q de la API de Drive
+    """
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def pushdown_term(key: KeywordKey, word_start: bool = False) -> Optional[str]:
+    """
+    Término que se envía a Drive para un conjunto de palabras clave.
+
+    Se elige la palabra más larga (la más selectiva) de todas las palabras
+    clave. La verificación local posterior exige todas las palabras como
+    subcadena, igual que la búsqueda completa. Si ninguna palabra es
+    utilizable (palabra clave vacía), el conjunto no admite pushdown.
+
+    Drive solo hace coincidencia por prefijo de palabra en `name contains`,
+    así que la primera palabra de una palabra clave puede no encontrar
+    archivos que la búsqueda local sí encuentra ("acta" en "contracta").
+    Con `word_start` solo se consideran las palabras que siguen a un espacio
+    dentro de una palabra clave, que empiezan una palabra del nombre (en el
+    nombre ese espacio puede ser '_' o '-', ver plan_search).
+    """
+    words = [
+        word for kw in key
+        for word in (kw.split()[1:] if word_start else kw.split())
+    ]
+    if not words:
+        return None
+    return max(words, key=len)
+
+
+def pushdown_terms(key, exact: bool = False) -> Optional[Set[str]]:
+    """
+    Términos que se envían a Drive para una clave: uno para las listas de
+    palabras clave y la cobertura de la expresión para las expresiones.
+    None si la clave no admite pushdown (por ejemplo si solo niega).
+
+    Se prefieren los términos que Drive encuentra igual que la búsqueda
+    local (ver pushdown_term); con `exact` no se admiten otros.
+    """
+    if is_expression(key):
+        terms = cover_terms(key, word_start=True)
+        if terms is None and not exact:
+            terms = cover_terms(key)
+        return terms
+
+    term = pushdown_term(key, word_start=True)
+    if term is None and not exact:
+        term = pushdown_term(key)
+    return {term} if term is not None else None
+
+
+def separator_probe(name: str, separator: str) -> Optional[str]:
+    """
+    Palabra que en el nombre sigue a `separator` entre dos palabras
+    ("final" en "informe_final.xlsx"), para comprobar si Drive la encuentra
+    por su inicio igual que la búsqueda local. None si el nombre no sirve:
+    la palabra no puede aparecer en otra parte del nombre.
+    """
+    lowered = name.lower()
+    for match in re.finditer(r'[^\W_]' + re.escape(separator) + r'([^\W_]{3,})', lowered):
+        word = match.group(1)
+        if lowered.count(word) == 1:
+            return word
+    return None
+
+
+def build_batched_queries(terms: Iterable[str], max_length: int) -> List[str]:
+    """
+    Agrupa los términos en consultas OR que no superan la longitud máxima
+    """
+    queries = []
+    clauses: List[str] = []
+    prefix = f"{BASE_QUERY} and ("
+    length = len(prefix) + 1
+
+    for term in sorted(set(terms)):
+        clause = f"name contains '{escape_query_value(term)}'"
+        extra = len(clause) + (4 if clauses else 0)
+
+        if clauses and length + extra > max_length:
+            queries.append(prefix + " or ".join(clauses) + ")")
+            clauses = []
+            length = len(prefix) + 1
+            extra = len(clause)
+
+        clauses.append(clause)
+        length += extra
+
+    if clauses:
+        queries.append(prefix + " or ".join(clauses) + ")")
+
+    return queries
+
+
+class SearchPlan:
+    """
+    Decisión entre listar todo el inventario o enviar las palabras clave a Drive
+    """
+
+    def __init__(self, mode: str, queries: List[str], snapshot_requests: int, pushdown_requests: int):
+        self.mode = mode
+        self.queries = queries
+        self.snapshot_requests = snapshot_requests
+        self.pushdown_requests = pushdown_requests
+
+    def __repr__(self) -> str:
+        return (f"SearchPlan(mode={self.mode}, queries={len(self.queries)}, "
+                f"snapshot_requests={self.snapshot_requests}, pushdown_requests={self.pushdown_requests})")
+
+
+def plan_search(
+    keys: Iterable[KeywordKey],
+    configured_mode: str,
+    estimated_files: int,
+    max_query_length: int,
+    separators_split: bool = False
+) -> SearchPlan:
+    """
+    Estima el número de peticiones de cada estrategia y elige la más barata.
+
+    El listado completo cuesta una petición por página de 1000 archivos. El
+    pushdown cuesta al menos una petición por consulta OR; se asume que los
+    resultados de cada consulta caben en una página.
+
+    En modo auto solo se elige el pushdown si todas las claves tienen
+    términos que empiezan una palabra, para que el resultado no dependa del
+    tamaño del Drive. Esos términos siguen a un espacio en la palabra clave,
+    que en el nombre puede ser un espacio, '_' o '-' (normalize_name), así
+    que además hace falta `separators_split`: que se haya comprobado que
+    Drive también empieza una palabra después de '_' y '-'. El modo pushdown forzado admite cualquier término y
+    puede encontrar menos archivos que el listado completo.
+    """
+    exact = configured_mode != "pushdown"
+    terms: Set[str] = set()
+    pushable = True
+    for key in keys:
+        key_terms = pushdown_terms(key, exact=exact)
+        if key_terms is None:
+            pushable = False
+            break
+        terms.update(key_terms)
+
+    snapshot_requests = max(1, math.ceil(estimated_files / DRIVE_PAGE_SIZE))
+
+    if configured_mode == "auto" and not separators_split:
+        pushable = False
+
+    if not pushable or not terms or configured_mode == "snapshot":
+        return SearchPlan("snapshot", [], snapshot_requests, 0)
+
+    queries = build_batched_queries(terms, max_query_length)
+    pushdown_requests = len(queries)
+
+    if configured_mode == "pushdown" or pushdown_requests < snapshot_requests:
+        return SearchPlan("pushdown", queries, snapshot_requests, pushdown_requests)
+
+    return SearchPlan("snapshot", [], snapshot_requests, pushdown_requests)
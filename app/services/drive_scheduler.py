@@ -0,0 +1,298 @@
+import heapq
+import http.client
+import itertools
+import json
+import random
+import socket
+import ssl
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from app.config import settings
+
+# Prioridades: menor valor se atiende primero
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+RATE_LIMIT_REASONS = ("userRateLimitExceeded", "rateLimitExceeded", "quotaExceeded")
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class DriveQuotaExceededError(Exception):
+    """
+    Google Drive siguió limitando las peticiones después de todos los reintentos
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _error_status_and_reason(error: Exception):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    reason = None
+    content = getattr(error, 'content', None)
+    if content:
+        try:
+            payload = json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+            errors = payload.get('error', {}).get('errors', [])
+            if errors:
+                reason = errors[0].get('reason')
+        except (ValueError, AttributeError):
+            pass
+    return (int(status) if status is not None else None), reason
+
+
+@lru_cache(maxsize=1)
+def _transport_errors() -> Tuple[type, ...]:
+    """
+    Errores de red que no dicen nada de la petición (DNS, conexión cortada,
+    TLS, respuesta incompleta) y que por lo tanto vale la pena reintentar
+    """
+    errors = [ConnectionError, TimeoutError, socket.gaierror, ssl.SSLError, http.client.HTTPException]
+    try:
+        import httplib2
+        errors.append(httplib2.ServerNotFoundError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def classify_error(error: Exception):
+    """
+    (rate_limited, transient, reason) de un error de la API de Drive
+    """
+    status, reason = _error_status_and_reason(error)
+    rate_limited = status == 429 or (status == 403 and reason in RATE_LIMIT_REASONS)
+    transient = rate_limited or status in RETRYABLE_STATUS or isinstance(error, _transport_errors())
+    return rate_limited, transient, reason or (str(status) if status is not None else None)
+
+
+class DriveRequestScheduler:
+    """
+    Punto único por el que pasan todas las llamadas a Google Drive.
+
+    Un token bucket dimensionado a la cuota del proyecto limita el ritmo; las
+    peticiones esperan en una cola por prioridad, así las interactivas pasan
+    delante de las auditorías en lote. Los límites de cuota (403 por rate
+    limit y 429), los errores transitorios y los de red se reintentan con
+    backoff exponencial con jitter cuando la petición es idempotente.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = None,
+        burst: int = None,
+        max_retries: int = None,
+        backoff_base: float = None,
+        backoff_max: float = None
+    ):
+        self.rate = rate_per_second if rate_per_second is not None else settings.DRIVE_QUOTA_REQUESTS_PER_SECOND
+        self.capacity = burst if burst is not None else settings.DRIVE_QUOTA_BURST
+        self.max_retries = max_retries if max_retries is not None else settings.DRIVE_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else settings.DRIVE_BACKOFF_BASE_SECONDS
+        self.backoff_max = backoff_max if backoff_max is not None else settings.DRIVE_BACKOFF_MAX_SECONDS
+        # Con tasa o ráfaga 0 el bucket nunca junta un token y las peticiones esperan para siempre
+        if self.rate <= 0:
+            raise ValueError(f"DRIVE_QUOTA_REQUESTS_PER_SECOND debe ser mayor que 0 (es {self.rate})")
+        if self.capacity < 1:
+            raise ValueError(f"DRIVE_QUOTA_BURST debe ser al menos 1 (es {self.capacity})")
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+        self._metrics = {
+            "requests": 0,
+            "retries": 0,
+            "quota_hits": 0,
+            "quota_hits_by_reason": {},
+            "quota_exhausted": 0,
+            "transient_errors": 0,
+            "failures": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _acquire(self, priority: int, cost: int):
+        # Una petición más cara que el bucket (un batch de 100) espera a tenerlo
+        # lleno y lo deja en deuda: las siguientes esperan a que se pague todo
+        cost = max(cost, 1)
+        needed = min(cost, self.capacity)
+        started = time.monotonic()
+
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    is_next = self._waiting[0] == ticket
+                    if is_next and self._tokens >= needed:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= cost
+                        self._cond.notify_all()
+                        break
+                    # Solo el primero de la cola calcula cuánto falta; el resto espera su turno
+                    timeout = (needed - self._tokens) / self.rate if is_next and self.rate > 0 else 1.0
+                    self._cond.wait(timeout=max(timeout, 0.001))
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                raise
+
+            waited = time.monotonic() - started
+            self._metrics["wait_seconds_total"] += waited
+            self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+
+    def _penalize(self):
+        # Tras un límite de cuota nadie más debe salir hasta que el bucket se recupere
+        with self._cond:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniforme entre 0 y el tope exponencial
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_error(self, rate_limited: bool, transient: bool, reason: Optional[str]):
+        with self._cond:
+            if rate_limited:
+                self._metrics["quota_hits"] += 1
+                by_reason = self._metrics["quota_hits_by_reason"]
+                by_reason[reason] = by_reason.get(reason, 0) + 1
+            elif transient:
+                self._metrics["transient_errors"] += 1
+
+    def _quota_exceeded(self, reason: Optional[str], attempt: int) -> DriveQuotaExceededError:
+        return DriveQuotaExceededError(
+            f"Cuota de Google Drive excedida ({reason}) tras {attempt} reintentos",
+            retry_after=min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        )
+
+    def execute(self, request, priority: int = PRIORITY_BATCH, idempotent: bool = True, cost: int = 1):
+        """
+        Ejecuta una petición de la API de Drive (o un batch) respetando la cuota
+        """
+        attempt = 0
+        while True:
+            self._acquire(priority, cost)
+            with self._cond:
+                self._metrics["requests"] += 1
+
+            try:
+                return request.execute()
+            except Exception as e:
+                rate_limited, transient, reason = classify_error(e)
+                self._record_error(rate_limited, transient, reason)
+
+                if rate_limited:
+                    self._penalize()
+
+                if transient and idempotent and attempt < self.max_retries:
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    with self._cond:
+                        self._metrics["retries"] += 1
+                    time.sleep(delay)
+                    continue
+
+                with self._cond:
+                    self._metrics["failures"] += 1
+                    if rate_limited:
+                        self._metrics["quota_exhausted"] += 1
+
+                if rate_limited:
+                    raise self._quota_exceeded(reason, attempt) from e
+                raise
+
+    def execute_batch(
+        self,
+        new_batch: Callable,
+        build_request: Callable[[str], object],
+        request_ids: Iterable[str],
+        callback: Callable,
+        priority: int = PRIORITY_BATCH,
+        max_size: int = 100
+    ):
+        """
+        Ejecuta peticiones idempotentes agrupadas en batches de Drive de hasta
+        `max_size` llamadas; cada llamada cuenta para la cuota.
+
+        Drive responde los límites de cuota y los errores transitorios por
+        llamada dentro de un batch que en sí salió bien: esas llamadas se
+        reintentan en un batch nuevo con backoff. Las respuestas y los demás
+        errores van a `callback(request_id, response, exception)`. Si alguna
+        llamada sigue limitada tras todos los reintentos, se lanza
+        DriveQuotaExceededError después de entregar el resto.
+        """
+        pending = list(request_ids)
+        attempt = 0
+        exhausted_reason = None
+
+        while pending:
+            retry = []
+            retry_rate_limited = False
+
+            def on_response(request_id, response, exception):
+                nonlocal retry_rate_limited, exhausted_reason
+                if exception is not None:
+                    rate_limited, transient, reason = classify_error(exception)
+                    self._record_error(rate_limited, transient, reason)
+                    if transient and attempt < self.max_retries:
+                        retry.append(request_id)
+                        retry_rate_limited = retry_rate_limited or rate_limited
+                        return
+                    with self._cond:
+                        self._metrics["failures"] += 1
+                        if rate_limited:
+                            self._metrics["quota_exhausted"] += 1
+                    if rate_limited:
+                        exhausted_reason = reason
+                        return
+                callback(request_id, response, exception)
+
+            for start in range(0, len(pending), max_size):
+                chunk = pending[start:start + max_size]
+                batch = new_batch(callback=on_response)
+                for request_id in chunk:
+                    batch.add(build_request(request_id), request_id=request_id)
+                self.execute(batch, priority=priority, cost=len(chunk))
+
+            if retry:
+                if retry_rate_limited:
+                    self._penalize()
+                delay = self._backoff(attempt)
+                attempt += 1
+                with self._cond:
+                    self._metrics["retries"] += len(retry)
+                time.sleep(delay)
+            pending = retry
+
+        if exhausted_reason is not None:
+            raise self._quota_exceeded(exhausted_reason, attempt)
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            self._refill()
+            return {
+                **self._metrics,
+                "quota_hits_by_reason": dict(self._metrics["quota_hits_by_reason"]),
+                "tokens_available": round(self._tokens, 2),
+                "queued_requests": len(self._waiting),
+                "rate_per_second": self.rate,
+                "burst": self.capacity
+            }
+
+
+drive_scheduler = DriveRequestScheduler()
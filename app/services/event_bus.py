@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+class AuditEventBus:
+    """
+    Pub/sub en proceso para el progreso de las auditorías.
+
+    El motor publica desde el hilo donde corre la auditoría; cada suscriptor
+    recibe los eventos en su propio event loop mediante una cola acotada.
+    Un suscriptor inactivo solo cuesta una cola vacía, sin consultas a la BD.
+    """
+    TERMINAL_EVENTS = ("completed", "error")
+
+    def __init__(self, queue_size: int = 256, max_tracked_audits: int = 1024):
+        self.queue_size = queue_size
+        self.max_tracked_audits = max_tracked_audits
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._last_events: "OrderedDict[int, Dict]" = OrderedDict()
+
+    def subscribe(self, audit_id: int) -> asyncio.Queue:
+        """
+        Registra un suscriptor; debe llamarse desde el event loop que lo consumirá
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        with self._lock:
+            self._subscribers.setdefault(audit_id, set()).add((loop, queue))
+            last_event = self._last_events.get(audit_id)
+
+        # Un suscriptor tardío recibe primero el último estado conocido
+        if last_event is not None:
+            queue.put_nowait(last_event)
+
+        return queue
+
+    def unsubscribe(self, audit_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(audit_id)
+            if not subscribers:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[audit_id]
+
+    def publish(self, audit_id: int, event_type: str, data: Optional[Dict] = None):
+        """
+        Publica un evento; es seguro llamarlo desde cualquier hilo
+        """
+        event = {"event": event_type, "audit_id": audit_id}
+        if data:
+            event.update(data)
+
+        with self._lock:
+            self._last_events[audit_id] = event
+            self._last_events.move_to_end(audit_id)
+            while len(self._last_events) > self.max_tracked_audits:
+                self._last_events.popitem(last=False)
+            subscribers = list(self._subscribers.get(audit_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                self.unsubscribe(audit_id, queue)
+
+    def last_event(self, audit_id: int) -> Optional[Dict]:
+        with self._lock:
+            return self._last_events.get(audit_id)
+
+    def forget(self, audit_id: int):
+        with self._lock:
+            self._last_events.pop(audit_id, None)
+
+    def subscriber_count(self, audit_id: Optional[int] = None) -> int:
+        with self._lock:
+            if audit_id is not None:
+                return len(self._subscribers.get(audit_id, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: Dict):
+        # Un cliente lento pierde los eventos de progreso más antiguos, nunca bloquea al motor
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(event)
+
+
+audit_events = AuditEventBus()
@@ -0,0 +1,178 @@
+import calendar
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+from app.services.inventory import InventorySnapshot, parse_timestamp
+
+# Columnas opcionales del checklist -> atributo de ChecklistItem
+DATE_COLUMNS = {
+    'Modificado_Desde': 'modified_after',
+    'Modificado_Hasta': 'modified_before',
+    'Creado_Desde': 'created_after',
+    'Creado_Hasta': 'created_before',
+}
+TYPES_COLUMN = 'Tipos'
+
+# "30d", "12m", "1a" / "1y": relativo al momento en que corre la auditoría
+_RELATIVE_BOUND = re.compile(r'^\s*(\d+)\s*([dmay])\s*$', re.IGNORECASE)
+_DATE_ONLY = re.compile(r'^\s*\d{4}-\d{2}-\d{2}\s*$')
+# Un número solo (un año, o una fecha de Excel en una celda sin formato de fecha) no es una fecha
+_NUMERIC = re.compile(r'^\s*[-+]?\d+(?:[.,]\d+)?\s*$')
+
+
+def _months_ago(now: datetime, months: int) -> datetime:
+    year, month = divmod(now.month - 1 - months, 12)
+    year += now.year
+    month += 1
+    return now.replace(year=year, month=month, day=min(now.day, calendar.monthrange(year, month)[1]))
+
+
+def resolve_date_bound(spec: Optional[str], now: datetime, upper: bool = False) -> Optional[float]:
+    """
+    Convierte el límite de fecha de un requisito a segundos epoch.
+
+    Acepta fechas ISO ("2024-01-01") y plazos relativos a `now` ("12m",
+    "30d", "1a"). Un límite superior con solo la fecha incluye ese día completo.
+    Lanza ValueError si el texto no se puede interpretar; también si es solo
+    un número, que como epoch sería una fecha de 1970.
+    """
+    if not spec:
+        return None
+
+    if _NUMERIC.match(spec):
+        raise ValueError(
+            f"Fecha no válida en el checklist: {spec!r} es un número (¿un año o una celda de Excel "
+            f"sin formato de fecha?); use AAAA-MM-DD o un plazo como 12m, 30d, 1a"
+        )
+
+    relative = _RELATIVE_BOUND.match(spec)
+    if relative:
+        amount, unit = int(relative.group(1)), relative.group(2).lower()
+        if unit == 'd':
+            moment = now - timedelta(days=amount)
+        elif unit == 'm':
+            moment = _months_ago(now, amount)
+        else:
+            moment = _months_ago(now, 12 * amount)
+        return moment.timestamp()
+
+    timestamp = parse_timestamp(spec)
+    if timestamp is None:
+        raise ValueError(f"Fecha no válida en el checklist: {spec!r} (use AAAA-MM-DD o un plazo como 12m, 30d, 1a)")
+    if upper and _DATE_ONLY.match(spec):
+        timestamp += 86400 - 0.001
+    return timestamp
+
+
+def parse_type_patterns(raw: Optional[str]) -> Tuple[str, ...]:
+    """
+    Patrones de la columna Tipos: mimeTypes ("application/pdf"), comodines
+    ("image/*") o extensiones ("pdf", ".xlsx")
+    """
+    if not raw:
+        return ()
+    patterns = set()
+    for token in raw.split(','):
+        token = token.strip().lower()
+        if not token:
+            continue
+        if '/' not in token and not token.startswith('.'):
+            token = '.' + token
+        patterns.add(token)
+    return tuple(sorted(patterns))
+
+
+class ItemConstraints:
+    """
+    Restricciones de fecha y tipo de un requisito, ya resueltas a valores absolutos.
+
+    Los rangos de fecha se resuelven con búsqueda binaria sobre el índice
+    ordenado del snapshot antes de comparar palabras clave; se parte del rango
+    más selectivo y el resto de condiciones se comprueba sobre esos candidatos.
+    """
+
+    def __init__(
+        self,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        type_patterns: Tuple[str, ...] = ()
+    ):
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.created_after = created_after
+        self.created_before = created_before
+        self.type_patterns = type_patterns
+        self.key = (modified_after, modified_before, created_after, created_before, type_patterns)
+
+    @classmethod
+    def from_item(cls, item, now: Optional[datetime] = None) -> Optional["ItemConstraints"]:
+        """
+        Restricciones de un ChecklistItem, o None si no tiene ninguna
+        """
+        now = now or datetime.now(timezone.utc)
+        constraints = cls(
+            modified_after=resolve_date_bound(item.modified_after, now),
+            modified_before=resolve_date_bound(item.modified_before, now, upper=True),
+            created_after=resolve_date_bound(item.created_after, now),
+            created_before=resolve_date_bound(item.created_before, now, upper=True),
+            type_patterns=parse_type_patterns(item.mime_types)
+        )
+        if all(value is None for value in constraints.key[:4]) and not constraints.type_patterns:
+            return None
+        return constraints
+
+    def _ranges(self) -> List[Tuple[str, Optional[float], Optional[float]]]:
+        ranges = []
+        if self.modified_after is not None or self.modified_before is not None:
+            ranges.append(('modified', self.modified_after, self.modified_before))
+        if self.created_after is not None or self.created_before is not None:
+            ranges.append(('created', self.created_after, self.created_before))
+        return ranges
+
+    def _type_matches(self, mime_type: str, name: str) -> bool:
+        mime_type = mime_type.lower()
+        name = name.lower()
+        for pattern in self.type_patterns:
+            if pattern.startswith('.'):
+                if name.endswith(pattern):
+                    return True
+            elif pattern.endswith('/*'):
+                if mime_type.startswith(pattern[:-1]):
+                    return True
+            elif mime_type == pattern:
+                return True
+        return False
+
+    def accepts(self, snapshot: InventorySnapshot, pos: int) -> bool:
+        for field, start, end in self._ranges():
+            timestamp = snapshot.timestamps(field)[pos]
+            if timestamp is None:
+                return False
+            if start is not None and timestamp < start:
+                return False
+            if end is not None and timestamp > end:
+                return False
+        if self.type_patterns and not self._type_matches(snapshot.mime_types[pos], snapshot.names[pos]):
+            return False
+        return True
+
+    def narrow(self, snapshot: InventorySnapshot, candidates: Optional[Sequence[int]] = None) -> List[int]:
+        """
+        Posiciones que cumplen las restricciones, opcionalmente dentro de `candidates`
+        """
+        ranges = self._ranges()
+        if ranges:
+            field, start, end = min(ranges, key=lambda r: snapshot.count_between(*r))
+            base = snapshot.positions_between(field, start, end)
+        elif self.type_patterns and all('/' in p and not p.endswith('/*') for p in self.type_patterns):
+            base = [pos for pattern in self.type_patterns for pos in snapshot.positions_by_mime(pattern)]
+        else:
+            base = range(len(snapshot))
+
+        if candidates is not None:
+            allowed = set(candidates)
+            base = [pos for pos in base if pos in allowed]
+
+        return sorted(pos for pos in base if self.accepts(snapshot, pos))
@@ -0,0 +1,174 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.services.inventory import InventorySnapshot
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+FolderScope = Tuple[str, ...]
+
+
+class UnknownFolderError(ValueError):
+    """
+    Carpetas de un alcance que no aparecen en el inventario de ningún proveedor
+    """
+
+    def __init__(self, folder_ids: List[str]):
+        super().__init__(f"Carpetas no encontradas en el inventario: {', '.join(folder_ids)}")
+        self.folder_ids = folder_ids
+
+
+def parse_folder_ids(raw: Optional[str]) -> FolderScope:
+    """
+    Clave canónica de una lista de carpetas separadas por coma (vacía = sin restricción)
+    """
+    if not raw:
+        return ()
+    return tuple(sorted({folder.strip() for folder in raw.split(',') if folder.strip()}))
+
+
+class FolderIndex:
+    """
+    Jerarquía de carpetas de un snapshot con intervalos de un recorrido en
+    profundidad (Euler tour).
+
+    Cada carpeta recibe el orden en que se entra a ella (`enter`) y el último
+    orden asignado dentro de su subárbol (`exit`), así que "d está dentro de r"
+    es enter[r] <= enter[d] <= exit[r], en O(1). Los archivos se ordenan por
+    el `enter` de su carpeta padre: los de un subárbol quedan contiguos y se
+    obtienen con dos búsquedas binarias.
+
+    Una carpeta con varios padres se ubica bajo el primero por el que se llega.
+    """
+
+    def __init__(self, snapshot: InventorySnapshot):
+        self.version = snapshot.version
+        self.children: Dict[str, List[str]] = defaultdict(list)
+        self.parent_of: Dict[str, Tuple[str, ...]] = {}
+
+        nodes = set()
+        for pos, mime in enumerate(snapshot.mime_types):
+            if mime == FOLDER_MIME_TYPE:
+                folder_id = snapshot.ids[pos]
+                nodes.add(folder_id)
+                self.parent_of[folder_id] = snapshot.parents[pos]
+                for parent in snapshot.parents[pos]:
+                    self.children[parent].append(folder_id)
+
+        # Padres que no aparecen en el inventario (la raíz de Mi unidad, carpetas
+        # compartidas sin acceso) también son nodos, para poder acotar por ellos
+        for parents in snapshot.parents:
+            nodes.update(parents)
+
+        self.enter: Dict[str, int] = {}
+        self.exit: Dict[str, int] = {}
+
+        roots = sorted(node for node in nodes if not any(p in nodes for p in self.parent_of.get(node, ())))
+        for root in roots:
+            self._visit(root)
+        # Lo que no se alcanzó desde una raíz (ciclos) se recorre por separado
+        for node in sorted(nodes - self.enter.keys()):
+            self._visit(node)
+
+        entries = sorted(
+            (self.enter[parent], pos)
+            for pos, parents in enumerate(snapshot.parents)
+            for parent in parents
+        )
+        self._entry_keys = [key for key, _ in entries]
+        self._entry_positions = [pos for _, pos in entries]
+        self._file_parents = snapshot.parents
+
+    def _visit(self, root: str):
+        counter = len(self.enter)
+        stack = [(root, False)]
+        while stack:
+            node, leaving = stack.pop()
+            if leaving:
+                self.exit[node] = counter - 1
+                continue
+            if node in self.enter:
+                continue
+            self.enter[node] = counter
+            counter += 1
+            stack.append((node, True))
+            for child in reversed(self.children.get(node, ())):
+                if child not in self.enter:
+                    stack.append((child, False))
+
+    def __contains__(self, folder_id: str) -> bool:
+        return folder_id in self.enter
+
+    def is_within(self, folder_id: str, root_id: str) -> bool:
+        """
+        True si la carpeta es `root_id` o está dentro de su subárbol
+        """
+        enter = self.enter.get(folder_id)
+        if enter is None or root_id not in self.enter:
+            return False
+        return self.enter[root_id] <= enter <= self.exit[root_id]
+
+    def contains(self, pos: int, scope: FolderScope) -> bool:
+        """
+        True si el archivo en la posición `pos` está dentro de alguna carpeta del alcance
+        """
+        return any(self.is_within(parent, root) for parent in self._file_parents[pos] for root in scope)
+
+    def subtree_positions(self, scope: FolderScope) -> List[int]:
+        """
+        Posiciones de los archivos dentro de las carpetas del alcance, en orden
+        """
+        positions = set()
+        for root in scope:
+            if root not in self.enter:
+                continue
+            start = bisect_left(self._entry_keys, self.enter[root])
+            end = bisect_right(self._entry_keys, self.exit[root])
+            positions.update(self._entry_positions[start:end])
+        return sorted(positions)
+
+    def ancestors(self, folder_id: str) -> List[str]:
+        """
+        Cadena de carpetas desde `folder_id` hasta su raíz (por el primer padre)
+        """
+        chain = []
+        seen = set()
+        current = folder_id
+        while current is not None and current not in seen:
+            chain.append(current)
+            seen.add(current)
+            parents = self.parent_of.get(current, ())
+            current = parents[0] if parents else None
+        return chain
+
+
+class FolderIndexCache:
+    """
+    Índices de carpetas de los snapshots más recientes, por versión
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], FolderIndex]" = OrderedDict()
+
+    def get(self, snapshot: InventorySnapshot) -> FolderIndex:
+        key = (snapshot.origin, snapshot.version)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        index = FolderIndex(snapshot)
+
+        with self._lock:
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+folder_indexes = FolderIndexCache()
+
@@ -1,11 +1,75 @@
+import hashlib
+import json
 import os
 import pickle
-from typing import List, Dict, Optional
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import threading
+import time
+from typing import Iterable, List, Dict, Optional
 from app.config import settings
+from app.services.inventory import InventorySnapshot, KeywordKey, snapshot_origin
+from app.services.drive_query import (
+    DRIVE_PAGE_SIZE,
+    WORD_SEPARATORS,
+    escape_query_value,
+    plan_search,
+    separator_probe
+)
+from app.services.drive_scheduler import (
+    DriveRequestScheduler,
+    drive_scheduler,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE
+)
+
+# Las librerías de Google se importan al usarse: cargarlas cuesta cientos de
+# milisegundos y no hacen falta para arrancar el servidor
+
+# Cuenta usada cuando el request no indica una; conserva el token heredado google_token.pickle
+DEFAULT_ACCOUNT = "default"
+
+_discovery_lock = threading.Lock()
+_discovery_document: Optional[Dict] = None
+
+
+def load_drive_discovery_document() -> Dict:
+    """
+    Documento de descubrimiento de Drive v3 ya parseado, compartido por todo el proceso.
+
+    Usa GOOGLE_DRIVE_DISCOVERY_FILE si está configurado y, si no, la copia
+    estática incluida en google-api-python-client; nunca lo descarga.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                if settings.GOOGLE_DRIVE_DISCOVERY_FILE:
+                    with open(settings.GOOGLE_DRIVE_DISCOVERY_FILE, 'r', encoding='utf-8') as f:
+                        raw = f.read()
+                else:
+                    from googleapiclient.discovery_cache import get_static_doc
+                    raw = get_static_doc('drive', 'v3')
+                    if raw is None:
+                        raise RuntimeError("google-api-python-client no incluye el documento estático de Drive v3")
+                _discovery_document = json.loads(raw)
+    return _discovery_document
+
+
+def _oauth_flow(scopes: List[str]):
+    from google_auth_oauthlib.flow import Flow
+    
+    return Flow.from_client_config(
+        {
+            "web": {
+                "client_id": settings.GOOGLE_CLIENT_ID,
+                "client_secret": settings.GOOGLE_CLIENT_SECRET,
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "redirect_uris": [settings.GOOGLE_REDIRECT_URI]
+            }
+        },
+        scopes=scopes,
+        redirect_uri=settings.GOOGLE_REDIRECT_URI
+    )
 
 
 class GoogleDriveService:
@@ -15,18 +79,34 @@ class GoogleDriveService:
         'https://www.googleapis.com/auth/drive.metadata.readonly'
     ]
     
-    def __init__(self):
+    def __init__(self, account: str = DEFAULT_ACCOUNT, scheduler: DriveRequestScheduler = drive_scheduler):
+        self.account = account
         self.credentials = None
         self.service = None
+        self.scheduler = scheduler
+        self.last_inventory_size: Optional[int] = None
+        # Último inventario completo de esta cuenta, reutilizado durante DRIVE_INVENTORY_TTL_SECONDS
+        self._inventory: Optional[InventorySnapshot] = None
+        self._inventory_lock = threading.Lock()
+        # Si Drive empieza una palabra después de '_' y '-' (None: aún no comprobado)
+        self._separators_split: Optional[bool] = None
         self._load_credentials()
     
+    @property
+    def token_file(self) -> str:
+        if self.account == DEFAULT_ACCOUNT:
+            return self.TOKEN_FILE
+        digest = hashlib.sha256(self.account.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(settings.GOOGLE_TOKENS_DIR, f"{digest}.pickle")
+    
     def _load_credentials(self):
-        if os.path.exists(self.TOKEN_FILE):
-            with open(self.TOKEN_FILE, 'rb') as token:
+        if os.path.exists(self.token_file):
+            with open(self.token_file, 'rb') as token:
                 self.credentials = pickle.load(token)
         
         if self.credentials and self.credentials.expired and self.credentials.refresh_token:
             try:
+                from google.auth.transport.requests import Request
                 self.credentials.refresh(Request())
                 self._save_credentials()
                 print("Credenciales renovadas")
@@ -35,50 +115,36 @@ class GoogleDriveService:
                 self.credentials = None
     
     def _save_credentials(self):
-        with open(self.TOKEN_FILE, 'wb') as token:
+        directory = os.path.dirname(self.token_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.token_file, 'wb') as token:
             pickle.dump(self.credentials, token)
     
-    def get_auth_url(self) -> str:
-        flow = Flow.from_client_config(
-            {
-                "web": {
-                    "client_id": settings.GOOGLE_CLIENT_ID,
-                    "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": [settings.GOOGLE_REDIRECT_URI]
-                }
-            },
-            scopes=self.SCOPES,
-            redirect_uri=settings.GOOGLE_REDIRECT_URI
-        )
+    def get_auth_url(self, state: str) -> str:
+        """
+        URL de consentimiento de Google. `state` es el estado de un solo uso
+        emitido para esta cuenta (ver oauth_state)
+        """
+        flow = _oauth_flow(self.SCOPES)
         
         auth_url, _ = flow.authorization_url(
             access_type='offline',
             include_granted_scopes='true',
-            prompt='consent'
+            prompt='consent',
+            state=state
         )
         
         return auth_url
     
     def authenticate_with_code(self, code: str) -> bool:
         try:
-            flow = Flow.from_client_config(
-                {
-                    "web": {
-                        "client_id": settings.GOOGLE_CLIENT_ID,
-                        "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token",
-                        "redirect_uris": [settings.GOOGLE_REDIRECT_URI]
-                    }
-                },
-                scopes=self.SCOPES,
-                redirect_uri=settings.GOOGLE_REDIRECT_URI
-            )
+            flow = _oauth_flow(self.SCOPES)
             
             flow.fetch_token(code=code)
             self.credentials = flow.credentials
+            self.service = None
+            self._inventory = None
             self._save_credentials()
             
             print("Autenticacion exitosa con Google Drive")
@@ -101,76 +167,202 @@ class GoogleDriveService:
     
     def _get_service(self):
         if not self.service and self.credentials:
-            self.service = build('drive', 'v3', credentials=self.credentials)
+            from googleapiclient.discovery import build_from_document
+            self.service = build_from_document(load_drive_discovery_document(), credentials=self.credentials)
         return self.service
     
-    def search_files(self, keywords: List[str]) -> List[Dict]:
+    FILE_FIELDS = 'id, name, mimeType, webViewLink, size, createdTime, modifiedTime, parents'
+    
+    def _list_files(self, query: str, priority: int = PRIORITY_BATCH) -> List[Dict]:
+        """
+        Recorre todas las páginas de files.list para una consulta
+        """
+        service = self._get_service()
+        
+        files = []
+        page_token = None
+        
+        while True:
+            results = self.scheduler.execute(
+                service.files().list(
+                    q=query,
+                    spaces='drive',
+                    fields=f'nextPageToken, files({self.FILE_FIELDS})',
+                    pageSize=DRIVE_PAGE_SIZE,
+                    pageToken=page_token
+                ),
+                priority=priority
+            )
+            
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            
+            if not page_token:
+                return files
+    
+    def fetch_inventory(self, priority: int = PRIORITY_BATCH) -> InventorySnapshot:
+        """
+        Lista todos los archivos no eliminados de Google Drive en un snapshot.
+        
+        El inventario de la cuenta se reutiliza mientras tenga menos de
+        DRIVE_INVENTORY_TTL_SECONDS; si varios requests lo piden a la vez, solo
+        uno lista Drive y los demás esperan ese resultado.
+        
+        Con SNAPSHOT_STORE_ENABLED el listado se guarda en disco en formato
+        columnar y se usa mapeado en memoria: los demás workers lo abren en vez
+        de volver a listar Drive y todos comparten la misma copia en el page cache.
+        """
+        with self._inventory_lock:
+            ttl = settings.DRIVE_INVENTORY_TTL_SECONDS
+            cached = self._inventory
+            if cached is not None and time.time() - cached.fetched_at < ttl:
+                return cached
+            
+            if settings.SNAPSHOT_STORE_ENABLED:
+                from app.services.snapshot_store import snapshot_store
+                stored = snapshot_store.load_latest(snapshot_origin('Google Drive', self.account), ttl)
+                if stored is not None:
+                    self.last_inventory_size = len(stored)
+                    self._inventory = stored
+                    return stored
+            
+            snapshot = InventorySnapshot.from_drive_files(
+                self._list_files("trashed=false", priority),
+                account=self.account
+            )
+            if settings.SNAPSHOT_STORE_ENABLED:
+                snapshot = snapshot_store.persist(snapshot)
+            self.last_inventory_size = len(snapshot)
+            self._inventory = snapshot
+            print(f"Inventario de Google Drive ({self.account}): {len(snapshot)} archivos (version {snapshot.version})")
+        
+        return snapshot
+    
+    def fetch_candidates(self, queries: List[str], priority: int = PRIORITY_BATCH) -> InventorySnapshot:
+        """
+        Ejecuta las consultas OR de pushdown y une sus resultados en un snapshot parcial
+        """
+        files_by_id: Dict[str, Dict] = {}
+        for query in queries:
+            for file in self._list_files(query, priority):
+                files_by_id.setdefault(file.get('id'), file)
+        
+        snapshot = InventorySnapshot.from_drive_files(list(files_by_id.values()), partial=True, account=self.account)
+        print(f"Pushdown en Google Drive: {len(queries)} consulta(s), {len(snapshot)} candidatos")
+        
+        return snapshot
+    
+    def separators_split(self, priority: int = PRIORITY_BATCH) -> bool:
+        """
+        Comprueba si Drive encuentra por su inicio las palabras que siguen a
+        '_' y '-', como hace la búsqueda local al normalizar los nombres.
+
+        Por cada separador se toma un archivo del último inventario completo
+        con ese separador entre dos palabras y se le pide a Drive por su
+        nombre exacto y por la palabra que sigue al separador: si no lo
+        devuelve, el pushdown no encuentra lo mismo que la búsqueda local.
+        Sin inventario o sin archivos de ejemplo no hay comprobación y se
+        responde False; solo se recuerda una respuesta de Drive.
+        """
+        if self._separators_split is not None:
+            return self._separators_split
+        
+        inventory = self._inventory
+        if inventory is None and settings.SNAPSHOT_STORE_ENABLED:
+            from app.services.snapshot_store import snapshot_store
+            inventory = snapshot_store.load_latest(
+                snapshot_origin('Google Drive', self.account),
+                settings.DRIVE_INVENTORY_TTL_SECONDS
+            )
+        if inventory is None:
+            return False
+        
+        probes = []
+        for separator in WORD_SEPARATORS:
+            for pos, name in enumerate(inventory.names):
+                word = separator_probe(name, separator)
+                if word is not None:
+                    probes.append((inventory.ids[pos], name, word))
+                    break
+            else:
+                return False
+        
+        try:
+            service = self._get_service()
+            for file_id, name, word in probes:
+                results = self.scheduler.execute(
+                    service.files().list(
+                        q=(f"name = '{escape_query_value(name)}' and "
+                           f"name contains '{escape_query_value(word)}' and trashed=false"),
+                        fields='files(id)',
+                        pageSize=DRIVE_PAGE_SIZE
+                    ),
+                    priority=priority
+                )
+                if file_id not in {file.get('id') for file in results.get('files', [])}:
+                    print(f"Drive no encuentra '{word}' en '{name}': sin pushdown automático")
+                    self._separators_split = False
+                    return False
+        except Exception as e:
+            print(f"Error comprobando cómo separa palabras Drive: {e}")
+            return False
+        
+        self._separators_split = True
+        return True
+    
+    def inventory_for_keywords(
+        self,
+        keys: Iterable[KeywordKey],
+        priority: int = PRIORITY_BATCH,
+        require_hierarchy: bool = False
+    ) -> InventorySnapshot:
+        """
+        Snapshot suficiente para evaluar los conjuntos de palabras clave dados,
+        eligiendo entre el listado completo y el pushdown según el costo estimado.
+
+        Las auditorías acotadas por carpetas necesitan la jerarquía completa,
+        que el pushdown no trae (solo lista archivos por nombre).
+        """
+        if require_hierarchy:
+            return self.fetch_inventory(priority)
+        
+        plan = plan_search(
+            list(keys),
+            settings.DRIVE_SEARCH_MODE,
+            self.last_inventory_size or settings.DRIVE_ESTIMATED_FILES,
+            settings.DRIVE_QUERY_MAX_LENGTH,
+            separators_split=settings.DRIVE_SEARCH_MODE == "auto" and self.separators_split(priority)
+        )
+        print(f"Plan de búsqueda: {plan}")
+        
+        if plan.mode == "pushdown":
+            return self.fetch_candidates(plan.queries, priority)
+        return self.fetch_inventory(priority)
+    
+    def search_files(self, keywords: List[str], snapshot: Optional[InventorySnapshot] = None) -> List[Dict]:
         if not self.ensure_authenticated():
             print("No autenticado con Google Drive")
             return []
         
-        matched_files = []
-        
         try:
             print(f"\n{'='*60}")
             print(f"BUSQUEDA EN GOOGLE DRIVE")
             print(f"Keywords: {keywords}")
             print(f"{'='*60}\n")
             
-            service = self._get_service()
-            
-            query = "trashed=false"
-            
-            results = service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, mimeType, webViewLink, size, createdTime, modifiedTime, parents)',
-                pageSize=1000
-            ).execute()
+            if snapshot is None:
+                snapshot = self.fetch_inventory(PRIORITY_INTERACTIVE)
             
-            all_files = results.get('files', [])
+            print(f"Total archivos en Google Drive: {len(snapshot)}\n")
             
-            print(f"Total archivos en Google Drive: {len(all_files)}\n")
-            
-            if len(all_files) == 0:
+            if len(snapshot) == 0:
                 print("No hay archivos en Google Drive\n")
                 return []
             
-            print("ARCHIVOS EN GOOGLE DRIVE:")
-            for idx, file in enumerate(all_files[:10], 1):
-                print(f"  {idx}. {file.get('name')}")
-            if len(all_files) > 10:
-                print(f"  ... y {len(all_files) - 10} mas\n")
-            
-            print(f"{'='*60}")
-            print("FILTRADO POR KEYWORDS")
-            print(f"{'='*60}\n")
+            matched_files = snapshot.search(keywords)
             
-            for file in all_files:
-                if file.get('mimeType', '').startswith('application/vnd.google'):
-                    continue
-                
-                file_name = file.get('name', '').lower()
-                file_name_clean = file_name.replace('_', ' ').replace('-', ' ')
-                
-                matched_kw = []
-                for kw in keywords:
-                    kw_clean = kw.lower().strip()
-                    if kw_clean in file_name_clean:
-                        matched_kw.append(kw)
-                
-                if len(matched_kw) == len(keywords):
-                    print(f"CUMPLE: {file.get('name')}")
-                    matched_files.append({
-                        'id': file.get('id'),
-                        'name': file.get('name'),
-                        'path': 'Google Drive',
-                        'web_url': file.get('webViewLink', ''),
-                        'size': int(file.get('size', 0)),
-                        'created_datetime': file.get('createdTime', ''),
-                        'modified_datetime': file.get('modifiedTime', ''),
-                        'matched_keywords': matched_kw
-                    })
+            for file in matched_files:
+                print(f"CUMPLE: {file['name']}")
             
             print(f"\n{'='*60}")
             print(f"RESULTADO: {len(matched_files)} archivos")
@@ -179,10 +371,11 @@ class GoogleDriveService:
             return matched_files
             
         except Exception as e:
+            # Un error de Drive no es lo mismo que "no hay archivos": se propaga
             print(f"ERROR: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            raise
     
     def get_file_metadata(self, file_id: str) -> Optional[Dict]:
         if not self.ensure_authenticated():
@@ -190,11 +383,58 @@ class GoogleDriveService:
         
         try:
             service = self._get_service()
-            file = service.files().get(
-                fileId=file_id,
-                fields='id, name, mimeType, size, webViewLink'
-            ).execute()
+            file = self.scheduler.execute(
+                service.files().get(
+                    fileId=file_id,
+                    fields='id, name, mimeType, size, webViewLink'
+                ),
+                priority=PRIORITY_INTERACTIVE
+            )
             return file
         except Exception as e:
             print(f"Error obteniendo metadata: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    METADATA_FIELDS = 'id, name, mimeType, size, webViewLink, modifiedTime, trashed'
+    BATCH_SIZE = 100
+    
+    def get_files_metadata(
+        self,
+        file_ids: List[str],
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Dict[str, Optional[Dict]]:
+        """
+        Metadata de varios archivos usando peticiones batch de Drive (hasta 100 por petición).
+        
+        El resultado tiene None para los archivos que ya no existen o están en
+        la papelera. Los archivos cuya consulta falló por otro motivo no
+        aparecen en el resultado, así se distinguen de los eliminados.
+        """
+        if not self.ensure_authenticated():
+            return {}
+        
+        service = self._get_service()
+        unique_ids = list(dict.fromkeys(file_ids))
+        metadata: Dict[str, Optional[Dict]] = {}
+        
+        def callback(request_id, response, exception):
+            if exception is None:
+                metadata[request_id] = None if response.get('trashed') else response
+                return
+            
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            if status == 404:
+                metadata[request_id] = None
+            else:
+                print(f"Error obteniendo metadata de {request_id}: {exception}")
+        
+        self.scheduler.execute_batch(
+            service.new_batch_http_request,
+            lambda file_id: service.files().get(fileId=file_id, fields=self.METADATA_FIELDS),
+            unique_ids,
+            callback,
+            priority=priority,
+            max_size=self.BATCH_SIZE
+        )
+        
+        return metadata
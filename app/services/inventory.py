@@ -0,0 +1,305 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# Los documentos nativos de Google (Docs, Sheets, carpetas...) no cuentan como evidencia
+GOOGLE_NATIVE_MIME_PREFIX = 'application/vnd.google'
+
+KeywordKey = Tuple[str, ...]
+
+# Listas de posiciones por término (expresiones de palabras clave) que guarda cada snapshot
+MAX_CACHED_POSTINGS = 1024
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normaliza un nombre de archivo igual que la búsqueda original
+    """
+    return name.lower().replace('_', ' ').replace('-', ' ')
+
+
+def normalize_keywords(keywords: Iterable[str]) -> KeywordKey:
+    """
+    Clave canónica de un conjunto de palabras clave.
+
+    Todas las palabras deben aparecer en el nombre, así que el orden y los
+    duplicados no cambian el resultado y pueden compartirse entre requisitos.
+    """
+    return tuple(sorted({kw.lower().strip() for kw in keywords}))
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """
+    Segundos epoch de una fecha RFC 3339 de Drive ("2024-01-31T10:00:00.000Z"),
+    una fecha ISO o un epoch ya numérico (carpetas locales). None si no se puede leer.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return (parsed - datetime(1970, 1, 1)).total_seconds()
+    return parsed.timestamp()
+
+
+def parse_keywords(raw_keywords: str) -> List[str]:
+    """
+    Separa la columna de palabras clave del checklist
+    """
+    return [kw.strip() for kw in raw_keywords.split(',')]
+
+
+def snapshot_origin(source: str, account: Optional[str] = None) -> str:
+    """
+    Identifica de qué proveedor y cuenta viene un inventario
+    """
+    return f"{source} ({account})" if account else source
+
+
+class InventorySnapshot:
+    """
+    Inventario inmutable de los archivos de un proveedor en un momento dado.
+
+    Se guarda en columnas paralelas para que varias auditorías puedan
+    evaluarse contra el mismo listado sin volver a consultar el proveedor.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        names: Sequence[str],
+        mime_types: Sequence[str],
+        web_urls: Sequence[str],
+        sizes: Sequence[int],
+        created: Sequence[str],
+        modified: Sequence[str],
+        parents: Sequence[Tuple[str, ...]],
+        source: str = 'Google Drive',
+        paths: Optional[Sequence[str]] = None,
+        version: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+        partial: bool = False,
+        account: Optional[str] = None,
+        normalized_names: Optional[Sequence[str]] = None,
+        searchable: Optional[Sequence[int]] = None
+    ):
+        self.ids = ids
+        self.names = names
+        self.mime_types = mime_types
+        self.web_urls = web_urls
+        self.sizes = sizes
+        self.created = created
+        self.modified = modified
+        self.parents = parents
+        self.source = source
+        # Cuenta del proveedor a la que pertenece el inventario (proveedores con varias cuentas)
+        self.account = account
+        self.paths = paths
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        # Un snapshot parcial solo contiene los candidatos de una búsqueda por pushdown
+        self.partial = partial
+        self.version = version or self._compute_version()
+
+        # Los snapshots cargados de disco (snapshot_store) ya traen estas columnas calculadas
+        if normalized_names is None:
+            normalized_names = [normalize_name(name) for name in names]
+        if searchable is None:
+            searchable = [
+                pos for pos, mime in enumerate(mime_types)
+                if not mime.startswith(GOOGLE_NATIVE_MIME_PREFIX)
+            ]
+        self.normalized_names = normalized_names
+        self.searchable = searchable
+        self._searchable_set: Optional[frozenset] = None
+        # Índices por fecha y por mimeType, construidos la primera vez que se usan
+        self._timestamps: Dict[str, List[Optional[float]]] = {}
+        self._time_indexes: Dict[str, Tuple[List[float], List[int]]] = {}
+        self._mime_index: Optional[Dict[str, List[int]]] = None
+        self._postings: "OrderedDict[str, FrozenSet[int]]" = OrderedDict()
+        self._postings_lock = threading.Lock()
+
+    @classmethod
+    def from_drive_files(
+        cls,
+        files: List[Dict],
+        source: str = 'Google Drive',
+        partial: bool = False,
+        account: Optional[str] = None
+    ) -> "InventorySnapshot":
+        return cls(
+            ids=[f.get('id', '') for f in files],
+            names=[f.get('name', '') for f in files],
+            mime_types=[f.get('mimeType', '') for f in files],
+            web_urls=[f.get('webViewLink', '') for f in files],
+            sizes=[int(f.get('size', 0)) for f in files],
+            created=[f.get('createdTime', '') for f in files],
+            modified=[f.get('modifiedTime', '') for f in files],
+            parents=[tuple(f.get('parents', ())) for f in files],
+            source=source,
+            partial=partial,
+            account=account
+        )
+
+    def _compute_version(self) -> str:
+        digest = hashlib.sha1()
+        # Las carpetas padre forman parte de la versión: mover un archivo cambia el alcance por carpetas
+        for file_id, name, modified, parents in zip(self.ids, self.names, self.modified, self.parents):
+            digest.update(f"{file_id}\0{name}\0{modified}\0{','.join(parents)}\n".encode('utf-8'))
+        prefix = 'partial-' if self.partial else ''
+        return prefix + digest.hexdigest()[:16]
+
+    @property
+    def origin(self) -> str:
+        """
+        Identifica de qué proveedor y cuenta viene el inventario
+        """
+        return snapshot_origin(self.source, self.account)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def timestamps(self, field: str) -> List[Optional[float]]:
+        """
+        Fecha `field` ('created' o 'modified') de cada archivo en segundos epoch
+        """
+        values = self._timestamps.get(field)
+        if values is None:
+            column = self.created if field == 'created' else self.modified
+            if hasattr(column, 'epoch_seconds'):
+                values = column.epoch_seconds()
+            else:
+                values = [parse_timestamp(value) for value in column]
+            self._timestamps[field] = values
+        return values
+
+    def _time_index(self, field: str) -> Tuple[List[float], List[int]]:
+        index = self._time_indexes.get(field)
+        if index is None:
+            entries = sorted(
+                (timestamp, pos) for pos, timestamp in enumerate(self.timestamps(field))
+                if timestamp is not None
+            )
+            index = ([timestamp for timestamp, _ in entries], [pos for _, pos in entries])
+            self._time_indexes[field] = index
+        return index
+
+    def positions_between(self, field: str, start: Optional[float] = None, end: Optional[float] = None) -> List[int]:
+        """
+        Posiciones con fecha `field` ('created' o 'modified') en [start, end],
+        con búsqueda binaria sobre el índice ordenado. Los archivos sin fecha no entran.
+        """
+        timestamps, positions = self._time_index(field)
+        lo = bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        return positions[lo:hi]
+
+    def count_between(self, field: str, start: Optional[float] = None, end: Optional[float] = None) -> int:
+        timestamps, _ = self._time_index(field)
+        lo = bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        return max(0, hi - lo)
+
+    def positions_by_mime(self, mime_type: str) -> List[int]:
+        if self._mime_index is None:
+            index: Dict[str, List[int]] = {}
+            for pos, mime in enumerate(self.mime_types):
+                index.setdefault(mime, []).append(pos)
+            self._mime_index = index
+        return self._mime_index.get(mime_type, [])
+
+    def match_positions(self, key: KeywordKey, candidates: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Posiciones de los archivos cuyo nombre contiene todas las palabras clave,
+        opcionalmente solo entre las posiciones candidatas dadas
+        """
+        names = self.normalized_names
+        if candidates is None and hasattr(names, 'positions_containing'):
+            return self._match_mapped(key)
+        if candidates is None:
+            return [pos for pos in self.searchable if all(kw in names[pos] for kw in key)]
+
+        mime_types = self.mime_types
+        return [
+            pos for pos in candidates
+            if not mime_types[pos].startswith(GOOGLE_NATIVE_MIME_PREFIX) and all(kw in names[pos] for kw in key)
+        ]
+
+    def searchable_positions(self) -> FrozenSet[int]:
+        if self._searchable_set is None:
+            self._searchable_set = frozenset(self.searchable)
+        return self._searchable_set
+
+    def _match_mapped(self, key: KeywordKey) -> List[int]:
+        """
+        Búsqueda sobre una columna de nombres mapeada desde disco: cada palabra
+        se busca directamente en el blob de nombres, empezando por la más
+        larga (la más selectiva), y se intersectan las posiciones
+        """
+        found = None
+        for kw in sorted(key, key=len, reverse=True):
+            hits = self.normalized_names.positions_containing(kw)
+            found = hits if found is None else found & hits
+            if not found:
+                return []
+        if found is None:
+            return list(self.searchable)
+
+        searchable = self.searchable_positions()
+        return sorted(pos for pos in found if pos in searchable)
+
+    def term_positions(self, term: str) -> FrozenSet[int]:
+        """
+        Posiciones (posting list) de los archivos de evidencia cuyo nombre
+        contiene `term`. Las listas de los términos usados más recientemente
+        se conservan mientras viva el snapshot.
+        """
+        with self._postings_lock:
+            postings = self._postings.get(term)
+            if postings is not None:
+                self._postings.move_to_end(term)
+                return postings
+
+        names = self.normalized_names
+        if hasattr(names, 'positions_containing'):
+            postings = frozenset(names.positions_containing(term) & self.searchable_positions())
+        else:
+            postings = frozenset(pos for pos in self.searchable if term in names[pos])
+
+        with self._postings_lock:
+            self._postings[term] = postings
+            while len(self._postings) > MAX_CACHED_POSTINGS:
+                self._postings.popitem(last=False)
+        return postings
+
+    def cached_posting_size(self, term: str) -> Optional[int]:
+        """
+        Tamaño de la posting list de `term` si ya se calculó (para estimar selectividad)
+        """
+        postings = self._postings.get(term)
+        return len(postings) if postings is not None else None
+
+    def file_entry(self, pos: int, matched_keywords: List[str]) -> Dict:
+        return {
+            'id': self.ids[pos],
+            'name': self.names[pos],
+            'path': self.paths[pos] if self.paths is not None else self.source,
+            'web_url': self.web_urls[pos],
+            'size': self.sizes[pos],
+            'created_datetime': self.created[pos],
+            'modified_datetime': self.modified[pos],
+            'matched_keywords': matched_keywords
+        }
+
+    def search(self, keywords: List[str]) -> List[Dict]:
+        positions = self.match_positions(normalize_keywords(keywords))
+        return [self.file_entry(pos, list(keywords)) for pos in positions]
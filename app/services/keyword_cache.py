@@ -0,0 +1,137 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+from app.config import settings
+from app.services.inventory import InventorySnapshot, KeywordKey
+
+CacheKey = Tuple[str, KeywordKey]
+
+
+class KeywordResultCache:
+    """
+    Caché LRU de resultados por (versión del snapshot, palabras clave normalizadas).
+
+    Guarda las posiciones de los archivos que cumplen dentro del snapshot, así
+    que una entrada solo es válida para esa versión exacta del inventario.
+    Cuando un proveedor publica un snapshot nuevo, las entradas de su versión
+    anterior se descartan. El tamaño se limita en bytes aproximados.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.KEYWORD_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[Tuple[int, ...], int]]" = OrderedDict()
+        self._current_versions: Dict[str, str] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _entry_size(key: CacheKey, positions: Tuple[int, ...]) -> int:
+        version, keywords = key
+        return (
+            sys.getsizeof(positions) + 28 * len(positions)
+            + sys.getsizeof(version)
+            + sys.getsizeof(keywords) + sum(sys.getsizeof(kw) for kw in keywords)
+        )
+
+    def observe(self, snapshot: InventorySnapshot):
+        """
+        Registra el snapshot vigente de un proveedor (y cuenta) e invalida la versión anterior
+        """
+        if snapshot.partial:
+            return
+
+        with self._lock:
+            previous = self._current_versions.get(snapshot.origin)
+            self._current_versions[snapshot.origin] = snapshot.version
+            if previous is None or previous == snapshot.version:
+                return
+
+            stale = [key for key in self._entries if key[0] == previous]
+            for key in stale:
+                _, size = self._entries.pop(key)
+                self._bytes -= size
+            self._invalidations += len(stale)
+
+    def get(self, snapshot: InventorySnapshot, keywords: KeywordKey) -> Optional[Tuple[int, ...]]:
+        if snapshot.partial:
+            return None
+
+        key = (snapshot.version, keywords)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def peek(self, snapshot: InventorySnapshot, keywords: KeywordKey) -> Optional[Tuple[int, ...]]:
+        """
+        Como get, pero sin contar aciertos ni fallos: para consultas oportunistas
+        que no calcularían la entrada si falta
+        """
+        if snapshot.partial:
+            return None
+
+        key = (snapshot.version, keywords)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, snapshot: InventorySnapshot, keywords: KeywordKey, positions: Sequence[int]) -> Tuple[int, ...]:
+        positions = tuple(positions)
+        if snapshot.partial:
+            return positions
+
+        key = (snapshot.version, keywords)
+        size = self._entry_size(key, positions)
+        if size > self.max_bytes:
+            return positions
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (positions, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+        return positions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_versions.clear()
+            self._bytes = 0
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "snapshot_versions": dict(self._current_versions)
+            }
+
+
+keyword_cache = KeywordResultCache()
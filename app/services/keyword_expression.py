@@ -0,0 +1,432 @@
+"""
+Expresiones de palabras clave de los requisitos.
+
+Sintaxis de la columna Palabras_Clave:
+
+    acta, firma                   las comas siguen siendo AND (formato original)
+    acta AND (firma OR aprobación)
+    política NOT borrador
+    "plan de continuidad"         frase literal (puede contener comas u operadores)
+    infor*                        prefijo: alguna palabra del nombre empieza así
+
+Los operadores van en mayúsculas; un término sin comodín se busca como
+subcadena del nombre normalizado, igual que antes. Palabras seguidas sin
+operador forman un único término ("plan de backup"), como en el formato
+original. Las comas tienen la menor precedencia, luego OR y luego AND.
+
+La expresión se compila al importar el checklist a una clave canónica: las
+listas simples por comas quedan como KeywordKey (tupla ordenada de palabras)
+y comparten caché y pushdown con el formato original; las demás son árboles
+de tuplas ('AND', ...), ('OR', ...), ('NOT', hijo), ('TERM', texto) y
+('PREFIX', texto) con los hijos ordenados.
+"""
+import json
+import re
+from functools import lru_cache
+from typing import AbstractSet, FrozenSet, List, Optional, Set, Tuple
+from app.services.inventory import InventorySnapshot, normalize_keywords, parse_keywords
+
+TERM = 'TERM'
+PREFIX = 'PREFIX'
+AND = 'AND'
+OR = 'OR'
+NOT = 'NOT'
+NODE_TAGS = (TERM, PREFIX, AND, OR, NOT)
+
+# Sin ninguno de estos elementos la columna se interpreta como la lista por comas original
+_SYNTAX = re.compile(r'["()*]|\b(?:AND|OR|NOT)\b')
+
+_TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<quote>"(?:[^"\\]|\\.)*")(?P<star>\*)?'
+    r'|(?P<punct>[(),])'
+    r'|(?P<word>[^\s(),"]+)'
+    r')'
+)
+
+
+def is_expression(key: Tuple) -> bool:
+    """
+    True si la clave es un árbol de expresión y no una lista simple de palabras
+    (las palabras están en minúsculas, así que no chocan con las etiquetas)
+    """
+    return len(key) > 0 and key[0] in NODE_TAGS
+
+
+def _sort_key(node: Tuple) -> str:
+    return json.dumps(node, ensure_ascii=False)
+
+
+def _combine(operator: str, children: List[Tuple]) -> Tuple:
+    flat = []
+    for child in children:
+        flat.extend(child[1:] if child[0] == operator else [child])
+    unique = sorted({_sort_key(child): child for child in flat}.values(), key=_sort_key)
+    if len(unique) == 1:
+        return unique[0]
+    return (operator, *unique)
+
+
+def _negate(child: Tuple) -> Tuple:
+    return child[1] if child[0] == NOT else (NOT, child)
+
+
+def _term(text: str, prefix: bool) -> Tuple:
+    text = text.lower().strip()
+    if not text:
+        raise ValueError("Término vacío en la expresión de palabras clave")
+    if '*' in text:
+        raise ValueError(f"El comodín * solo puede ir al final de un término: {text!r}")
+    return (PREFIX if prefix else TERM, text)
+
+
+class _Parser:
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.tokens: List[Tuple[str, str]] = []
+        self.index = 0
+        self._tokenize()
+
+    def _tokenize(self):
+        pos = 0
+        while pos < len(self.raw):
+            match = _TOKEN.match(self.raw, pos)
+            if match is None or match.end() == pos:
+                if self.raw[pos:].strip():
+                    raise ValueError(f"Comilla sin cerrar en la expresión de palabras clave: {self.raw!r}")
+                break
+            pos = match.end()
+            if match.group('quote') is not None:
+                text = re.sub(r'\\(.)', r'\1', match.group('quote')[1:-1])
+                self.tokens.append(('prefix' if match.group('star') else 'phrase', text))
+            elif match.group('punct') is not None:
+                self.tokens.append((match.group('punct'), match.group('punct')))
+            elif match.group('word') in (AND, OR, NOT):
+                self.tokens.append(('op', match.group('word')))
+            elif match.group('word') is not None:
+                self.tokens.append(('word', match.group('word')))
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def _error(self, detail: str) -> ValueError:
+        return ValueError(f"Expresión de palabras clave no válida ({detail}): {self.raw!r}")
+
+    def parse(self) -> Tuple:
+        node = self._list()
+        if self._peek() is not None:
+            raise self._error("paréntesis de cierre sobrante")
+        return node
+
+    def _list(self) -> Tuple:
+        children = []
+        while True:
+            token = self._peek()
+            if token is None or token[0] == ')':
+                break
+            if token[0] == ',':
+                self.index += 1
+                continue
+            children.append(self._or())
+            token = self._peek()
+            if token is not None and token[0] not in (',', ')'):
+                raise self._error(f"se esperaba una coma o un paréntesis antes de {token[1]!r}")
+        if not children:
+            raise self._error("expresión vacía")
+        return _combine(AND, children)
+
+    def _or(self) -> Tuple:
+        children = [self._and()]
+        while self._peek() == ('op', OR):
+            self.index += 1
+            children.append(self._and())
+        return _combine(OR, children)
+
+    def _and(self) -> Tuple:
+        children = [self._unary()]
+        while True:
+            token = self._peek()
+            if token == ('op', AND):
+                self.index += 1
+                children.append(self._unary())
+            elif token is not None and (token[0] in ('word', 'phrase', 'prefix', '(') or token == ('op', NOT)):
+                # Términos seguidos sin operador: AND implícito
+                children.append(self._unary())
+            else:
+                break
+        return _combine(AND, children)
+
+    def _unary(self) -> Tuple:
+        if self._peek() == ('op', NOT):
+            self.index += 1
+            return _negate(self._unary())
+        return self._primary()
+
+    def _primary(self) -> Tuple:
+        token = self._peek()
+        if token is None:
+            raise self._error("falta un término al final")
+        kind, text = token
+        self.index += 1
+
+        if kind == '(':
+            node = self._list()
+            if self._peek() is None or self._peek()[0] != ')':
+                raise self._error("falta cerrar un paréntesis")
+            self.index += 1
+            return node
+        if kind == 'phrase':
+            return _term(text, prefix=False)
+        if kind == 'prefix':
+            return _term(text, prefix=True)
+        if kind == 'word':
+            # Palabras seguidas forman un solo término, hasta una que termine en *
+            words = [text]
+            while not words[-1].endswith('*') and self._peek() is not None and self._peek()[0] == 'word':
+                words.append(self._peek()[1])
+                self.index += 1
+            phrase = ' '.join(words)
+            if phrase.endswith('*'):
+                return _term(phrase[:-1], prefix=True)
+            return _term(phrase, prefix=False)
+        raise self._error(f"token inesperado {text!r}")
+
+
+@lru_cache(maxsize=4096)
+def compile_keywords(raw: str) -> Tuple:
+    """
+    Compila la columna de palabras clave a su clave canónica. Lanza
+    ValueError si la expresión no es válida.
+    """
+    raw = raw or ''
+    if not _SYNTAX.search(raw):
+        return normalize_keywords(parse_keywords(raw))
+
+    node = _Parser(raw).parse()
+    if node[0] == TERM:
+        return (node[1],)
+    if node[0] == AND and all(child[0] == TERM for child in node[1:]):
+        return tuple(sorted(child[1] for child in node[1:]))
+    return node
+
+
+def dump_key(key: Tuple) -> str:
+    return json.dumps(key, ensure_ascii=False)
+
+
+def _to_tuple(value):
+    if isinstance(value, list):
+        return tuple(_to_tuple(item) for item in value)
+    return value
+
+
+def load_key(text: str) -> Tuple:
+    key = _to_tuple(json.loads(text))
+    if not isinstance(key, tuple):
+        raise ValueError(f"Expresión compilada no válida: {text!r}")
+    return key
+
+
+def item_key(keywords: str, compiled: Optional[str] = None) -> Tuple:
+    """
+    Clave de un requisito: la expresión compilada al importar o, en requisitos
+    anteriores a las expresiones, la lista por comas original. Esos
+    requisitos no se compilan con la gramática nueva: paréntesis, comillas,
+    * o AND/OR/NOT en su texto eran parte de las palabras clave.
+    """
+    if compiled:
+        try:
+            return load_key(compiled)
+        except ValueError:
+            pass
+    return normalize_keywords(parse_keywords(keywords or ''))
+
+
+def expression_terms(key: Tuple) -> List[str]:
+    """
+    Términos afirmativos de la clave (los que se muestran como palabras encontradas)
+    """
+    if not is_expression(key):
+        return list(key)
+    tag = key[0]
+    if tag == TERM:
+        return [key[1]]
+    if tag == PREFIX:
+        return [key[1] + '*']
+    if tag == NOT:
+        return []
+    terms = []
+    for child in key[1:]:
+        for term in expression_terms(child):
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+def cover_terms(key: Tuple, word_start: bool = False) -> Optional[Set[str]]:
+    """
+    Palabras tales que todo archivo que cumple la expresión contiene alguna
+    de ellas (para el pushdown a Drive). None si no hay cobertura: una
+    expresión que solo niega puede cumplirla cualquier archivo.
+
+    Con `word_start` solo se usan palabras que en todo nombre que cumple la
+    expresión empiezan una palabra (las de un prefijo y las que siguen a un
+    espacio dentro de un término), que es lo único que Drive encuentra.
+    """
+    tag = key[0]
+    if tag in (TERM, PREFIX):
+        words = key[1].split()
+        if word_start and tag == TERM:
+            # La primera palabra de un término puede aparecer a mitad de palabra
+            words = words[1:]
+        return {max(words, key=len)} if words else None
+    if tag == NOT:
+        return None
+    covers = [cover_terms(child, word_start) for child in key[1:]]
+    if tag == OR:
+        if any(cover is None for cover in covers):
+            return None
+        return set().union(*covers)
+    # AND: basta la cobertura de un hijo; se prefiere la de términos más largos y menos consultas
+    covers = [cover for cover in covers if cover is not None]
+    if not covers:
+        return None
+    return max(covers, key=lambda cover: (min(len(term) for term in cover), -len(cover)))
+
+
+@lru_cache(maxsize=1024)
+def _prefix_pattern(text: str):
+    return re.compile(r'(?:^|\W)' + re.escape(text))
+
+
+def _satisfied_terms(node: Tuple, name: str) -> Optional[List[str]]:
+    """
+    Términos afirmativos que hacen que `name` cumpla `node`, o None si no lo cumple
+    """
+    tag = node[0]
+    if tag == TERM:
+        return [node[1]] if node[1] in name else None
+    if tag == PREFIX:
+        return [node[1] + '*'] if _prefix_pattern(node[1]).search(name) else None
+    if tag == NOT:
+        return [] if _satisfied_terms(node[1], name) is None else None
+    terms = []
+    for child in node[1:]:
+        child_terms = _satisfied_terms(child, name)
+        if child_terms is None:
+            if tag == AND:
+                return None
+            continue
+        terms.extend(term for term in child_terms if term not in terms)
+    return terms if tag == AND or terms else None
+
+
+def matched_terms(key: Tuple, normalized_name: str) -> List[str]:
+    """
+    Términos de la expresión que encontró un archivo que la cumple: solo los
+    de las ramas de un OR que el nombre cumple, no todos los de la expresión
+    """
+    if not is_expression(key):
+        return list(key)
+    return _satisfied_terms(key, normalized_name) or []
+
+
+class _Evaluator:
+    """
+    Evalúa un árbol de expresión contra las posting lists del snapshot.
+
+    Los hijos de un AND se evalúan del más selectivo al menos selectivo, cada
+    uno solo sobre los candidatos que dejaron los anteriores, y se corta en
+    cuanto el conjunto queda vacío; las negaciones se restan al final sobre
+    lo que queda. Un OR se detiene cuando ya cubre todos los candidatos.
+    """
+
+    def __init__(self, snapshot: InventorySnapshot, universe: FrozenSet[int]):
+        self.snapshot = snapshot
+        self.names = snapshot.normalized_names
+        self.universe = universe
+        self.inventory_size = len(snapshot.searchable)
+
+    def estimate(self, node: Tuple) -> float:
+        total = len(self.universe)
+        tag = node[0]
+        if tag in (TERM, PREFIX):
+            cached = self.snapshot.cached_posting_size(node[1])
+            # Sin posting list calculada: los términos largos suelen ser más selectivos
+            return cached if cached is not None else total / (1 + len(node[1]))
+        if tag == NOT:
+            return total - self.estimate(node[1])
+        estimates = [self.estimate(child) for child in node[1:]]
+        if tag == AND:
+            positives = [e for child, e in zip(node[1:], estimates) if child[0] != NOT]
+            return min(positives) if positives else total
+        return min(total, sum(estimates))
+
+    def _term(self, text: str, candidates: Optional[AbstractSet[int]]) -> AbstractSet[int]:
+        if candidates is None:
+            return self.snapshot.term_positions(text)
+        cached = self.snapshot.cached_posting_size(text)
+        if cached is not None or len(candidates) * 8 > self.inventory_size:
+            return self.snapshot.term_positions(text) & candidates
+        # Pocos candidatos: se comparan sus nombres en vez de recorrer todo el inventario
+        names = self.names
+        return {pos for pos in candidates if text in names[pos]}
+
+    def evaluate(self, node: Tuple, candidates: Optional[AbstractSet[int]] = None) -> AbstractSet[int]:
+        """
+        Posiciones que cumplen `node`, dentro de `candidates` (None = todo el universo)
+        """
+        tag = node[0]
+        if tag == TERM:
+            return self._term(node[1], candidates)
+        if tag == PREFIX:
+            pattern = _prefix_pattern(node[1])
+            names = self.names
+            return {pos for pos in self._term(node[1], candidates) if pattern.search(names[pos])}
+        if tag == NOT:
+            base = self.universe if candidates is None else candidates
+            return base - self.evaluate(node[1], base)
+        if tag == AND:
+            children = sorted(node[1:], key=self.estimate)
+            positives = [child for child in children if child[0] != NOT]
+            negatives = [child[1] for child in children if child[0] == NOT]
+
+            current = candidates
+            for child in positives:
+                current = self.evaluate(child, current)
+                if not current:
+                    return frozenset()
+            if current is None:
+                current = self.universe
+            for child in negatives:
+                current = current - self.evaluate(child, current)
+                if not current:
+                    return frozenset()
+            return current
+
+        # OR
+        result: Set[int] = set()
+        for child in sorted(node[1:], key=self.estimate):
+            if candidates is None:
+                result |= self.evaluate(child)
+            else:
+                remaining = candidates - result
+                if not remaining:
+                    break
+                result |= self.evaluate(child, remaining)
+        return result
+
+
+def match_key(snapshot: InventorySnapshot, key: Tuple, candidates=None) -> List[int]:
+    """
+    Posiciones del snapshot que cumplen la clave, opcionalmente solo entre `candidates`
+    """
+    if not is_expression(key):
+        return snapshot.match_positions(key, candidates)
+
+    searchable = snapshot.searchable_positions()
+    if candidates is None:
+        return sorted(_Evaluator(snapshot, searchable).evaluate(key))
+
+    allowed = frozenset(pos for pos in candidates if pos in searchable)
+    return sorted(_Evaluator(snapshot, allowed).evaluate(key, allowed))
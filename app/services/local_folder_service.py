@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from app.config import settings
+from app.services.inventory import InventorySnapshot, KeywordKey
+
+
+def snapshot_from_folder(folder: str, source: str) -> InventorySnapshot:
+    """
+    Snapshot de los archivos de una carpeta local, con el mismo formato de
+    metadata que usaba la búsqueda simulada de OneDrive
+    """
+    files = sorted(f for f in Path(folder).glob('*') if f.is_file())
+
+    ids, names, paths, web_urls, sizes, created, modified = [], [], [], [], [], [], []
+    for file in files:
+        stat = file.stat()
+        ids.append(str(file))
+        names.append(file.name)
+        paths.append(str(file.parent))
+        web_urls.append(f'file:///{file.absolute()}')
+        sizes.append(stat.st_size)
+        created.append(str(stat.st_ctime))
+        modified.append(str(stat.st_mtime))
+
+    return InventorySnapshot(
+        ids=ids,
+        names=names,
+        mime_types=[''] * len(ids),
+        web_urls=web_urls,
+        sizes=sizes,
+        created=created,
+        modified=modified,
+        parents=[(path,) for path in paths],
+        source=source,
+        paths=paths
+    )
+
+
+class LocalFolderService:
+    """
+    Proveedor de evidencia sobre una carpeta del servidor (no requiere autenticación)
+    """
+    SOURCE = 'Carpeta local'
+
+    def __init__(self, folder: str = None):
+        self.folder = folder or settings.LOCAL_EVIDENCE_DIR
+
+    def ensure_authenticated(self) -> bool:
+        return os.path.isdir(self.folder)
+
+    def fetch_inventory(self, priority: int = 0) -> InventorySnapshot:
+        snapshot = snapshot_from_folder(self.folder, self.SOURCE)
+        print(f"Inventario de carpeta local {self.folder}: {len(snapshot)} archivos")
+        return snapshot
+
+    def inventory_for_keywords(
+        self,
+        keys: Iterable[KeywordKey],
+        priority: int = 0,
+        require_hierarchy: bool = False
+    ) -> InventorySnapshot:
+        # Listar una carpeta local es barato: siempre se usa el inventario completo
+        return self.fetch_inventory(priority)
+
+    def search_files(self, keywords: List[str]) -> List[Dict]:
+        return self.fetch_inventory().search(keywords)
+
+    def get_file_metadata(self, file_id: str) -> Optional[Dict]:
+        file_path = Path(file_id)
+        if not file_path.is_file():
+            return None
+        return {
+            'id': str(file_path),
+            'name': file_path.name,
+            'size': file_path.stat().st_size
+        }
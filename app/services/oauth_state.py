@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import secrets
+import time
+import uuid
+from typing import Optional
+from app.config import settings
+
+
+class OAuthStateStore:
+    """
+    Estados OAuth pendientes: un valor aleatorio de un solo uso que el
+    callback cambia por la cuenta que inició el login.
+
+    Se guardan como archivos en GOOGLE_TOKENS_DIR/oauth_states (no en
+    memoria) porque el callback puede llegar a otro worker. El nombre del
+    archivo es el hash del estado, así que el directorio no revela estados
+    válidos.
+    """
+
+    def __init__(self, directory: str = None, ttl_seconds: int = None):
+        self.directory = directory or os.path.join(settings.GOOGLE_TOKENS_DIR, "oauth_states")
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.OAUTH_STATE_TTL_SECONDS
+
+    def _path(self, state: str) -> str:
+        digest = hashlib.sha256(state.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _purge_expired(self, now: float):
+        """
+        Elimina los estados que nunca volvieron de Google
+        """
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if now - entry.stat().st_mtime > self.ttl_seconds:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    def issue(self, account: str) -> str:
+        """
+        Crea un estado para la cuenta, válido durante OAUTH_STATE_TTL_SECONDS
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        self._purge_expired(now)
+
+        state = secrets.token_urlsafe(32)
+        path = self._path(state)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"account": account, "expires_at": now + self.ttl_seconds}, f)
+        os.replace(tmp_path, path)
+        return state
+
+    def consume(self, state: Optional[str]) -> Optional[str]:
+        """
+        Cuenta del estado, o None si es desconocido, ya se usó o venció. El
+        archivo se renombra antes de leerlo: si dos callbacks traen el mismo
+        estado, solo uno lo obtiene.
+        """
+        if not state:
+            return None
+
+        path = self._path(state)
+        claimed = f"{path}.{uuid.uuid4().hex}.used"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            return None
+
+        try:
+            with open(claimed, 'r', encoding='utf-8') as f:
+                pending = json.load(f)
+        except (OSError, ValueError):
+            return None
+        finally:
+            try:
+                os.remove(claimed)
+            except OSError:
+                pass
+
+        if time.time() > pending.get("expires_at", 0):
+            return None
+        return pending.get("account")
+
+
+oauth_states = OAuthStateStore()
@@ -1,9 +1,9 @@
-import msal
-import requests
 import json
 import os
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from app.config import settings
+from app.services.inventory import InventorySnapshot, KeywordKey
+from app.services.local_folder_service import snapshot_from_folder
 from pathlib import Path
 
 
@@ -19,6 +19,8 @@ class OneDriveService:
         self.redirect_uri = settings.ONEDRIVE_REDIRECT_URI
         self.access_token = None
         
+        import msal
+        
         cache = msal.SerializableTokenCache()
         
         if os.path.exists(self.TOKEN_CACHE_FILE):
@@ -116,6 +118,26 @@ class OneDriveService:
         
         return False
     
+    def fetch_inventory(self, priority: int = 0) -> InventorySnapshot:
+        """
+        MODO SIMULACION: inventario de la carpeta local que representa OneDrive
+        """
+        if not self.ensure_authenticated():
+            raise RuntimeError("No autenticado con OneDrive")
+        
+        snapshot = snapshot_from_folder(self.SIMULATED_FOLDER, 'OneDrive')
+        print(f"Inventario de OneDrive simulado: {len(snapshot)} archivos")
+        
+        return snapshot
+    
+    def inventory_for_keywords(
+        self,
+        keys: Iterable[KeywordKey],
+        priority: int = 0,
+        require_hierarchy: bool = False
+    ) -> InventorySnapshot:
+        return self.fetch_inventory(priority)
+    
     def search_files(self, keywords: List[str]) -> List[Dict]:
         """
         MODO SIMULACION: Busca archivos en carpeta local
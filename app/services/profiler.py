@@ -0,0 +1,276 @@
+import hmac
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROJECT_DIR = os.path.dirname(_APP_DIR)
+
+# Funciones y librerías cuyo tiempo se resume aparte en cada perfil
+HIGHLIGHTS = {
+    "search_files": ".search_files",
+    "audit_engine_match": "AuditEngine.match",
+    "generate_report": "ReportGenerator.collect",
+    "sqlalchemy": "sqlalchemy/",
+    "google_api": "googleapiclient/",
+}
+
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9]+-[A-Za-z0-9_.-]+\.json$")
+
+Stack = Tuple[str, ...]
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.rsplit("site-packages" + os.sep, 1)[-1]
+    elif filename.startswith(_PROJECT_DIR):
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{filename.replace(os.sep, '/')}:{name}"
+
+
+class SamplingProfiler:
+    """
+    Perfilador estadístico: cada `interval` segundos toma la pila de todos los
+    hilos con sys._current_frames().
+
+    A diferencia de cProfile ve también el trabajo que el request delega al
+    threadpool (motor de auditoría, reportes, BD). Solo se guardan las pilas
+    que pasan por código de la aplicación; si hay otros requests en curso
+    sus muestras también aparecen.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(_APP_DIR)
+                    stack.append(_frame_label(code))
+                    frame = frame.f_back
+                if not in_app:
+                    self.idle_samples += 1
+                    continue
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+
+    def collapsed(self) -> str:
+        """
+        Pilas en formato "colapsado" (flamegraph.pl, speedscope)
+        """
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 30) -> Dict:
+        inclusive: Counter = Counter()
+        exclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            exclusive[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+
+        interval_ms = self.interval * 1000
+        highlights = {}
+        for name, marker in HIGHLIGHTS.items():
+            samples = sum(count for stack, count in self.stacks.items() if any(marker in label for label in stack))
+            highlights[name] = {"samples": samples, "ms": round(samples * interval_ms, 1)}
+
+        return {
+            "samples": self.samples,
+            "interval_ms": interval_ms,
+            "app_stack_samples": sum(self.stacks.values()),
+            "idle_thread_samples": self.idle_samples,
+            "highlights": highlights,
+            "top_inclusive": [
+                {"function": label, "samples": count, "ms": round(count * interval_ms, 1)}
+                for label, count in inclusive.most_common(top)
+            ],
+            "top_self": [
+                {"function": label, "samples": count, "ms": round(count * interval_ms, 1)}
+                for label, count in exclusive.most_common(top)
+            ],
+        }
+
+
+class ProfileStore:
+    """
+    Anillo de perfiles en disco: al superar `max_files` se borran los más antiguos
+    """
+
+    def __init__(self, directory: str = None, max_files: int = None):
+        self.directory = directory or settings.PROFILING_DIR
+        self.max_files = max_files if max_files is not None else settings.PROFILING_MAX_FILES
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def new_name(self, method: str, path: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", path.strip("/"))[:80] or "root"
+        return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{next(self._sequence)}-{method}_{slug}.json"
+
+    def _names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            (name for name in os.listdir(self.directory) if PROFILE_NAME.match(name)),
+            key=lambda name: os.path.getmtime(os.path.join(self.directory, name))
+        )
+
+    def path(self, name: str) -> Optional[str]:
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def save(self, name: str, meta: Dict, profiler: SamplingProfiler):
+        os.makedirs(self.directory, exist_ok=True)
+        document = {"meta": meta, "summary": profiler.summary(), "collapsed": profiler.collapsed()}
+
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            names = self._names()
+            for stale in names[:max(0, len(names) - self.max_files)]:
+                try:
+                    os.remove(os.path.join(self.directory, stale))
+                except OSError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        profiles = []
+        for name in reversed(self._names()):
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    document = json.load(f)
+            except (OSError, ValueError):
+                continue
+            profiles.append({
+                "name": name,
+                **document.get("meta", {}),
+                "highlights": document.get("summary", {}).get("highlights", {})
+            })
+        return profiles
+
+    def load(self, name: str) -> Optional[Dict]:
+        path = self.path(name)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+profile_store = ProfileStore()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(settings.PROFILING_ADMIN_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode("utf-8"), settings.PROFILING_ADMIN_TOKEN.encode("utf-8")
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila un request cuando un administrador lo pide
+    (cabecera X-Profile: 1 o parámetro _profile=1, más X-Admin-Token) o por
+    muestreo de 1 cada PROFILING_SAMPLE_RATE requests. El nombre del perfil
+    guardado se devuelve en la cabecera X-Profile-Id.
+    """
+    # Perfiles simultáneos como máximo; el resto de los requests pasa sin perfilar
+    MAX_ACTIVE = 2
+    SKIPPED_SUFFIXES = ("/events",)
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._counter = itertools.count(1)
+        self._active = threading.BoundedSemaphore(self.MAX_ACTIVE)
+
+    def _trigger(self, scope) -> Optional[str]:
+        path = scope.get("path", "")
+        if path.endswith(self.SKIPPED_SUFFIXES) or path.startswith("/api/admin/"):
+            return None
+
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(b"x-profile", b"") in (b"1", b"true") or b"_profile=1" in scope.get("query_string", b"")
+        if requested and is_admin_token(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            return "on_demand"
+
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate > 0 and next(self._counter) % rate == 0:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self._trigger(scope)
+        if trigger is None or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.new_name(scope["method"], scope["path"])
+        status = {}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", name.encode("ascii"))]}
+            await send(message)
+
+        profiler = SamplingProfiler(settings.PROFILING_INTERVAL_MS / 1000)
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            self._active.release()
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status.get("code"),
+                "trigger": trigger,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+            try:
+                await run_in_threadpool(self.store.save, name, meta, profiler)
+            except Exception as e:
+                print(f"Error guardando perfil {name}: {e}")
@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from app.config import settings
+from app.services.report_generator import write_report
+
+
+class ReportJobs:
+    """
+    Construcción de reportes en un pool de procesos acotado.
+
+    Escribir el Excel es trabajo de CPU que en el proceso del servidor
+    bloquearía el event loop (y compite por el GIL con el threadpool); aquí
+    corre en REPORT_PROCESS_WORKERS procesos aparte. Hay como máximo una
+    construcción en curso por auditoría: la registra `start` antes de reunir
+    los datos, así que los requests concurrentes por el mismo reporte esperan
+    el mismo Future en vez de consultar la BD cada uno.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.REPORT_PROCESS_WORKERS
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[int, Future] = {}
+        # Construcciones descartadas que aún pueden terminar: su reporte ya no vale
+        self._discarded: "weakref.WeakSet[Future]" = weakref.WeakSet()
+        # Tarea del pool que escribe el reporte de cada construcción
+        self._writers: "weakref.WeakKeyDictionary[Future, Future]" = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: hacer fork de un proceso con hilos (uvicorn, threadpool) no es seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=max(1, self.max_workers),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def start(self, audit_id: int) -> Tuple[Future, bool]:
+        """
+        Construcción en curso de la auditoría, o una nueva registrada ya (antes
+        de reunir los datos). El segundo valor es True si la creó esta llamada:
+        quien la crea reúne los datos y llama a `build` o a `fail`.
+
+        Una construcción terminada que nadie retiró con `finish` no dejó su
+        ruta en audits.report_path, así que storage_manager puede haber
+        eliminado el archivo como huérfano: en ese caso se construye de nuevo.
+        """
+        with self._lock:
+            job = self._jobs.get(audit_id)
+            if job is not None and not _report_missing(job):
+                return job, False
+            job = Future()
+            self._jobs[audit_id] = job
+            return job, True
+
+    def build(self, job: Future, data: Dict):
+        """
+        Encola en el pool la escritura del reporte de una construcción creada
+        por `start`. No hace nada si se descartó mientras se reunían los datos.
+        """
+        with self._lock:
+            if job in self._discarded or not job.set_running_or_notify_cancel():
+                return
+            try:
+                writer = self._pool().submit(write_report, data)
+            except Exception as e:
+                job.set_exception(e)
+                return
+            self._writers[job] = writer
+        writer.add_done_callback(lambda done: _forward(done, job))
+
+    def fail(self, audit_id: int, job: Future, error: BaseException):
+        """
+        Termina con error una construcción cuyos datos no se pudieron reunir;
+        el siguiente request vuelve a intentarlo. Una cancelación del request
+        que reunía los datos les llega a los demás como un error común, no
+        como su propia cancelación.
+        """
+        if not isinstance(error, Exception):
+            error = RuntimeError(f"Se interrumpió la construcción del reporte: {error!r}")
+        with self._lock:
+            if self._jobs.get(audit_id) is job:
+                del self._jobs[audit_id]
+        if job.set_running_or_notify_cancel():
+            job.set_exception(error)
+
+    async def wait(self, job: Future, timeout: float) -> bool:
+        """
+        Espera hasta `timeout` segundos sin bloquear el event loop; True si terminó
+        """
+        if not job.done() and timeout > 0:
+            await asyncio.wait({asyncio.wrap_future(job)}, timeout=timeout)
+        return job.done()
+
+    def finish(self, audit_id: int, job: Future) -> Optional[str]:
+        """
+        Retira una construcción terminada y devuelve la ruta del reporte (o
+        relanza el error de la construcción). None si la construcción se
+        descartó mientras corría.
+        """
+        with self._lock:
+            if self._jobs.get(audit_id) is job:
+                del self._jobs[audit_id]
+            if job in self._discarded:
+                return None
+        try:
+            return job.result()
+        except BrokenProcessPool:
+            # Un proceso del pool murió: el siguiente reporte crea un pool nuevo
+            with self._lock:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+                    self._jobs.clear()
+            raise
+
+    def discard(self, audit_id: int):
+        """
+        Olvida la construcción de una auditoría cuyos resultados cambiaron o que se eliminó
+        """
+        with self._lock:
+            job = self._jobs.pop(audit_id, None)
+            if job is not None:
+                self._discarded.add(job)
+                writer = self._writers.get(job)
+        if job is not None:
+            job.cancel()
+            if writer is not None:
+                writer.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._jobs.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _report_missing(job: Future) -> bool:
+    """
+    True si la construcción terminó bien pero su archivo ya no existe
+    """
+    if not job.done() or job.cancelled() or job.exception() is not None:
+        return False
+    return not os.path.exists(job.result())
+
+
+def _forward(writer: Future, job: Future):
+    """
+    Copia el resultado de la tarea del pool a la construcción que esperan los requests
+    """
+    if writer.cancelled():
+        job.set_exception(CancelledError())
+    elif writer.exception() is not None:
+        job.set_exception(writer.exception())
+    else:
+        job.set_result(writer.result())
+
+
+report_jobs = ReportJobs()
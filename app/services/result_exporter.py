@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+from typing import Dict, Iterator, List
+from sqlalchemy import and_, select
+from app.database import SessionLocal
+from app.models.audit import Audit, AuditResult, ChecklistItem
+
+
+class ResultExporter:
+    """
+    Exporta los resultados de una auditoría fila a fila desde un cursor del servidor
+    """
+    FORMATS = {
+        "csv": ("text/csv; charset=utf-8", "csv"),
+        "jsonl": ("application/x-ndjson", "jsonl"),
+        "parquet": ("application/vnd.apache.parquet", "parquet"),
+    }
+    COLUMNS = [
+        "item_id", "description", "keywords", "is_mandatory",
+        "found", "matched_count", "matched_files", "notes"
+    ]
+
+    def __init__(self, audit: Audit, chunk_rows: int = 1000):
+        self.audit_id = audit.id
+        self.items_clause = audit.items_clause()
+        self.chunk_rows = chunk_rows
+
+    @staticmethod
+    def ensure_format_available(export_format: str):
+        """
+        Lanza ImportError si el formato requiere una dependencia no instalada
+        """
+        if export_format == "parquet":
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+
+    def _query(self):
+        return (
+            select(
+                ChecklistItem.item_id,
+                ChecklistItem.description,
+                ChecklistItem.keywords,
+                ChecklistItem.is_mandatory,
+                AuditResult.found,
+                AuditResult.matched_files,
+                AuditResult.notes
+            )
+            .outerjoin(AuditResult, and_(
+                AuditResult.checklist_item_id == ChecklistItem.id,
+                AuditResult.audit_id == self.audit_id
+            ))
+            .where(self.items_clause)
+            .order_by(ChecklistItem.id)
+            .execution_options(yield_per=self.chunk_rows)
+        )
+
+    def iter_rows(self) -> Iterator[Dict]:
+        """
+        Recorre los resultados con una sesión propia: la del request ya se
+        habrá cerrado cuando el stream empiece a enviarse
+        """
+        db = SessionLocal()
+        try:
+            for row in db.execute(self._query()):
+                file_names = _matched_file_names(row.matched_files)
+                yield {
+                    "item_id": row.item_id,
+                    "description": row.description,
+                    "keywords": row.keywords,
+                    "is_mandatory": bool(row.is_mandatory),
+                    "found": bool(row.found),
+                    "matched_count": len(file_names),
+                    "matched_files": file_names,
+                    "notes": row.notes
+                }
+        finally:
+            db.close()
+
+    def stream(self, export_format: str) -> Iterator[bytes]:
+        if export_format == "csv":
+            return self._stream_csv()
+        if export_format == "jsonl":
+            return self._stream_jsonl()
+        if export_format == "parquet":
+            return self._stream_parquet()
+        raise ValueError(f"Formato no soportado: {export_format}")
+
+    def _stream_csv(self) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.COLUMNS)
+
+        # BOM para que Excel detecte UTF-8
+        yield "\ufeff".encode("utf-8") + buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+        pending = 0
+        for row in self.iter_rows():
+            writer.writerow([
+                "; ".join(row[col]) if col == "matched_files" else row[col]
+                for col in self.COLUMNS
+            ])
+            pending += 1
+            if pending >= self.chunk_rows:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        if pending:
+            yield buffer.getvalue().encode("utf-8")
+
+    def _stream_jsonl(self) -> Iterator[bytes]:
+        lines = []
+        for row in self.iter_rows():
+            lines.append(json.dumps(row, ensure_ascii=False))
+            if len(lines) >= self.chunk_rows:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines = []
+
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    def _stream_parquet(self) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("item_id", pa.string()),
+            ("description", pa.string()),
+            ("keywords", pa.string()),
+            ("is_mandatory", pa.bool_()),
+            ("found", pa.bool_()),
+            ("matched_count", pa.int32()),
+            ("matched_files", pa.list_(pa.string())),
+            ("notes", pa.string()),
+        ])
+
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+
+        # Cada bloque de filas se escribe como un row group y se envía de inmediato
+        columns: Dict[str, List] = {col: [] for col in self.COLUMNS}
+        try:
+            for row in self.iter_rows():
+                for col in self.COLUMNS:
+                    columns[col].append(row[col])
+                if len(columns["item_id"]) >= self.chunk_rows:
+                    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                    columns = {col: [] for col in self.COLUMNS}
+                    yield sink.drain()
+
+            if columns["item_id"]:
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        finally:
+            writer.close()
+
+        yield sink.drain()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Destino de escritura que acumula bytes hasta que el stream los recoge
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _matched_file_names(matched_files: str) -> List[str]:
+    if not matched_files:
+        return []
+    try:
+        return [f['name'] for f in json.loads(matched_files)]
+    except (ValueError, KeyError, TypeError):
+        return []
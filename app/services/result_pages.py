@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.audit import Audit, AuditResult, ChecklistItem
+from app.utils.response_utils import loads_json
+
+RESULT_FIELDS = (
+    "id", "checklist_item_id", "item_id", "description",
+    "is_mandatory", "found", "matched_files", "notes"
+)
+
+
+def _matched_files(raw: Optional[str]) -> List[Dict]:
+    """
+    Archivos encontrados como lista (en la BD se guardan como texto JSON)
+    """
+    if not raw:
+        return []
+    try:
+        return loads_json(raw)
+    except ValueError:
+        return []
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class ResultPageQuery:
+    """
+    Páginas de resultados de una auditoría con paginación por cursor (keyset)
+    sobre el id del requisito: cada página cuesta lo mismo sin importar
+    cuán adelante esté, a diferencia de OFFSET.
+
+    Las filas se leen como tuplas de columnas y se convierten a dicts planos,
+    sin cargar objetos ORM ni validar un schema por fila; solo matched_files
+    se decodifica para que llegue como lista y no como texto JSON.
+    """
+
+    def __init__(self, db: Session, audit: Audit):
+        self.db = db
+        self.audit_id = audit.id
+        self.items_clause = audit.items_clause()
+
+    def page(
+        self,
+        after: Optional[int] = None,
+        limit: int = 500,
+        found: Optional[bool] = None,
+        mandatory: Optional[bool] = None,
+        item_prefix: Optional[str] = None
+    ) -> Dict:
+        query = (
+            select(
+                AuditResult.id,
+                ChecklistItem.id,
+                ChecklistItem.item_id,
+                ChecklistItem.description,
+                ChecklistItem.is_mandatory,
+                AuditResult.found,
+                AuditResult.matched_files,
+                AuditResult.notes
+            )
+            .join(AuditResult, AuditResult.checklist_item_id == ChecklistItem.id)
+            .where(AuditResult.audit_id == self.audit_id, self.items_clause)
+        )
+
+        if after is not None:
+            query = query.where(ChecklistItem.id > after)
+        if found is not None:
+            query = query.where(AuditResult.found.is_(found))
+        if mandatory is not None:
+            query = query.where(ChecklistItem.is_mandatory.is_(mandatory))
+        if item_prefix:
+            query = query.where(ChecklistItem.item_id.like(_escape_like(item_prefix) + "%", escape="\\"))
+
+        # Una fila de más indica si hay otra página sin contar el total
+        rows = self.db.execute(query.order_by(ChecklistItem.id).limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items: List[Dict] = []
+        for row in rows:
+            item = dict(zip(RESULT_FIELDS, row))
+            item["matched_files"] = _matched_files(item["matched_files"])
+            items.append(item)
+
+        return {
+            "audit_id": self.audit_id,
+            "items": items,
+            "count": len(items),
+            "next_cursor": items[-1]["checklist_item_id"] if has_more else None
+        }
@@ -0,0 +1,372 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from app.config import settings
+from app.services.inventory import InventorySnapshot, parse_timestamp
+
+MAGIC = b"AUDSNAP1"
+FORMAT_VERSION = 1
+# Separador de los padres dentro de la columna `parents` (no aparece en IDs ni rutas)
+PARENTS_SEPARATOR = "\x1f"
+# Milisegundos epoch de una fecha ausente o ilegible
+MISSING_TIME = -(2 ** 63)
+
+_HEADER_PREFIX = struct.Struct("<8sQ")
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _format_time(milliseconds: int) -> str:
+    moment = datetime.fromtimestamp(milliseconds // 1000, timezone.utc)
+    return f"{moment.strftime('%Y-%m-%dT%H:%M:%S')}.{milliseconds % 1000:03d}Z"
+
+
+class MappedStringColumn(Sequence):
+    """
+    Columna de textos sobre el archivo mapeado: un arreglo de offsets y un
+    blob UTF-8 con todos los valores concatenados. Solo se decodifica el
+    valor que se pide.
+    """
+
+    def __init__(self, mapping: mmap.mmap, offsets: memoryview, blob_start: int):
+        self._mapping = mapping
+        self._offsets = offsets
+        self._blob_start = blob_start
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return self._mapping[start:end].decode("utf-8")
+
+    def positions_containing(self, needle: str) -> Set[int]:
+        """
+        Posiciones cuyo valor contiene `needle`, buscando directamente en el
+        blob (sin decodificar cada valor)
+        """
+        encoded = needle.encode("utf-8")
+        if not encoded:
+            return set(range(len(self)))
+
+        offsets = self._offsets
+        base = self._blob_start
+        end = base + offsets[len(offsets) - 1]
+        found = set()
+
+        index = self._mapping.find(encoded, base, end)
+        while index != -1:
+            relative = index - base
+            pos = bisect_right(offsets, relative) - 1
+            record_end = offsets[pos + 1]
+            if relative + len(encoded) <= record_end:
+                found.add(pos)
+                next_start = base + record_end
+            else:
+                # La coincidencia cruza el límite entre dos valores
+                next_start = index + 1
+            index = self._mapping.find(encoded, next_start, end)
+
+        return found
+
+
+class MappedParentsColumn(Sequence):
+    def __init__(self, column: MappedStringColumn):
+        self._column = column
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = self._column[index]
+        return tuple(value.split(PARENTS_SEPARATOR)) if value else ()
+
+
+class MappedCategoryColumn(Sequence):
+    """
+    Columna con pocos valores distintos (mimeType): un id de 16 bits por fila y la tabla de valores
+    """
+
+    def __init__(self, ids: memoryview, values: List[str]):
+        self._ids = ids
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._values[i] for i in self._ids[index]]
+        return self._values[self._ids[index]]
+
+
+class MappedTimeColumn(Sequence):
+    """
+    Fechas guardadas como milisegundos epoch; se devuelven en el formato RFC 3339 de Drive
+    """
+
+    def __init__(self, milliseconds: memoryview):
+        self._milliseconds = milliseconds
+
+    def __len__(self) -> int:
+        return len(self._milliseconds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = self._milliseconds[index]
+        return "" if value == MISSING_TIME else _format_time(value)
+
+    def epoch_seconds(self) -> List[Optional[float]]:
+        return [None if value == MISSING_TIME else value / 1000 for value in self._milliseconds]
+
+
+def _string_section(values: Sequence[str]) -> Tuple[bytes, bytes]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("Q", [0])
+    total = 0
+    for value in encoded:
+        total += len(value)
+        offsets.append(total)
+    return offsets.tobytes(), b"".join(encoded)
+
+
+def _time_section(values: Sequence[str]) -> bytes:
+    milliseconds = array("q")
+    for value in values:
+        timestamp = parse_timestamp(value)
+        milliseconds.append(MISSING_TIME if timestamp is None else int(round(timestamp * 1000)))
+    return milliseconds.tobytes()
+
+
+def write_snapshot(snapshot: InventorySnapshot, path: str):
+    """
+    Serializa un snapshot en formato columnar: cada columna es una sección
+    alineada a 8 bytes descrita en una cabecera JSON
+    """
+    mime_table = sorted(set(snapshot.mime_types))
+    if len(mime_table) > 0xFFFF:
+        raise ValueError("Demasiados mimeTypes distintos para el formato de snapshot")
+    mime_ids = {mime: index for index, mime in enumerate(mime_table)}
+
+    sections: List[Tuple[str, bytes]] = []
+    for name, values in (
+        ("ids", snapshot.ids),
+        ("names", snapshot.names),
+        ("normalized_names", snapshot.normalized_names),
+        ("web_urls", snapshot.web_urls),
+        ("parents", [PARENTS_SEPARATOR.join(parents) for parents in snapshot.parents]),
+    ):
+        offsets, blob = _string_section(values)
+        sections.append((f"{name}.offsets", offsets))
+        sections.append((f"{name}.blob", blob))
+    if snapshot.paths is not None:
+        offsets, blob = _string_section(snapshot.paths)
+        sections.append(("paths.offsets", offsets))
+        sections.append(("paths.blob", blob))
+
+    sections.append(("sizes", array("q", snapshot.sizes).tobytes()))
+    sections.append(("created", _time_section(snapshot.created)))
+    sections.append(("modified", _time_section(snapshot.modified)))
+    sections.append(("mime_ids", array("H", [mime_ids[mime] for mime in snapshot.mime_types]).tobytes()))
+    sections.append(("searchable", array("I", snapshot.searchable).tobytes()))
+
+    layout: Dict[str, Dict[str, int]] = {}
+    offset = 0
+    for name, data in sections:
+        layout[name] = {"offset": offset, "length": len(data)}
+        offset = _align(offset + len(data))
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "count": len(snapshot),
+        "version": snapshot.version,
+        "source": snapshot.source,
+        "account": snapshot.account,
+        "fetched_at": snapshot.fetched_at,
+        "mime_types": mime_table,
+        "sections": layout,
+    }).encode("utf-8")
+
+    data_start = _align(_HEADER_PREFIX.size + len(header))
+    with open(path, "wb") as f:
+        f.write(_HEADER_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - _HEADER_PREFIX.size - len(header)))
+        position = 0
+        for name, data in sections:
+            f.write(b"\0" * (layout[name]["offset"] - position))
+            f.write(data)
+            position = layout[name]["offset"] + len(data)
+
+
+def load_snapshot(path: str) -> InventorySnapshot:
+    """
+    Abre un snapshot serializado con mmap. Las columnas leen del archivo
+    mapeado, así que todos los procesos que lo abren comparten las mismas
+    páginas del page cache y la carga no recorre los datos.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, header_length = _HEADER_PREFIX.unpack_from(mapping, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} no es un snapshot de inventario")
+    header = json.loads(mapping[_HEADER_PREFIX.size:_HEADER_PREFIX.size + header_length])
+    if header["format"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} tiene un formato de snapshot incompatible")
+
+    data_start = _align(_HEADER_PREFIX.size + header_length)
+    view = memoryview(mapping)
+    layout = header["sections"]
+
+    def section(name: str, typecode: str) -> memoryview:
+        start = data_start + layout[name]["offset"]
+        return view[start:start + layout[name]["length"]].cast(typecode)
+
+    def strings(name: str) -> MappedStringColumn:
+        return MappedStringColumn(mapping, section(f"{name}.offsets", "Q"), data_start + layout[f"{name}.blob"]["offset"])
+
+    return InventorySnapshot(
+        ids=strings("ids"),
+        names=strings("names"),
+        mime_types=MappedCategoryColumn(section("mime_ids", "H"), header["mime_types"]),
+        web_urls=strings("web_urls"),
+        sizes=section("sizes", "q"),
+        created=MappedTimeColumn(section("created", "q")),
+        modified=MappedTimeColumn(section("modified", "q")),
+        parents=MappedParentsColumn(strings("parents")),
+        source=header["source"],
+        paths=strings("paths") if "paths.offsets" in layout else None,
+        version=header["version"],
+        fetched_at=header["fetched_at"],
+        account=header["account"],
+        normalized_names=strings("normalized_names"),
+        searchable=section("searchable", "I")
+    )
+
+
+class SnapshotStore:
+    """
+    Snapshots de inventario en disco compartidos por todos los workers.
+
+    Por cada origen (proveedor y cuenta) se guarda un puntero al snapshot más
+    reciente y se conservan las últimas `keep` versiones; un worker que aún
+    tiene mapeada una versión borrada la sigue leyendo sin problema.
+    """
+
+    def __init__(self, directory: str = None, keep: int = None):
+        self.directory = directory or settings.SNAPSHOT_DIR
+        self.keep = keep if keep is not None else settings.SNAPSHOT_KEEP_VERSIONS
+        self._lock = threading.Lock()
+        # Snapshots ya mapeados en este proceso, por ruta
+        self._loaded: Dict[str, InventorySnapshot] = {}
+
+    @staticmethod
+    def _prefix(origin: str) -> str:
+        return hashlib.sha256(origin.encode("utf-8")).hexdigest()[:16]
+
+    def _pointer_path(self, origin: str) -> str:
+        return os.path.join(self.directory, f"{self._prefix(origin)}.latest")
+
+    def _load(self, path: str) -> InventorySnapshot:
+        with self._lock:
+            snapshot = self._loaded.get(path)
+            if snapshot is None:
+                snapshot = load_snapshot(path)
+                self._loaded = {p: s for p, s in self._loaded.items() if os.path.exists(p)}
+                self._loaded[path] = snapshot
+            return snapshot
+
+    def load_latest(self, origin: str, max_age: float) -> Optional[InventorySnapshot]:
+        """
+        Snapshot más reciente del origen si tiene menos de `max_age` segundos
+        """
+        try:
+            with open(self._pointer_path(origin), "r", encoding="utf-8") as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - pointer.get("fetched_at", 0) >= max_age:
+            return None
+
+        path = os.path.join(self.directory, pointer.get("file", ""))
+        try:
+            return self._load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Snapshot {path} no disponible: {e}")
+            return None
+
+    def persist(self, snapshot: InventorySnapshot) -> InventorySnapshot:
+        """
+        Guarda el snapshot y devuelve su versión mapeada desde disco. Si no se
+        puede guardar devuelve el mismo snapshot en memoria.
+        """
+        if snapshot.partial:
+            return snapshot
+
+        prefix = self._prefix(snapshot.origin)
+        filename = f"{prefix}-{snapshot.version}.snap"
+        path = os.path.join(self.directory, filename)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                write_snapshot(snapshot, tmp_path)
+                os.replace(tmp_path, path)
+
+            pointer_tmp = f"{self._pointer_path(snapshot.origin)}.{uuid.uuid4().hex}.tmp"
+            with open(pointer_tmp, "w", encoding="utf-8") as f:
+                json.dump({"file": filename, "version": snapshot.version, "fetched_at": snapshot.fetched_at}, f)
+            os.replace(pointer_tmp, self._pointer_path(snapshot.origin))
+
+            mapped = self._load(path)
+            # Misma versión con el contenido ya guardado: se conserva la hora del listado nuevo
+            mapped.fetched_at = snapshot.fetched_at
+        except (OSError, ValueError) as e:
+            print(f"No se pudo guardar el snapshot de {snapshot.origin}: {e}")
+            return snapshot
+
+        self._prune(prefix, keep_file=filename)
+        return mapped
+
+    def _prune(self, prefix: str, keep_file: str):
+        try:
+            candidates = [
+                name for name in os.listdir(self.directory)
+                if name.startswith(prefix + "-") and name.endswith(".snap") and name != keep_file
+            ]
+        except OSError:
+            return
+
+        candidates.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)), reverse=True)
+        for name in candidates[max(0, self.keep - 1):]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+from app.config import settings
+from app.database import SessionLocal
+from app.models.audit import Audit
+
+
+class StorageManager:
+    """
+    Mantiene los directorios de uploads y reportes dentro de un presupuesto de bytes.
+
+    Los reportes se pueden regenerar, así que se eliminan primero: los que
+    nadie referencia, los que superan la antigüedad máxima y después los
+    menos usados recientemente. Los uploads solo se eliminan si aún así se
+    excede el presupuesto, porque ya fueron procesados al subirse.
+    """
+    # Margen para no borrar un archivo que se está escribiendo o procesando
+    GRACE_SECONDS = 300
+
+    def __init__(
+        self,
+        upload_dir: str = None,
+        reports_dir: str = None,
+        max_bytes: int = None,
+        reports_max_age: int = None
+    ):
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self.reports_dir = reports_dir or settings.REPORTS_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.STORAGE_MAX_BYTES
+        self.reports_max_age = reports_max_age if reports_max_age is not None else settings.REPORTS_MAX_AGE_SECONDS
+        self._lock = threading.Lock()
+        self.last_compaction: Optional[Dict] = None
+
+    @staticmethod
+    def touch(path: str):
+        """
+        Marca un archivo como usado recientemente para la política LRU
+        """
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _scan(directory: str) -> List[Dict]:
+        entries = []
+        if not os.path.isdir(directory):
+            return entries
+
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append({
+                    "path": os.path.normpath(entry.path),
+                    "size": stat.st_size,
+                    "last_used": stat.st_mtime
+                })
+        return entries
+
+    def usage(self) -> Dict:
+        uploads = self._scan(self.upload_dir)
+        reports = self._scan(self.reports_dir)
+        uploads_bytes = sum(f["size"] for f in uploads)
+        reports_bytes = sum(f["size"] for f in reports)
+        return {
+            "uploads_files": len(uploads),
+            "uploads_bytes": uploads_bytes,
+            "reports_files": len(reports),
+            "reports_bytes": reports_bytes,
+            "total_bytes": uploads_bytes + reports_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def compact(self, referenced_reports: Optional[Set[str]] = None) -> Dict:
+        """
+        Aplica las políticas de retención y devuelve el espacio recuperado.
+
+        referenced_reports son las rutas guardadas en audits.report_path; si se
+        indica, los reportes que no aparecen ahí se consideran huérfanos.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            now = time.time()
+            referenced = {os.path.normpath(p) for p in referenced_reports} if referenced_reports is not None else None
+
+            reports = self._scan(self.reports_dir)
+            uploads = self._scan(self.upload_dir)
+            removed = {"orphan_reports": 0, "expired_reports": 0, "lru_reports": 0, "lru_uploads": 0}
+            reclaimed = 0
+
+            def remove(entry, reason):
+                nonlocal reclaimed
+                try:
+                    os.remove(entry["path"])
+                except OSError as e:
+                    print(f"Error eliminando {entry['path']}: {e}")
+                    return False
+                removed[reason] += 1
+                reclaimed += entry["size"]
+                return True
+
+            kept_reports = []
+            for entry in reports:
+                if now - entry["last_used"] < self.GRACE_SECONDS:
+                    kept_reports.append(entry)
+                elif referenced is not None and entry["path"] not in referenced:
+                    remove(entry, "orphan_reports")
+                elif self.reports_max_age > 0 and now - entry["last_used"] > self.reports_max_age:
+                    remove(entry, "expired_reports")
+                else:
+                    kept_reports.append(entry)
+
+            total = sum(f["size"] for f in kept_reports) + sum(f["size"] for f in uploads)
+
+            if self.max_bytes > 0 and total > self.max_bytes:
+                for reason, entries in (("lru_reports", kept_reports), ("lru_uploads", uploads)):
+                    for entry in sorted(entries, key=lambda f: f["last_used"]):
+                        if total <= self.max_bytes:
+                            break
+                        if now - entry["last_used"] < self.GRACE_SECONDS:
+                            continue
+                        if remove(entry, reason):
+                            total -= entry["size"]
+
+            self.last_compaction = {
+                "finished_at": now,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "files_removed": sum(removed.values()),
+                "bytes_reclaimed": reclaimed,
+                "bytes_in_use": total,
+                "max_bytes": self.max_bytes,
+                **removed
+            }
+
+            if reclaimed:
+                print(f"Compactación de almacenamiento: {self.last_compaction['files_removed']} archivos, "
+                      f"{reclaimed} bytes recuperados")
+
+            return self.last_compaction
+
+
+def compact_storage() -> Dict:
+    """
+    Compactación completa: consulta los reportes vigentes y aplica las políticas
+    """
+    db = SessionLocal()
+    try:
+        referenced = {path for (path,) in db.query(Audit.report_path).filter(Audit.report_path.isnot(None))}
+    finally:
+        db.close()
+
+    return storage_manager.compact(referenced_reports=referenced)
+
+
+storage_manager = StorageManager()
@@ -1,8 +1,9 @@
 from fastapi import UploadFile, HTTPException
 import aiofiles
+import hashlib
 import os
+import uuid
 from typing import List
-from datetime import datetime
 
 
 def validate_file(file: UploadFile, allowed_extensions: List[str], max_size: int):
@@ -22,22 +23,64 @@ def validate_file(file: UploadFile, allowed_extensions: List[str], max_size: int
     # La validación completa se hace al guardar
 
 
+def file_content_hash(file_path: str) -> str:
+    """
+    SHA-256 del contenido de un archivo
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _content_path(content: bytes, filename: str, upload_dir: str) -> str:
+    content_hash = hashlib.sha256(content).hexdigest()
+    file_ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(upload_dir, f"{content_hash}{file_ext}")
+
+
+def save_content(content: bytes, filename: str, upload_dir: str) -> str:
+    """
+    Versión síncrona de save_upload_file para contenido ya leído (archivos de un zip)
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    file_path = _content_path(content, filename, upload_dir)
+    
+    if os.path.exists(file_path):
+        os.utime(file_path, None)
+        return file_path
+    
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+    
+    return file_path
+
+
 async def save_upload_file(file: UploadFile, upload_dir: str) -> str:
     """
-    Guarda un archivo subido en el directorio especificado
+    Guarda un archivo subido en el directorio especificado.
+    El nombre es el hash del contenido, así que subir el mismo archivo
+    varias veces no ocupa espacio adicional.
     """
     # Crear directorio si no existe
     os.makedirs(upload_dir, exist_ok=True)
     
-    # Generar nombre único
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{timestamp}_{file.filename}"
-    file_path = os.path.join(upload_dir, unique_filename)
+    content = await file.read()
+    
+    # Nombre por contenido
+    file_path = _content_path(content, file.filename, upload_dir)
+    
+    if os.path.exists(file_path):
+        os.utime(file_path, None)
+        return file_path
     
-    # Guardar archivo
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
+    # Escritura atómica para que una subida concurrente no lea un archivo a medias
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    async with aiofiles.open(tmp_path, 'wb') as f:
         await f.write(content)
+    os.replace(tmp_path, file_path)
     
     return file_path
\ No newline at end of file
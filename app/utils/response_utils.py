@@ -0,0 +1,73 @@
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+# Respuestas más chicas que esto no compensan el costo de comprimir
+MIN_COMPRESS_BYTES = 1024
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value: Any):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_json(data: Any) -> bytes:
+    """
+    Serializa a JSON en UTF-8 con orjson si está instalado
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads_json(raw) -> Any:
+    """
+    Lee JSON con orjson si está instalado
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    encodings = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def compress_body(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Comprime con brotli (si está instalado) o gzip según lo que acepte el
+    cliente. Devuelve el cuerpo y el Content-Encoding usado (None sin comprimir).
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return brotli.compress(body, quality=4), "br"
+    if accepted.get("gzip", 0) > 0:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
@@ -0,0 +1,3 @@
+"""
+Benchmarks del sistema
+"""
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Benchmark de perfiles del motor de base de datos
+
+Simula escrituras concurrentes de resultados de auditoría mientras otros
+hilos consultan el estado de las auditorías (como hace el frontend).
+
+Uso:
+    python -m benchmarks.db_concurrency
+    python -m benchmarks.db_concurrency --writers 8 --pollers 16 --seconds 10
+    DATABASE_URL=postgresql://... python -m benchmarks.db_concurrency --profiles default
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_TMP_DIR = tempfile.mkdtemp(prefix="audit_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'bootstrap.db')}")
+os.environ.setdefault("DEBUG", "False")
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, create_db_engine  # noqa: E402
+from app.models.audit import Audit, ChecklistItem, AuditResult  # noqa: E402
+
+
+# Perfiles de SQLite a comparar: el modo heredado (rollback journal) y WAL
+SQLITE_PROFILES = {
+    "legacy": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_MMAP_SIZE": 0},
+    "wal": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL"},
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _seed(Session, audits: int, items_per_audit: int):
+    db = Session()
+    try:
+        audit_ids = []
+        for n in range(audits):
+            audit = Audit(filename=f"bench_{n}.xlsx", status="processing", total_items=items_per_audit)
+            db.add(audit)
+            db.flush()
+            for i in range(items_per_audit):
+                db.add(ChecklistItem(
+                    audit_id=audit.id,
+                    item_id=str(i),
+                    description=f"Requisito {i}",
+                    keywords="politica, seguridad",
+                    is_mandatory=True
+                ))
+            audit_ids.append(audit.id)
+        db.commit()
+        return audit_ids
+    finally:
+        db.close()
+
+
+def _writer(Session, audit_id, stop, latencies, errors, batch_size):
+    db = Session()
+    try:
+        item_ids = [row.id for row in db.query(ChecklistItem.id).filter(ChecklistItem.audit_id == audit_id)]
+        idx = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                for _ in range(batch_size):
+                    db.add(AuditResult(
+                        audit_id=audit_id,
+                        checklist_item_id=item_ids[idx % len(item_ids)],
+                        found=idx % 2 == 0,
+                        notes="bench"
+                    ))
+                    idx += 1
+                audit = db.get(Audit, audit_id)
+                audit.compliant_items = idx // 2
+                db.commit()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                db.rollback()
+                errors.append(1)
+    finally:
+        db.close()
+
+
+def _poller(Session, audit_ids, stop, latencies, errors):
+    db = Session()
+    try:
+        idx = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                audit_id = audit_ids[idx % len(audit_ids)]
+                db.query(Audit).filter(Audit.id == audit_id).first()
+                db.commit()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                db.rollback()
+                errors.append(1)
+            idx += 1
+    finally:
+        db.close()
+
+
+def run_profile(name: str, database_url: str, args) -> dict:
+    engine = create_db_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    audit_ids = _seed(Session, args.writers, args.items)
+
+    stop = threading.Event()
+    write_latencies, read_latencies, write_errors, read_errors = [], [], [], []
+
+    threads = [
+        threading.Thread(target=_writer, args=(Session, audit_id, stop, write_latencies, write_errors, args.batch))
+        for audit_id in audit_ids
+    ]
+    threads += [
+        threading.Thread(target=_poller, args=(Session, audit_ids, stop, read_latencies, read_errors))
+        for _ in range(args.pollers)
+    ]
+
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+
+    return {
+        "profile": name,
+        "commits_per_s": len(write_latencies) / args.seconds,
+        "polls_per_s": len(read_latencies) / args.seconds,
+        "write_p50_ms": _percentile(write_latencies, 50) * 1000,
+        "write_p95_ms": _percentile(write_latencies, 95) * 1000,
+        "poll_p50_ms": _percentile(read_latencies, 50) * 1000,
+        "poll_p95_ms": _percentile(read_latencies, 95) * 1000,
+        "poll_mean_ms": (statistics.mean(read_latencies) * 1000) if read_latencies else 0.0,
+        "errors": len(write_errors) + len(read_errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfiles del motor de base de datos")
+    parser.add_argument("--writers", type=int, default=4, help="Auditorías escribiendo en paralelo")
+    parser.add_argument("--pollers", type=int, default=8, help="Hilos consultando el estado")
+    parser.add_argument("--items", type=int, default=200, help="Requisitos por auditoría")
+    parser.add_argument("--batch", type=int, default=20, help="Resultados por commit")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duración de cada perfil")
+    parser.add_argument("--profiles", default=",".join(SQLITE_PROFILES), help="Perfiles de SQLite a comparar")
+    args = parser.parse_args()
+
+    results = []
+    base_url = settings.DATABASE_URL
+
+    if base_url.startswith("sqlite"):
+        for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            original = {key: getattr(settings, key) for key in SQLITE_PROFILES.get(name, {})}
+            for key, value in SQLITE_PROFILES.get(name, {}).items():
+                setattr(settings, key, value)
+            try:
+                database_url = f"sqlite:///{os.path.join(_TMP_DIR, f'{name}.db')}"
+                results.append(run_profile(name, database_url, args))
+            finally:
+                for key, value in original.items():
+                    setattr(settings, key, value)
+    else:
+        results.append(run_profile("configured", base_url, args))
+
+    print(f"{'perfil':<12}{'commits/s':>12}{'polls/s':>12}{'w p50':>10}{'w p95':>10}{'r p50':>10}{'r p95':>10}{'errores':>10}")
+    for r in results:
+        print(
+            f"{r['profile']:<12}{r['commits_per_s']:>12.1f}{r['polls_per_s']:>12.1f}"
+            f"{r['write_p50_ms']:>10.2f}{r['write_p95_ms']:>10.2f}"
+            f"{r['poll_p50_ms']:>10.2f}{r['poll_p95_ms']:>10.2f}{r['errors']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
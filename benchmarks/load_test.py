@@ -0,0 +1,461 @@
+"""
+Prueba de carga HTTP de un worker
+
+Levanta la aplicación con uvicorn en este proceso y un servidor local que
+imita `files.list` de Google Drive (tamaño del inventario y latencia
+configurables). Varios clientes en paralelo mezclan subidas de checklists,
+inicios de auditoría, consultas de estado y descargas de reportes según un
+perfil de tráfico, y al final se reporta el throughput, la latencia
+p50/p95/p99 por endpoint y el retraso del event loop del servidor.
+
+Uso:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --profile polling --clients 32 --seconds 30
+    python -m benchmarks.load_test --inventory 50000 --drive-latency-ms 150 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_TMP_DIR = tempfile.mkdtemp(prefix="audit_load_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'load.db')}")
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("DRIVE_QUOTA_REQUESTS_PER_SECOND", "1000")
+os.environ.setdefault("DRIVE_QUOTA_BURST", "1000")
+os.environ["GOOGLE_DRIVE_DISCOVERY_FILE"] = os.path.join(_TMP_DIR, "drive_v3_stub.json")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP_DIR, "uploads")
+os.environ["REPORTS_DIR"] = os.path.join(_TMP_DIR, "reports")
+os.environ["STORAGE_COMPACTION_INTERVAL_SECONDS"] = "0"
+os.environ["STARTUP_PRELOAD"] = "False"
+
+# Peso relativo de cada operación en los perfiles de tráfico
+PROFILES = {
+    "mixed": {"upload": 1, "start": 1, "status": 8, "report": 2},
+    "polling": {"upload": 0, "start": 1, "status": 20, "report": 1},
+    "ingest": {"upload": 4, "start": 4, "status": 1, "report": 1},
+    "reports": {"upload": 0, "start": 1, "status": 2, "report": 8},
+}
+
+VOCABULARY = [
+    "politica", "seguridad", "acta", "contrato", "manual", "procedimiento",
+    "registro", "informe", "plan", "auditoria", "capacitacion", "inventario",
+    "riesgos", "respaldo", "incidentes", "accesos", "proveedores", "continuidad",
+]
+
+MIME_TYPES = [
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.google-apps.document",
+]
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_NAME_CONTAINS = re.compile(r"name contains '((?:[^'\\]|\\.)*)'")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# --- Servidor simulado de Google Drive ---
+
+def build_inventory(size: int, seed: int) -> list:
+    rng = random.Random(seed)
+    files = []
+    for n in range(size):
+        words = rng.sample(VOCABULARY, 2)
+        files.append({
+            "id": f"file-{n}",
+            "name": f"{words[0]}_{words[1]}_{n}.pdf",
+            "mimeType": rng.choice(MIME_TYPES),
+            "webViewLink": f"https://drive.example/file-{n}",
+            "size": str(rng.randint(1_000, 5_000_000)),
+            "createdTime": "2024-01-01T00:00:00.000Z",
+            "modifiedTime": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00.000Z",
+            "parents": ["root"],
+        })
+    return files
+
+
+class DriveStubServer(ThreadingHTTPServer):
+    """
+    Implementa GET files (paginado, con los filtros `name contains` del
+    pushdown) y GET files/{id} sobre un inventario sintético
+    """
+    daemon_threads = True
+
+    def __init__(self, address, files: list, latency_s: float):
+        super().__init__(address, _DriveStubHandler)
+        self.files = files
+        self.files_by_id = {f["id"]: f for f in files}
+        self.latency_s = latency_s
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def select(self, query: str) -> list:
+        terms = [term.replace("\\'", "'").lower() for term in _NAME_CONTAINS.findall(query)]
+        if not terms:
+            return self.files
+        return [f for f in self.files if any(term in f["name"].lower() for term in terms)]
+
+
+class _DriveStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.count_request()
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+
+        if path.endswith("/files"):
+            files = self.server.select(params.get("q", ""))
+            offset = int(params.get("pageToken") or 0)
+            page_size = min(int(params.get("pageSize") or 100), 1000)
+            body = {"files": files[offset:offset + page_size]}
+            if offset + page_size < len(files):
+                body["nextPageToken"] = str(offset + page_size)
+            self._send(200, body)
+            return
+
+        file = self.server.files_by_id.get(path.rsplit("/", 1)[-1])
+        if "/files/" in path and file is not None:
+            self._send(200, {**file, "trashed": False})
+        else:
+            self._send(404, {"error": {"code": 404, "message": "File not found"}})
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_stub_discovery(root_url: str):
+    """
+    Copia del documento de descubrimiento de Drive v3 que apunta al servidor simulado
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc("drive", "v3"))
+    document["rootUrl"] = root_url
+    document["baseUrl"] = root_url + document["servicePath"]
+    with open(os.environ["GOOGLE_DRIVE_DISCOVERY_FILE"], "w", encoding="utf-8") as f:
+        json.dump(document, f)
+
+
+# --- Servidor de la aplicación ---
+
+def build_checklists(count: int, items: int, seed: int) -> list:
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    checklists = []
+    for n in range(count):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["ID", "Pregunta", "Palabras_Clave", "Obligatorio"])
+        for i in range(items):
+            keywords = rng.sample(VOCABULARY, rng.randint(1, 2))
+            ws.append([f"{n}.{i}", f"Requisito {i} del checklist {n}", ", ".join(keywords), rng.choice(["Si", "No"])])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        checklists.append((f"checklist_{n}.xlsx", buffer.getvalue()))
+    return checklists
+
+
+async def _monitor_loop_lag(samples: list, interval: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def _serve(server, lag_samples: list, interval: float):
+    monitor = asyncio.create_task(_monitor_loop_lag(lag_samples, interval))
+    try:
+        await server.serve()
+    finally:
+        monitor.cancel()
+
+
+def start_app(port: int, lag_samples: list, lag_interval: float):
+    import uvicorn
+    from google.oauth2.credentials import Credentials
+    import app.main
+    from app.routers import auth
+    from app.services.google_drive_service import GoogleDriveService
+
+    # Credenciales de mentira: el servidor simulado no las valida
+    GoogleDriveService.TOKEN_FILE = os.path.join(_TMP_DIR, "google_token.pickle")
+    auth.get_google_drive_service().credentials = Credentials(token="load-test")
+
+    server = uvicorn.Server(uvicorn.Config(app.main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=asyncio.run, args=(_serve(server, lag_samples, lag_interval),), daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("El servidor de la aplicación no arrancó")
+        time.sleep(0.05)
+
+    return server, thread
+
+
+# --- Clientes ---
+
+class TrafficState:
+    """
+    Auditorías creadas durante la prueba: pendientes de iniciar y completadas
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.completed = []
+        self.all = []
+
+    def add_pending(self, audit_id: int):
+        with self.lock:
+            self.pending.append(audit_id)
+            self.all.append(audit_id)
+
+    def take_pending(self):
+        with self.lock:
+            return self.pending.popleft() if self.pending else None
+
+    def add_completed(self, audit_id: int):
+        with self.lock:
+            self.completed.append(audit_id)
+
+    def pick(self, rng: random.Random, completed: bool):
+        with self.lock:
+            pool = self.completed if completed else self.all
+            return rng.choice(pool) if pool else None
+
+
+class Client:
+    def __init__(self, base_url: str, checklists: list, state: TrafficState, seed: int):
+        import requests
+
+        self.http = requests.Session()
+        self.base_url = base_url
+        self.checklists = checklists
+        self.state = state
+        self.rng = random.Random(seed)
+
+    def upload(self):
+        name, content = self.rng.choice(self.checklists)
+        response = self.http.post(f"{self.base_url}/api/checklist/upload", files={"file": (name, content, XLSX_MIME)})
+        if response.status_code == 200:
+            self.state.add_pending(response.json()["audit_id"])
+        return "upload", response.status_code
+
+    def start(self):
+        audit_id = self.state.take_pending()
+        if audit_id is None:
+            return self.upload()
+        response = self.http.post(f"{self.base_url}/api/audit/start", json={"audit_id": audit_id})
+        if response.status_code == 200:
+            self.state.add_completed(audit_id)
+        return "start", response.status_code
+
+    def status(self):
+        audit_id = self.state.pick(self.rng, completed=False)
+        if audit_id is None:
+            return self.upload()
+        response = self.http.get(f"{self.base_url}/api/audit/{audit_id}/status")
+        return "status", response.status_code
+
+    def report(self):
+        audit_id = self.state.pick(self.rng, completed=True)
+        if audit_id is None:
+            return self.status()
+        response = self.http.get(f"{self.base_url}/api/audit/{audit_id}/report")
+        return "report", response.status_code
+
+
+def _client_loop(client: Client, weights: dict, stop: threading.Event, latencies, errors, lock):
+    operations = [op for op, weight in weights.items() if weight > 0]
+    op_weights = [weights[op] for op in operations]
+
+    while not stop.is_set():
+        operation = client.rng.choices(operations, op_weights)[0]
+        start = time.perf_counter()
+        try:
+            name, status_code = getattr(client, operation)()
+        except Exception:
+            name, status_code = operation, None
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            latencies[name].append(elapsed)
+            if status_code is None or status_code >= 400:
+                errors[name][str(status_code)] += 1
+
+
+def run_load(base_url: str, checklists: list, args, lag_samples: list) -> dict:
+    state = TrafficState()
+
+    # Calentamiento: auditorías completadas para estado/reporte y primer listado de Drive
+    warmup = Client(base_url, checklists, state, args.seed)
+    for _ in range(args.warmup):
+        warmup.upload()
+        warmup.start()
+
+    weights = PROFILES[args.profile]
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(lambda: defaultdict(int))
+
+    clients = [Client(base_url, checklists, state, args.seed + n + 1) for n in range(args.clients)]
+    threads = [
+        threading.Thread(target=_client_loop, args=(client, weights, stop, latencies, errors, lock), daemon=True)
+        for client in clients
+    ]
+
+    lag_samples.clear()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    lag = list(lag_samples)
+
+    endpoints = {}
+    for name in sorted(latencies):
+        values = latencies[name]
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": dict(errors[name]),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p95_ms": _percentile(values, 95) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+        }
+
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "profile": args.profile,
+        "clients": args.clients,
+        "seconds": elapsed,
+        "inventory": args.inventory,
+        "drive_latency_ms": args.drive_latency_ms,
+        "throughput_rps": total / elapsed,
+        "endpoints": endpoints,
+        "event_loop_lag": {
+            "samples": len(lag),
+            "p50_ms": _percentile(lag, 50) * 1000,
+            "p99_ms": _percentile(lag, 99) * 1000,
+            "max_ms": max(lag) * 1000 if lag else 0.0,
+            "mean_ms": statistics.mean(lag) * 1000 if lag else 0.0,
+        },
+        "audits_created": len(state.all),
+        "audits_completed": len(state.completed),
+    }
+
+
+def _print_results(results: dict, drive_requests: int):
+    print(f"Perfil {results['profile']}: {results['clients']} clientes durante {results['seconds']:.1f} s, "
+          f"inventario de {results['inventory']} archivos ({results['drive_latency_ms']} ms por página)")
+    print(f"{'endpoint':<10}{'peticiones':>12}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}  errores")
+    for name, r in results["endpoints"].items():
+        errors = ", ".join(f"{code}: {count}" for code, count in sorted(r["errors"].items())) or "-"
+        print(
+            f"{name:<10}{r['requests']:>12}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}  {errors}"
+        )
+    lag = results["event_loop_lag"]
+    print(f"{'total':<10}{'':>12}{results['throughput_rps']:>10.1f}")
+    print(f"Retraso del event loop: p50 {lag['p50_ms']:.1f} ms   p99 {lag['p99_ms']:.1f} ms   max {lag['max_ms']:.1f} ms")
+    print(f"Auditorías creadas {results['audits_created']}, completadas {results['audits_completed']}, "
+          f"peticiones a Drive {drive_requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP de un worker")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed", help="Mezcla de tráfico")
+    parser.add_argument("--clients", type=int, default=16, help="Clientes concurrentes")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Duración de la medición")
+    parser.add_argument("--inventory", type=int, default=5000, help="Archivos en el Drive simulado")
+    parser.add_argument("--drive-latency-ms", type=float, default=50.0, help="Latencia por petición a Drive")
+    parser.add_argument("--items", type=int, default=50, help="Requisitos por checklist")
+    parser.add_argument("--checklists", type=int, default=4, help="Checklists distintos que se suben")
+    parser.add_argument("--warmup", type=int, default=2, help="Auditorías completadas antes de medir")
+    parser.add_argument("--lag-interval-ms", type=float, default=10.0, help="Periodo del monitor del event loop")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida del servidor")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados en JSON")
+    args = parser.parse_args()
+
+    drive = DriveStubServer(
+        ("127.0.0.1", 0),
+        build_inventory(args.inventory, args.seed),
+        args.drive_latency_ms / 1000
+    )
+    threading.Thread(target=drive.serve_forever, daemon=True).start()
+    write_stub_discovery(f"http://127.0.0.1:{drive.server_address[1]}/")
+
+    checklists = build_checklists(args.checklists, args.items, args.seed)
+    lag_samples = []
+    port = _free_port()
+
+    devnull = open(os.devnull, "w")
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+    with output, devnull:
+        server, thread = start_app(port, lag_samples, args.lag_interval_ms / 1000)
+        try:
+            results = run_load(f"http://127.0.0.1:{port}", checklists, args, lag_samples)
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+            drive.shutdown()
+
+    if args.json:
+        print(json.dumps({**results, "drive_requests": drive.requests}, indent=2))
+    else:
+        _print_results(results, drive.requests)
+
+
+if __name__ == "__main__":
+    main()
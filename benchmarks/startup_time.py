@@ -0,0 +1,89 @@
+"""
+Benchmark del arranque en frío del servidor
+
+Lanza procesos nuevos que importan app.main, ejecutan el lifespan y
+atienden la primera petición, y mide cada fase. Sirve para detectar
+regresiones en local (por ejemplo, un import pesado añadido a un router).
+
+Uso:
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --runs 10 --max-import-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ["pandas", "openpyxl", "googleapiclient.discovery", "msal"]
+
+_PROBE = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        t2 = time.perf_counter()
+        await app.main.health_check()
+        t3 = time.perf_counter()
+    return t2, t3
+
+t2, t3 = asyncio.run(startup())
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "lifespan_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "heavy_loaded": [m for m in %(heavy)r if m in sys.modules],
+}))
+"""
+
+
+def _run_once(env) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE % {"heavy": HEAVY_MODULES}],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=0, help="Falla si la mediana de import supera este valor")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="audit_startup_")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}")
+    env.setdefault("DEBUG", "False")
+    env["STARTUP_PRELOAD"] = "False"
+    env["STORAGE_COMPACTION_INTERVAL_SECONDS"] = "0"
+    env["UPLOAD_DIR"] = os.path.join(tmp_dir, "uploads")
+    env["REPORTS_DIR"] = os.path.join(tmp_dir, "reports")
+
+    runs = [_run_once(env) for _ in range(args.runs)]
+
+    for phase in ("import_ms", "lifespan_ms", "first_request_ms"):
+        values = [run[phase] for run in runs]
+        print(f"{phase:<20} mediana {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+    heavy = sorted({m for run in runs for m in run["heavy_loaded"]})
+    print(f"{'módulos pesados':<20} {', '.join(heavy) if heavy else 'ninguno cargado al arrancar'}")
+
+    median_import = statistics.median(run["import_ms"] for run in runs)
+    if args.max_import_ms and median_import > args.max_import_ms:
+        print(f"REGRESIÓN: import de app.main {median_import:.1f} ms > {args.max_import_ms:.1f} ms")
+        sys.exit(1)
+    if heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
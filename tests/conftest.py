@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Settings exige DATABASE_URL; los tests no tocan la base de datos del entorno
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,98 @@
+from app.services.drive_query import (
+    BASE_QUERY,
+    build_batched_queries,
+    plan_search,
+    pushdown_term,
+    pushdown_terms,
+    separator_probe
+)
+from app.services.inventory import normalize_keywords
+from app.services.keyword_expression import compile_keywords
+
+
+def test_pushdown_term_prefers_longest_word():
+    assert pushdown_term(normalize_keywords(["acta", "politica de seguridad"])) == "seguridad"
+
+
+def test_pushdown_term_word_start_skips_first_word_of_each_keyword():
+    key = normalize_keywords(["contrato", "plan de continuidad"])
+    assert pushdown_term(key, word_start=True) == "continuidad"
+    assert pushdown_term(normalize_keywords(["acta"]), word_start=True) is None
+
+
+def test_pushdown_terms_exact_rejects_mid_word_terms():
+    key = normalize_keywords(["acta"])
+    assert pushdown_terms(key) == {"acta"}
+    assert pushdown_terms(key, exact=True) is None
+
+
+def test_pushdown_terms_uses_expression_cover():
+    key = compile_keywords('"plan de backup" OR informe*')
+    assert pushdown_terms(key, exact=True) == {"backup", "informe"}
+    assert pushdown_terms(compile_keywords("NOT borrador")) is None
+
+
+def test_build_batched_queries_respects_max_length():
+    terms = [f"termino{i:03d}" for i in range(50)]
+    queries = build_batched_queries(terms, max_length=300)
+
+    assert len(queries) > 1
+    assert all(len(query) <= 300 for query in queries)
+    assert all(query.startswith(BASE_QUERY) for query in queries)
+    found = {term for term in terms if any(f"name contains '{term}'" in query for query in queries)}
+    assert found == set(terms)
+
+
+def test_build_batched_queries_escapes_quotes():
+    query, = build_batched_queries(["o'brien"], max_length=2000)
+    assert "name contains 'o\\'brien'" in query
+
+
+def test_plan_search_snapshot_mode_never_pushes_down():
+    plan = plan_search([normalize_keywords(["plan de backup"])], "snapshot", 100000, 2000)
+    assert plan.mode == "snapshot"
+    assert plan.queries == []
+
+
+def test_plan_search_auto_needs_verified_separators():
+    keys = [normalize_keywords(["informe final"])]
+
+    unverified = plan_search(keys, "auto", 100000, 2000)
+    verified = plan_search(keys, "auto", 100000, 2000, separators_split=True)
+
+    assert unverified.mode == "snapshot"
+    assert verified.mode == "pushdown"
+    assert verified.queries == [f"{BASE_QUERY} and (name contains 'final')"]
+
+
+def test_plan_search_auto_lists_everything_for_mid_word_terms():
+    plan = plan_search([normalize_keywords(["acta"])], "auto", 100000, 2000, separators_split=True)
+    assert plan.mode == "snapshot"
+
+
+def test_plan_search_auto_picks_cheaper_strategy():
+    keys = [normalize_keywords([f"plan {i:03d}"]) for i in range(200)]
+    plan = plan_search(keys, "auto", 1000, 300, separators_split=True)
+
+    assert plan.snapshot_requests == 1
+    assert plan.pushdown_requests > 1
+    assert plan.mode == "snapshot"
+
+
+def test_plan_search_forced_pushdown_accepts_any_term():
+    plan = plan_search([normalize_keywords(["acta"])], "pushdown", 10, 2000)
+    assert plan.mode == "pushdown"
+    assert plan.queries == [f"{BASE_QUERY} and (name contains 'acta')"]
+
+
+def test_plan_search_without_cover_lists_everything():
+    plan = plan_search([compile_keywords("NOT borrador")], "pushdown", 100000, 2000)
+    assert plan.mode == "snapshot"
+
+
+def test_separator_probe():
+    assert separator_probe("Informe_Final.xlsx", "_") == "final"
+    assert separator_probe("acta-2024.pdf", "-") == "2024"
+    # La palabra aparece dos veces: Drive podría encontrarla por la otra
+    assert separator_probe("final_final.pdf", "_") is None
+    assert separator_probe("_borrador.pdf", "_") is None
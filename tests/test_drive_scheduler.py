@@ -0,0 +1,192 @@
+import json
+import time
+import pytest
+from app.services.drive_scheduler import DriveQuotaExceededError, DriveRequestScheduler, classify_error
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    """
+    Misma forma que googleapiclient.errors.HttpError: resp.status y content JSON
+    """
+
+    def __init__(self, status, reason=None):
+        super().__init__(f"HTTP {status}")
+        self.resp = FakeResponse(status)
+        errors = [{"reason": reason}] if reason else []
+        self.content = json.dumps({"error": {"errors": errors}}).encode("utf-8")
+
+
+class FakeRequest:
+    """
+    Petición que lanza los errores indicados en orden y después responde
+    """
+
+    def __init__(self, *errors, response=None):
+        self.errors = list(errors)
+        self.response = response if response is not None else {"ok": True}
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.response
+
+
+def scheduler(**options):
+    defaults = {"rate_per_second": 1000, "burst": 10, "max_retries": 3, "backoff_base": 0.001, "backoff_max": 0.002}
+    defaults.update(options)
+    return DriveRequestScheduler(**defaults)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (FakeHttpError(403, "userRateLimitExceeded"), (True, True, "userRateLimitExceeded")),
+    (FakeHttpError(429), (True, True, "429")),
+    (FakeHttpError(503), (False, True, "503")),
+    (FakeHttpError(403, "insufficientFilePermissions"), (False, False, "insufficientFilePermissions")),
+    (FakeHttpError(404, "notFound"), (False, False, "notFound")),
+    (ConnectionResetError("reset"), (False, True, None)),
+    (TimeoutError("timeout"), (False, True, None)),
+    (ValueError("bug"), (False, False, None)),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 5), (-1, 5), (1, 0)])
+def test_rejects_rate_or_burst_that_never_refills(rate, burst):
+    with pytest.raises(ValueError):
+        DriveRequestScheduler(rate_per_second=rate, burst=burst)
+
+
+def test_burst_passes_without_waiting():
+    s = scheduler(rate_per_second=1, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        s.execute(FakeRequest())
+    assert time.monotonic() - started < 0.5
+
+
+def test_waits_for_tokens_after_burst():
+    s = scheduler(rate_per_second=20, burst=1)
+    s.execute(FakeRequest())
+    started = time.monotonic()
+    s.execute(FakeRequest())
+    # Un token cada 50 ms
+    assert time.monotonic() - started >= 0.04
+
+
+def test_batch_cost_larger_than_burst_leaves_debt():
+    s = scheduler(rate_per_second=50, burst=5)
+    s.execute(FakeRequest(), cost=10)
+    started = time.monotonic()
+    s.execute(FakeRequest())
+    # Se deben 5 tokens más el de esta petición: 6 / 50 por segundo
+    assert time.monotonic() - started >= 0.1
+
+
+def test_retries_transient_errors():
+    s = scheduler()
+    request = FakeRequest(FakeHttpError(503), ConnectionResetError("reset"), response={"id": "1"})
+
+    assert s.execute(request) == {"id": "1"}
+    assert request.calls == 3
+    assert s.metrics()["retries"] == 2
+
+
+def test_does_not_retry_permanent_errors():
+    s = scheduler()
+    request = FakeRequest(FakeHttpError(404, "notFound"))
+
+    with pytest.raises(FakeHttpError):
+        s.execute(request)
+    assert request.calls == 1
+
+
+def test_does_not_retry_non_idempotent_requests():
+    s = scheduler()
+    request = FakeRequest(FakeHttpError(503))
+
+    with pytest.raises(FakeHttpError):
+        s.execute(request, idempotent=False)
+    assert request.calls == 1
+
+
+def test_rate_limit_after_all_retries_raises_quota_error():
+    s = scheduler(max_retries=2)
+    request = FakeRequest(*[FakeHttpError(403, "rateLimitExceeded")] * 3)
+
+    with pytest.raises(DriveQuotaExceededError) as raised:
+        s.execute(request)
+    assert request.calls == 3
+    assert raised.value.retry_after > 0
+    assert s.metrics()["quota_exhausted"] == 1
+
+
+class FakeBatch:
+    """
+    Batch de Drive: responde cada llamada por el callback según `outcomes`
+    """
+
+    def __init__(self, outcomes, callback):
+        self.outcomes = outcomes
+        self.callback = callback
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        for request_id in self.request_ids:
+            queue = self.outcomes[request_id]
+            outcome = queue.pop(0) if len(queue) > 1 else queue[0]
+            if isinstance(outcome, Exception):
+                self.callback(request_id, None, outcome)
+            else:
+                self.callback(request_id, outcome, None)
+
+
+def test_execute_batch_retries_only_the_failed_calls():
+    s = scheduler()
+    outcomes = {
+        "a": [{"id": "a"}],
+        "b": [FakeHttpError(403, "userRateLimitExceeded"), {"id": "b"}],
+        "c": [FakeHttpError(404, "notFound")],
+    }
+    batches = []
+    responses = {}
+
+    def new_batch(callback):
+        batch = FakeBatch(outcomes, callback)
+        batches.append(batch)
+        return batch
+
+    def callback(request_id, response, exception):
+        responses[request_id] = exception if exception is not None else response
+
+    s.execute_batch(new_batch, lambda request_id: None, ["a", "b", "c"], callback, max_size=2)
+
+    assert [batch.request_ids for batch in batches] == [["a", "b"], ["c"], ["b"]]
+    assert responses["a"] == {"id": "a"} and responses["b"] == {"id": "b"}
+    assert isinstance(responses["c"], FakeHttpError)
+
+
+def test_execute_batch_raises_when_a_call_stays_rate_limited():
+    s = scheduler(max_retries=1)
+    outcomes = {"a": [{"id": "a"}], "b": [FakeHttpError(429)]}
+    responses = {}
+
+    with pytest.raises(DriveQuotaExceededError):
+        s.execute_batch(
+            lambda callback: FakeBatch(outcomes, callback),
+            lambda request_id: None,
+            ["a", "b"],
+            lambda request_id, response, exception: responses.setdefault(request_id, response)
+        )
+    # Las llamadas que salieron bien se entregan antes del error
+    assert responses == {"a": {"id": "a"}}
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+import pytest
+from app.services.evidence_filters import ItemConstraints, parse_type_patterns, resolve_date_bound
+from app.services.inventory import InventorySnapshot
+
+NOW = datetime(2024, 3, 31, 12, 0, tzinfo=timezone.utc)
+
+
+def epoch(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_empty_bound_is_no_constraint():
+    assert resolve_date_bound(None, NOW) is None
+    assert resolve_date_bound("", NOW) is None
+
+
+def test_iso_date_lower_bound_starts_the_day():
+    assert resolve_date_bound("2024-01-15", NOW) == epoch(2024, 1, 15)
+
+
+def test_iso_date_upper_bound_includes_the_whole_day():
+    upper = resolve_date_bound("2024-01-15", NOW, upper=True)
+    assert epoch(2024, 1, 15, 23, 59, 59) < upper < epoch(2024, 1, 16)
+
+
+def test_iso_datetime_upper_bound_is_exact():
+    assert resolve_date_bound("2024-01-15T10:00:00Z", NOW, upper=True) == epoch(2024, 1, 15, 10)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("30d", epoch(2024, 3, 1, 12)),
+    ("1m", epoch(2024, 2, 29, 12)),
+    ("12m", epoch(2023, 3, 31, 12)),
+    ("1a", epoch(2023, 3, 31, 12)),
+    (" 2Y ", epoch(2022, 3, 31, 12)),
+])
+def test_relative_bounds(spec, expected):
+    assert resolve_date_bound(spec, NOW) == expected
+
+
+@pytest.mark.parametrize("spec", ["2024", "45292", "45292.5", "-1", "0"])
+def test_bare_numbers_are_rejected(spec):
+    with pytest.raises(ValueError):
+        resolve_date_bound(spec, NOW)
+
+
+@pytest.mark.parametrize("spec", ["ayer", "2024-13-01", "12 meses"])
+def test_unreadable_bounds_are_rejected(spec):
+    with pytest.raises(ValueError):
+        resolve_date_bound(spec, NOW)
+
+
+def test_parse_type_patterns():
+    assert parse_type_patterns("pdf, .XLSX, image/*, application/pdf") == (
+        ".pdf", ".xlsx", "application/pdf", "image/*"
+    )
+    assert parse_type_patterns(None) == ()
+
+
+class Item:
+    def __init__(self, **values):
+        self.modified_after = values.get("modified_after")
+        self.modified_before = values.get("modified_before")
+        self.created_after = values.get("created_after")
+        self.created_before = values.get("created_before")
+        self.mime_types = values.get("mime_types")
+
+
+def test_item_without_constraints_has_none():
+    assert ItemConstraints.from_item(Item(), NOW) is None
+
+
+def test_narrow_applies_dates_and_types():
+    snapshot = InventorySnapshot.from_drive_files([
+        {"id": "old", "name": "acta.pdf", "mimeType": "application/pdf", "modifiedTime": "2023-01-10T00:00:00Z"},
+        {"id": "new", "name": "acta.pdf", "mimeType": "application/pdf", "modifiedTime": "2024-03-10T00:00:00Z"},
+        {"id": "xlsx", "name": "acta.xlsx", "mimeType": "application/vnd.ms-excel", "modifiedTime": "2024-03-10T00:00:00Z"},
+        {"id": "undated", "name": "acta.pdf", "mimeType": "application/pdf"},
+    ])
+    constraints = ItemConstraints.from_item(Item(modified_after="12m", mime_types="pdf"), NOW)
+
+    assert [snapshot.ids[pos] for pos in constraints.narrow(snapshot)] == ["new"]
+
+
+def test_epoch_zero_bound_is_kept():
+    constraints = ItemConstraints.from_item(Item(created_after="1970-01-01"), NOW)
+    assert constraints is not None
+    assert constraints.created_after == 0.0
@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models.audit import Audit, ChecklistItem
+from app.services.audit_engine import AuditEngine
+from app.services.event_bus import AuditEventBus
+from app.services.folder_index import FOLDER_MIME_TYPE, FolderIndex, FolderIndexCache, UnknownFolderError, parse_folder_ids
+from app.services.inventory import InventorySnapshot
+from app.services.keyword_cache import KeywordResultCache
+
+
+def drive_file(file_id, name, parents, mime="application/pdf"):
+    return {"id": file_id, "name": name, "mimeType": mime, "parents": parents}
+
+
+@pytest.fixture
+def snapshot():
+    # root (Mi unidad, fuera del inventario) > contratos > 2024; otros es hermana de contratos
+    return InventorySnapshot.from_drive_files([
+        drive_file("contratos", "Contratos", ["root"], FOLDER_MIME_TYPE),
+        drive_file("2024", "2024", ["contratos"], FOLDER_MIME_TYPE),
+        drive_file("otros", "Otros", ["root"], FOLDER_MIME_TYPE),
+        drive_file("a", "acta contratos.pdf", ["contratos"]),
+        drive_file("b", "acta 2024.pdf", ["2024"]),
+        drive_file("c", "acta raiz.pdf", ["root"]),
+        drive_file("d", "acta otros.pdf", ["otros"]),
+        drive_file("e", "acta compartida.pdf", ["otros", "2024"]),
+    ])
+
+
+def positions_to_ids(snapshot, positions):
+    return sorted(snapshot.ids[pos] for pos in positions)
+
+
+def test_parse_folder_ids_is_canonical():
+    assert parse_folder_ids(" b, a ,,b ") == ("a", "b")
+    assert parse_folder_ids("") == ()
+    assert parse_folder_ids(None) == ()
+
+
+def test_subtree_positions_include_nested_folders(snapshot):
+    index = FolderIndex(snapshot)
+    ids = positions_to_ids(snapshot, index.subtree_positions(("contratos",)))
+    assert ids == ["2024", "a", "b", "e"]
+
+
+def test_subtree_positions_union_of_scopes(snapshot):
+    index = FolderIndex(snapshot)
+    ids = positions_to_ids(snapshot, index.subtree_positions(("2024", "otros")))
+    assert ids == ["b", "d", "e"]
+
+
+def test_parent_outside_inventory_is_a_valid_root(snapshot):
+    index = FolderIndex(snapshot)
+    assert "root" in index
+    assert len(index.subtree_positions(("root",))) == len(snapshot)
+
+
+def test_unknown_folder_matches_nothing(snapshot):
+    index = FolderIndex(snapshot)
+    assert "no-existe" not in index
+    assert index.subtree_positions(("no-existe",)) == []
+
+
+def test_contains_and_is_within(snapshot):
+    index = FolderIndex(snapshot)
+    assert index.is_within("2024", "contratos")
+    assert not index.is_within("contratos", "2024")
+    assert index.contains(snapshot.ids.index("e"), ("contratos",))
+    assert not index.contains(snapshot.ids.index("d"), ("contratos",))
+    assert index.ancestors("2024") == ["2024", "contratos", "root"]
+
+
+def test_cycles_do_not_hang():
+    snap = InventorySnapshot.from_drive_files([
+        drive_file("x", "X", ["y"], FOLDER_MIME_TYPE),
+        drive_file("y", "Y", ["x"], FOLDER_MIME_TYPE),
+        drive_file("f", "acta.pdf", ["x"]),
+    ])
+    index = FolderIndex(snap)
+    assert "x" in index and "y" in index
+    # Las carpetas del ciclo quedan una dentro de la otra
+    assert positions_to_ids(snap, index.subtree_positions(("x",))) == ["f", "x", "y"]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def make_audit(db, folder_ids=None, item_folder_ids=None):
+    audit = Audit(filename="checklist.xlsx", status="processing", folder_ids=folder_ids)
+    db.add(audit)
+    db.flush()
+    db.add(ChecklistItem(
+        audit_id=audit.id, item_id="1", description="Actas", keywords="acta", folder_ids=item_folder_ids
+    ))
+    db.commit()
+    return audit
+
+
+def engine_for(db):
+    return AuditEngine(db, {}, AuditEventBus(), KeywordResultCache(max_bytes=1 << 20), FolderIndexCache())
+
+
+def test_scoped_audit_only_matches_inside_the_scope(db, snapshot):
+    audit = make_audit(db, folder_ids="contratos")
+    summary = engine_for(db).run(audit, [snapshot])
+
+    assert summary["compliant_items"] == 1
+    assert audit.status == "completed"
+
+
+@pytest.mark.parametrize("folder_ids, item_folder_ids", [("no-existe", None), (None, "contratos,no-existe")])
+def test_unknown_folder_fails_the_audit(db, snapshot, folder_ids, item_folder_ids):
+    audit = make_audit(db, folder_ids=folder_ids, item_folder_ids=item_folder_ids)
+
+    with pytest.raises(UnknownFolderError) as raised:
+        engine_for(db).run(audit, [snapshot])
+    assert raised.value.folder_ids == ["no-existe"]
+    assert audit.status == "error"
@@ -0,0 +1,93 @@
+from app.services.inventory import InventorySnapshot, normalize_keywords
+from app.services.keyword_cache import KeywordResultCache
+
+
+def snapshot(*names, partial=False, account=None):
+    return InventorySnapshot.from_drive_files(
+        [{"id": str(i), "name": name, "mimeType": "application/pdf"} for i, name in enumerate(names)],
+        partial=partial,
+        account=account
+    )
+
+
+def entry_size(cache, snap, key, positions):
+    return cache._entry_size((snap.version, key), tuple(positions))
+
+
+def test_put_then_get_counts_hits_and_misses():
+    cache = KeywordResultCache(max_bytes=1 << 20)
+    snap = snapshot("acta.pdf")
+    key = normalize_keywords(["acta"])
+
+    assert cache.get(snap, key) is None
+    cache.put(snap, key, [0])
+    assert cache.get(snap, key) == (0,)
+    assert cache.metrics()["hits"] == 1
+    assert cache.metrics()["misses"] == 1
+
+
+def test_peek_does_not_count():
+    cache = KeywordResultCache(max_bytes=1 << 20)
+    snap = snapshot("acta.pdf")
+    key = normalize_keywords(["acta"])
+
+    assert cache.peek(snap, key) is None
+    cache.put(snap, key, [0])
+    assert cache.peek(snap, key) == (0,)
+    assert cache.metrics()["hits"] == 0
+    assert cache.metrics()["misses"] == 0
+
+
+def test_evicts_least_recently_used_over_budget():
+    snap = snapshot("a.pdf", "b.pdf", "c.pdf")
+    keys = [normalize_keywords([word]) for word in ("a", "b", "c")]
+    size = entry_size(KeywordResultCache(max_bytes=0), snap, keys[0], [0])
+    cache = KeywordResultCache(max_bytes=2 * size)
+
+    cache.put(snap, keys[0], [0])
+    cache.put(snap, keys[1], [1])
+    cache.get(snap, keys[0])
+    cache.put(snap, keys[2], [2])
+
+    assert cache.peek(snap, keys[1]) is None
+    assert cache.peek(snap, keys[0]) == (0,)
+    assert cache.peek(snap, keys[2]) == (2,)
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["bytes"] <= cache.max_bytes
+
+
+def test_entry_larger_than_budget_is_not_stored():
+    cache = KeywordResultCache(max_bytes=10)
+    snap = snapshot("acta.pdf")
+    key = normalize_keywords(["acta"])
+
+    assert cache.put(snap, key, [0]) == (0,)
+    assert cache.metrics()["entries"] == 0
+
+
+def test_new_snapshot_version_invalidates_previous_entries():
+    cache = KeywordResultCache(max_bytes=1 << 20)
+    old = snapshot("acta.pdf", account="ana")
+    new = snapshot("acta.pdf", "acta 2.pdf", account="ana")
+    other_account = snapshot("acta luis.pdf", account="luis")
+    key = normalize_keywords(["acta"])
+
+    for snap in (old, other_account):
+        cache.observe(snap)
+    cache.put(old, key, [0])
+    cache.put(other_account, key, [0])
+    cache.observe(new)
+
+    assert cache.peek(old, key) is None
+    assert cache.peek(other_account, key) == (0,)
+    assert cache.metrics()["invalidations"] == 1
+
+
+def test_partial_snapshots_are_not_cached():
+    cache = KeywordResultCache(max_bytes=1 << 20)
+    snap = snapshot("acta.pdf", partial=True)
+    key = normalize_keywords(["acta"])
+
+    cache.put(snap, key, [0])
+    assert cache.get(snap, key) is None
+    assert cache.metrics()["entries"] == 0
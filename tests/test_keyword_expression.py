@@ -0,0 +1,110 @@
+import pytest
+from app.services.inventory import InventorySnapshot
+from app.services.keyword_expression import (
+    AND, NOT, OR, PREFIX, TERM,
+    compile_keywords, cover_terms, dump_key, expression_terms, item_key, match_key, matched_terms
+)
+
+NAMES = [
+    "Acta firmada.pdf",
+    "Acta borrador.pdf",
+    "Informe anual.pdf",
+    "Reinforme.pdf",
+    "Plan de continuidad.pdf",
+    "Acta aprobación.pdf",
+]
+
+
+def snapshot():
+    return InventorySnapshot.from_drive_files(
+        [{"id": str(i), "name": name, "mimeType": "application/pdf"} for i, name in enumerate(NAMES)]
+    )
+
+
+def test_comma_list_stays_a_sorted_keyword_key():
+    assert compile_keywords("Firma, Acta") == ("acta", "firma")
+
+
+def test_operators_build_canonical_trees():
+    assert compile_keywords("acta AND (firma OR aprobación)") == (
+        AND, (OR, (TERM, "aprobación"), (TERM, "firma")), (TERM, "acta")
+    )
+    assert compile_keywords("política NOT borrador") == (AND, (NOT, (TERM, "borrador")), (TERM, "política"))
+    # El orden de los operandos no cambia la clave
+    assert compile_keywords("(firma OR aprobación) AND acta") == compile_keywords("acta AND (aprobación OR firma)")
+
+
+def test_quoted_phrase_keeps_commas_and_operators():
+    assert compile_keywords('"plan, de continuidad"') == ("plan, de continuidad",)
+    assert compile_keywords('"acta AND firma" OR informe') == (OR, (TERM, "acta and firma"), (TERM, "informe"))
+
+
+def test_prefix_and_implicit_and():
+    assert compile_keywords("infor*") == (PREFIX, "infor")
+    assert compile_keywords('"plan de"*') == (PREFIX, "plan de")
+    # Palabras seguidas forman un solo término; con un operador la clave vuelve a ser una lista
+    assert compile_keywords("plan de backup AND acta") == ("acta", "plan de backup")
+
+
+@pytest.mark.parametrize("raw", [
+    "acta AND", "(acta OR firma", "acta)", '"sin cerrar', "in*forme", "NOT", "()",
+])
+def test_invalid_expressions_raise_value_error(raw):
+    with pytest.raises(ValueError):
+        compile_keywords(raw)
+
+
+def test_match_key_evaluates_expressions():
+    snap = snapshot()
+
+    assert match_key(snap, compile_keywords("acta AND (firma OR aprobación)")) == [0, 5]
+    assert match_key(snap, compile_keywords("acta NOT borrador")) == [0, 5]
+    assert match_key(snap, compile_keywords("informe OR continuidad")) == [2, 3, 4]
+    # El prefijo exige inicio de palabra: "reinforme" no empieza con "infor"
+    assert match_key(snap, compile_keywords("infor*")) == [2]
+    assert match_key(snap, compile_keywords("acta, borrador")) == [1]
+
+
+def test_match_key_respects_candidates():
+    snap = snapshot()
+    key = compile_keywords("acta NOT borrador")
+
+    assert match_key(snap, key, candidates=[1, 5]) == [5]
+    assert match_key(snap, compile_keywords("NOT acta"), candidates=[0, 2, 4]) == [2, 4]
+
+
+def test_cover_terms():
+    assert cover_terms(compile_keywords("acta AND (firma OR aprobación)")) == {"firma", "aprobación"}
+    assert cover_terms(compile_keywords("informe OR continuidad")) == {"informe", "continuidad"}
+    assert cover_terms(compile_keywords("NOT borrador")) is None
+    assert cover_terms(compile_keywords("acta OR NOT borrador")) is None
+
+
+def test_cover_terms_word_start():
+    # La primera palabra de un término puede estar a mitad de palabra; la de un prefijo no
+    assert cover_terms(compile_keywords("informe OR continuidad"), word_start=True) is None
+    assert cover_terms(compile_keywords("informe OR infor*"), word_start=True) is None
+    assert cover_terms(compile_keywords('"plan de continuidad" OR infor*'), word_start=True) == {"continuidad", "infor"}
+
+
+def test_expression_terms_lists_affirmative_terms():
+    key = compile_keywords("acta AND (firma OR infor*) NOT borrador")
+    assert sorted(expression_terms(key)) == ["acta", "firma", "infor*"]
+    assert expression_terms(("acta", "firma")) == ["acta", "firma"]
+
+
+def test_matched_terms_only_reports_satisfied_branches():
+    key = compile_keywords("acta AND (firma OR aprobación) NOT borrador")
+
+    assert sorted(matched_terms(key, "acta firmada.pdf")) == ["acta", "firma"]
+    assert sorted(matched_terms(key, "acta aprobación.pdf")) == ["acta", "aprobación"]
+    assert matched_terms(("acta", "firma"), "acta firmada.pdf") == ["acta", "firma"]
+
+
+def test_item_key_prefers_compiled_and_falls_back_to_comma_list():
+    compiled = dump_key(compile_keywords("acta OR informe"))
+
+    assert item_key("acta OR informe", compiled) == (OR, (TERM, "acta"), (TERM, "informe"))
+    # Requisitos anteriores a las expresiones: el texto se lee como la lista por comas original
+    assert item_key("acta (firmada), informe") == ("acta (firmada)", "informe")
+    assert item_key("acta, informe", "no es json") == ("acta", "informe")
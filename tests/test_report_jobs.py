@@ -0,0 +1,100 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import app.services.report_jobs as report_jobs_module
+from app.services.report_jobs import ReportJobs
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    written = []
+
+    def fake_write_report(data):
+        path = tmp_path / f"reporte_{data['audit_id']}.xlsx"
+        path.write_bytes(b"xlsx")
+        written.append(data["audit_id"])
+        return str(path)
+
+    monkeypatch.setattr(report_jobs_module, "write_report", fake_write_report)
+    jobs = ReportJobs(max_workers=1)
+    jobs._executor = ThreadPoolExecutor(max_workers=1)
+    jobs.written = written
+    yield jobs
+    jobs.shutdown()
+
+
+def test_start_is_single_flight(jobs):
+    job, created = jobs.start(1)
+    again, created_again = jobs.start(1)
+    other, created_other = jobs.start(2)
+
+    assert created and not created_again
+    assert again is job
+    assert created_other and other is not job
+
+
+def test_build_then_finish_returns_path(jobs):
+    job, _ = jobs.start(1)
+    jobs.build(job, {"audit_id": 1})
+
+    assert asyncio.run(jobs.wait(job, timeout=5))
+    path = jobs.finish(1, job)
+    assert path.endswith("reporte_1.xlsx")
+    assert jobs.written == [1]
+
+    # Retirada la construcción, el siguiente request crea otra
+    _, created = jobs.start(1)
+    assert created
+
+
+def test_finished_job_is_shared_until_finish(jobs):
+    job, _ = jobs.start(1)
+    jobs.build(job, {"audit_id": 1})
+    job.result(timeout=5)
+
+    again, created = jobs.start(1)
+    assert again is job and not created
+
+
+def test_rebuilds_when_report_file_is_missing(jobs, tmp_path):
+    job, _ = jobs.start(1)
+    jobs.build(job, {"audit_id": 1})
+    job.result(timeout=5)
+    # storage_manager lo eliminó como huérfano antes de que alguien llamara a finish
+    (tmp_path / "reporte_1.xlsx").unlink()
+
+    again, created = jobs.start(1)
+    assert created and again is not job
+
+
+def test_fail_propagates_error_and_frees_the_slot(jobs):
+    job, _ = jobs.start(1)
+    jobs.fail(1, job, LookupError("sin datos"))
+
+    with pytest.raises(LookupError):
+        job.result()
+    _, created = jobs.start(1)
+    assert created
+
+
+def test_fail_with_cancellation_reaches_waiters_as_error(jobs):
+    job, _ = jobs.start(1)
+    jobs.fail(1, job, asyncio.CancelledError())
+
+    assert not job.cancelled()
+    with pytest.raises(RuntimeError):
+        job.result()
+    _, created = jobs.start(1)
+    assert created
+
+
+def test_discard_drops_pending_build(jobs):
+    job, _ = jobs.start(1)
+    jobs.discard(1)
+    jobs.build(job, {"audit_id": 1})
+
+    assert job.cancelled()
+    assert jobs.written == []
+    assert jobs.finish(1, job) is None
+    _, created = jobs.start(1)
+    assert created
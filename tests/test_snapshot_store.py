@@ -0,0 +1,109 @@
+import os
+import time
+import pytest
+from app.services.inventory import InventorySnapshot
+from app.services.snapshot_store import SnapshotStore, load_snapshot, write_snapshot
+
+FILES = [
+    {
+        "id": "a1", "name": "Acta Comité.pdf", "mimeType": "application/pdf",
+        "webViewLink": "https://drive/a1", "size": "1024",
+        "createdTime": "2024-01-02T03:04:05.678Z", "modifiedTime": "2024-02-03T04:05:06.000Z",
+        "parents": ["f1", "f2"]
+    },
+    {
+        "id": "b2", "name": "Informe anual.docx", "mimeType": "application/vnd.openxmlformats",
+        "size": "0", "parents": []
+    },
+    {"id": "c3", "name": "Plantilla", "mimeType": "application/vnd.google-apps.document", "parents": ["f1"]},
+]
+
+
+def snapshot(files=FILES, account=None):
+    return InventorySnapshot.from_drive_files(files, account=account)
+
+
+def test_round_trip_preserves_columns(tmp_path):
+    original = snapshot()
+    path = str(tmp_path / "inventario.snap")
+    write_snapshot(original, path)
+    mapped = load_snapshot(path)
+
+    assert len(mapped) == len(original)
+    assert list(mapped.ids) == list(original.ids)
+    assert list(mapped.names) == list(original.names)
+    assert list(mapped.normalized_names) == list(original.normalized_names)
+    assert list(mapped.web_urls) == list(original.web_urls)
+    assert list(mapped.sizes) == list(original.sizes)
+    assert list(mapped.mime_types) == list(original.mime_types)
+    assert list(mapped.parents) == [("f1", "f2"), (), ("f1",)]
+    assert list(mapped.created) == ["2024-01-02T03:04:05.678Z", "", ""]
+    assert list(mapped.modified) == ["2024-02-03T04:05:06.000Z", "", ""]
+    assert list(mapped.searchable) == list(original.searchable)
+    assert mapped.version == original.version
+    assert mapped.source == original.source
+
+
+def test_mapped_term_positions_match_in_memory(tmp_path):
+    original = snapshot()
+    path = str(tmp_path / "inventario.snap")
+    write_snapshot(original, path)
+    mapped = load_snapshot(path)
+
+    for term in ("acta", "informe", "plantilla", "a", "zzz"):
+        assert mapped.term_positions(term) == original.term_positions(term)
+
+
+def test_rejects_file_that_is_not_a_snapshot(tmp_path):
+    path = tmp_path / "otro.snap"
+    path.write_bytes(b"no es un snapshot" + b"\0" * 32)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_persist_then_load_latest(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), keep=2)
+    original = snapshot(account="auditor@example.com")
+
+    persisted = store.persist(original)
+    loaded = SnapshotStore(directory=str(tmp_path), keep=2).load_latest(original.origin, max_age=60)
+
+    assert persisted.version == original.version
+    assert loaded is not None
+    assert loaded.version == original.version
+    assert list(loaded.names) == list(original.names)
+
+
+def test_load_latest_respects_max_age(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), keep=2)
+    original = snapshot()
+    original.fetched_at = time.time() - 120
+    store.persist(original)
+
+    assert store.load_latest(original.origin, max_age=60) is None
+    assert store.load_latest(original.origin, max_age=300) is not None
+
+
+def test_partial_snapshot_is_not_persisted(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), keep=2)
+    partial = InventorySnapshot.from_drive_files(FILES, partial=True)
+
+    assert store.persist(partial) is partial
+    assert store.load_latest(partial.origin, max_age=60) is None
+
+
+def test_prune_keeps_latest_versions(tmp_path):
+    store = SnapshotStore(directory=str(tmp_path), keep=2)
+    for i in range(4):
+        files = [dict(FILES[0], name=f"Acta {i}.pdf")]
+        store.persist(snapshot(files))
+        # Distinto mtime para que el orden de poda sea determinista
+        for name in os.listdir(tmp_path):
+            if name.endswith(".snap"):
+                path = os.path.join(tmp_path, name)
+                os.utime(path, (os.path.getmtime(path) - 1,) * 2)
+
+    snaps = [name for name in os.listdir(tmp_path) if name.endswith(".snap")]
+    assert len(snaps) == 2
+    latest = store.load_latest(snapshot([dict(FILES[0], name="Acta 3.pdf")]).origin, max_age=60)
+    assert list(latest.names) == ["Acta 3.pdf"]